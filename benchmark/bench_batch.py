@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+import time
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, build_sql_format, sql_source
+from src.code.BatchParser import BatchConfig, BatchParser
+
+
+def write_files(path, file_count, size):
+    """
+    生成SQL文件
+    :param path: 目录
+    :param file_count: 文件数量
+    :param size: 每个文件的字符数量
+    """
+    for index in range(file_count):
+        with open(os.path.join(path, f'{index:05d}.sql'), "w", encoding="utf-8") as file:
+            file.write(sql_source(size, index))
+
+
+def bench(path, max_workers):
+    """
+    测量批量解析耗时
+    :param path: 目录
+    :param max_workers: 进程数量
+    :return: 耗时，格式化结果
+    """
+    config = BatchConfig(build_sql_parser, build_sql_syntax, build_sql_format, skip_type=["space", "line"])
+    start = time.perf_counter()
+    result = {}
+    for item in BatchParser(config, max_workers).run(path, ".sql"):
+        result[item.path] = item.error or item.data
+    return time.perf_counter() - start, result
+
+
+def main(file_count=200, size=4096, max_workers=0):
+    max_workers = max_workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as path:
+        write_files(path, file_count, size)
+        print(f'文件数量：{file_count}\t文件大小：{size / 1024:.0f}KB\t进程数量：{max_workers}')
+        single_time, single_result = bench(path, 1)
+        pool_time, pool_result = bench(path, max_workers)
+    for name, use in [("单进程", single_time), ("进程池", pool_time)]:
+        print(f'{name}：{use:.2f}s\t{file_count / use:.1f}文件/s')
+    print(f'加速比：{single_time / pool_time:.2f}\t结果一致：{single_result == pool_result}')
+
+
+if __name__ == '__main__':
+    main(*[int(item) for item in sys.argv[1:4]])
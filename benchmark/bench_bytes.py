@@ -0,0 +1,67 @@
+import sys
+import time
+import tracemalloc
+
+from benchmark.corpus import build_sql_parser, sql_source
+
+
+def parse_text(code_parser, data):
+    """
+    先解码再解析
+    :param code_parser: 词法解析器
+    :param data: 字节源码
+    :return: token列表
+    """
+    return code_parser.to_token(data.decode("utf-8"))
+
+
+def parse_bytes(code_parser, data):
+    """
+    直接解析字节
+    :param code_parser: 词法解析器
+    :param data: 字节源码
+    :return: token列表
+    """
+    return code_parser.to_token(data, encoding="utf-8")
+
+
+def bench(method, code_parser, data, repeat=3):
+    """
+    测量耗时和内存峰值
+    :param method: 解析方法
+    :param code_parser: 词法解析器
+    :param data: 字节源码
+    :param repeat: 重复次数
+    :return: 最短耗时，除token以外的内存峰值，token内容
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        token_list = method(code_parser, data)
+        use = time.perf_counter() - start
+        best = use if best is None else min(best, use)
+    del token_list
+    # 解析前的内存峰值，token列表两种方式相同
+    tracemalloc.start()
+    source = data.decode("utf-8") if method is parse_text else data
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del source
+    token_list = method(code_parser, data)
+    return best, peak, [(t.type, t.start, t.data, t.end, t.line_start, t.line_end) for t in token_list]
+
+
+def main(size_mb=2.0):
+    # 中文注释较多的源码，解码后每个字符占两个字节
+    data = sql_source(int(size_mb * 1024 * 1024)).replace("注释", "中文注释内容").encode("utf-8")
+    code_parser = build_sql_parser().compile()
+    print(f'源码大小：{len(data) / 1024 / 1024:.2f}MB')
+    text_time, text_peak, text_token = bench(parse_text, code_parser, data)
+    bytes_time, bytes_peak, bytes_token = bench(parse_bytes, code_parser, data)
+    for name, use, peak in [("解码后解析", text_time, text_peak), ("直接解析字节", bytes_time, bytes_peak)]:
+        print(f'{name}：{use:.3f}s\t源码额外内存：{peak / 1024 / 1024:.2f}MB')
+    print(f'加速比：{text_time / bytes_time:.2f}\t结果一致：{text_token == bytes_token}')
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
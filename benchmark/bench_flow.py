@@ -0,0 +1,46 @@
+import sys
+import time
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, nested_source
+
+
+def bench(syntax_parser, token_list, repeat=5):
+    """
+    测量语法解析耗时
+    :param syntax_parser: 语法解析器
+    :param token_list: token列表
+    :param repeat: 重复次数
+    :return: 最短耗时，语法树
+    """
+    best = None
+    tree = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tree = syntax_parser.parser(token_list)
+        use = time.perf_counter() - start
+        best = use if best is None else min(best, use)
+    return best, tree
+
+
+def depth(token_list):
+    """
+    语法树最大深度
+    :param token_list: 语法树
+    :return: 深度
+    """
+    return max((depth(token.token_tree) + 1 for token in token_list if token.has_tree()), default=0)
+
+
+def main(nest=200, count=20):
+    source_code = nested_source(nest, count)
+    code_parser = build_sql_parser().compile()
+    print(f'嵌套层数：{nest}\t语句数量：{count}')
+    normal_time, normal_tree = bench(build_sql_syntax(), code_parser.to_token(source_code, skip_type=["space", "line"]))
+    compiled_time, compiled_tree = bench(build_sql_syntax().compile(), code_parser.to_token(source_code, skip_type=["space", "line"]))
+    for name, use in [("遍历流", normal_time), ("编译阶段", compiled_time)]:
+        print(f'{name}：{use * 1000:.1f}ms')
+    print(f'加速比：{normal_time / compiled_time:.2f}\t语法树深度：{depth(compiled_tree)}')
+
+
+if __name__ == '__main__':
+    main(*[int(item) for item in sys.argv[1:3]])
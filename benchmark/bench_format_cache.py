@@ -0,0 +1,73 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, build_sql_format, sql_source
+from src.code.FormatCache import FormatCache
+
+
+def edit_source(source_code, percent, seed=0) -> str:
+    """
+    修改部分行的数字，模拟少量修改后的文件
+    :param source_code: 源码
+    :param percent: 修改的行数占比
+    :param seed: 随机种子
+    :return: 修改后的源码
+    """
+    rand = random.Random(seed)
+    line_list = source_code.split("\n")
+    for index in rand.sample(range(len(line_list)), int(len(line_list) * percent / 100)):
+        line_list[index] = line_list[index].replace("1", "7")
+    return "\n".join(line_list)
+
+
+def main(size_kb=1024.0, max_depth=1):
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax().compile()
+    format_code = build_sql_format()
+    source_code = sql_source(int(size_kb * 1024))
+    # 每次格式化使用新解析的语法树，与重复格式化同一文件的场景一致
+    parse = lambda data: syntax_parser.parser(code_parser.to_token(data, skip_type=["space", "line"]))
+    print(f'源码大小：{len(source_code) / 1024:.0f}KB\t缓存层数：{int(max_depth)}')
+
+    def run(data, cache=None):
+        tree = parse(data)
+        format_code.set_cache(cache)
+        start = time.perf_counter()
+        result = format_code.format(tree)
+        use = time.perf_counter() - start
+        format_code.set_cache(None)
+        return use, result
+
+    base_time, base_data = run(source_code)
+    print(f'不使用缓存：{base_time * 1000:.0f}ms')
+    cache = FormatCache(max_depth=int(max_depth))
+    cold_time, cold_data = run(source_code, cache)
+    print(f'首次格式化：{cold_time * 1000:.0f}ms\t缓存数量：{len(cache.data)}\t命中率：{cache.hit_rate:.2f}\t结果一致：{cold_data == base_data}')
+    for percent in [0, 1, 10]:
+        edit_code = edit_source(source_code, percent)
+        edit_time, edit_data = run(edit_code)
+        cache.reset_stats()
+        use, data = run(edit_code, cache)
+        stats = cache.stats()
+        print(f'修改{percent}%的行：{use * 1000:.0f}ms\t加速比：{edit_time / use:.2f}\t命中率：{stats["hit_rate"]:.2f}\t'
+              f'复用字符：{stats["saved_bytes"]}\t结果一致：{data == edit_data}')
+    # 缓存持久化后在新的缓存对象中加载
+    with tempfile.TemporaryDirectory() as path:
+        path = os.path.join(path, "format.cache")
+        start = time.perf_counter()
+        cache.save(path)
+        save_time = time.perf_counter() - start
+        start = time.perf_counter()
+        load_cache = FormatCache(max_depth=int(max_depth), path=path)
+        load_time = time.perf_counter() - start
+        size = os.path.getsize(path)
+    use, data = run(source_code, load_cache)
+    print(f'保存：{save_time * 1000:.0f}ms\t加载：{load_time * 1000:.0f}ms\t文件大小：{size / 1024:.0f}KB\t'
+          f'加载后格式化：{use * 1000:.0f}ms\t命中率：{load_cache.hit_rate:.2f}\t结果一致：{data == base_data}')
+
+
+if __name__ == '__main__':
+    main(*[float(item) for item in sys.argv[1:3]])
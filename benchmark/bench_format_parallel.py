@@ -0,0 +1,36 @@
+import os
+import sys
+import time
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, build_sql_format, sql_source
+from src.code.ParallelFormat import ParallelFormat, encode_tree
+from src.code.ParserProfile import ParserProfile
+
+
+def main(size_mb=4.0, max_workers=0):
+    source_code = sql_source(int(size_mb * 1024 * 1024))
+    tree = build_sql_syntax().compile().parser(build_sql_parser().compile().to_token(source_code, skip_type=["space", "line"]))
+    format_code = build_sql_format()
+    max_workers = int(max_workers) or os.cpu_count() or 1
+    print(f'源码大小：{len(source_code) / 1024 / 1024:.2f}MB\t顶层token数量：{len(tree)}\t进程数量：{max_workers}')
+    start = time.perf_counter()
+    data = format_code.format(tree)
+    serial_time = time.perf_counter() - start
+    print(f'顺序格式化：{serial_time:.3f}s')
+    # 主进程展开语法树的耗时无法并行，是加速比的上限
+    start = time.perf_counter()
+    encode_tree(tree)
+    print(f'主进程展开：{time.perf_counter() - start:.3f}s')
+    profile = ParserProfile()
+    for chunk_size in [256, 1024, 4096]:
+        parallel_format = ParallelFormat(format_code, max_workers, chunk_size).set_profile(profile, f'chunk{chunk_size}')
+        start = time.perf_counter()
+        parallel_data = parallel_format.format(tree)
+        use = time.perf_counter() - start
+        print(f'分段{chunk_size}：{use:.3f}s\t分段数量：{parallel_format.chunk_count}\t重新格式化：{parallel_format.retry_count}\t'
+              f'加速比：{serial_time / use:.2f}\t结果一致：{parallel_data == data}')
+    print(profile.format_report("format"))
+
+
+if __name__ == '__main__':
+    main(*[float(item) for item in sys.argv[1:3]])
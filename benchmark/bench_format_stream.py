@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, build_sql_format, sql_source
+
+
+def write_all(format_code, tree, path):
+    """
+    格式化出完整结果后写入文件
+    :param format_code: 格式化器
+    :param tree: 语法树
+    :param path: 文件路径
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(format_code.format(tree))
+
+
+def write_stream(format_code, tree, path):
+    """
+    格式化时分段写入文件
+    :param format_code: 格式化器
+    :param tree: 语法树
+    :param path: 文件路径
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        format_code.format_to(tree, file)
+
+
+def bench(method, format_code, tree, path):
+    """
+    测量耗时和格式化过程中的内存峰值
+    :param method: 写入方法
+    :param format_code: 格式化器
+    :param tree: 语法树
+    :param path: 文件路径
+    :return: 耗时，内存峰值，文件内容
+    """
+    start = time.perf_counter()
+    method(format_code, tree, path)
+    use = time.perf_counter() - start
+    tracemalloc.start()
+    method(format_code, tree, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    with open(path, encoding="utf-8") as file:
+        return use, peak, file.read()
+
+
+def main(size_mb=2.0):
+    source_code = sql_source(int(size_mb * 1024 * 1024))
+    token_list = build_sql_parser().compile().to_token(source_code, skip_type=["space", "line"])
+    tree = build_sql_syntax().compile().parser(token_list)
+    format_code = build_sql_format()
+    print(f'源码大小：{len(source_code) / 1024 / 1024:.2f}MB')
+    with tempfile.TemporaryDirectory() as path:
+        all_time, all_peak, all_data = bench(write_all, format_code, tree, os.path.join(path, "all.sql"))
+        stream_time, stream_peak, stream_data = bench(write_stream, format_code, tree, os.path.join(path, "stream.sql"))
+    for name, use, peak in [("完整结果写入", all_time, all_peak), ("分段写入", stream_time, stream_peak)]:
+        print(f'{name}：{use:.3f}s\t内存峰值：{peak / 1024 / 1024:.2f}MB')
+    print(f'内存比：{all_peak / stream_peak:.2f}\t结果一致：{all_data == stream_data}')
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
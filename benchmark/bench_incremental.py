@@ -0,0 +1,60 @@
+import random
+import sys
+import time
+
+from benchmark.corpus import build_sql_parser, sql_source
+
+
+def dump(token_list):
+    """
+    token转为可比较的结构
+    :param token_list: token列表
+    :return: 元组列表
+    """
+    return [(token.type, token.start, token.data, token.end, token.end_index, token.line_start, token.line_end, token.column) for token in token_list]
+
+
+def random_edit(rand: random.Random, source_code):
+    """
+    生成随机编辑，包括普通输入、删除以及会移动注释和字符串边界的输入
+    :param rand: 随机数
+    :param source_code: 源码
+    :return: 编辑位置，删除的字符数，插入的内容
+    """
+    edit_index = rand.randint(0, len(source_code))
+    remove_length = rand.choice([0, 0, 1, 3]) if edit_index < len(source_code) else 0
+    remove_length = min(remove_length, len(source_code) - edit_index)
+    insert_data = rand.choice(["a", " ", "\n", "x = 1", "'", "\"", "/*", "*/", "--", "\\", "`", ""])
+    return edit_index, remove_length, insert_data
+
+
+def main(size_kb=64.0, edit_count=200, seed=0):
+    rand = random.Random(seed)
+    source_code = sql_source(int(size_kb * 1024), seed)
+    code_parser = build_sql_parser().compile()
+    snapshot = code_parser.token_snapshot(source_code)
+    full_time = 0
+    update_time = 0
+    same = True
+    for _ in range(edit_count):
+        edit_index, remove_length, insert_data = random_edit(rand, source_code)
+        source_code = source_code[:edit_index] + insert_data + source_code[edit_index + remove_length:]
+        start = time.perf_counter()
+        snapshot = code_parser.update_token(snapshot, edit_index, remove_length, insert_data)
+        update_time += time.perf_counter() - start
+        start = time.perf_counter()
+        token_list = code_parser.to_token(source_code)
+        full_time += time.perf_counter() - start
+        # 随机校验：增量结果必须与完整解析一致
+        if dump(token_list) != dump(snapshot.token_list):
+            same = False
+            print(f'结果不一致：位置{edit_index}，删除{remove_length}，插入{insert_data!r}')
+            break
+    print(f'源码大小：{len(source_code) / 1024:.0f}KB\t编辑次数：{edit_count}\ttoken数量：{len(snapshot.token_list)}')
+    for name, use in [("完整解析", full_time), ("增量解析", update_time)]:
+        print(f'{name}：平均{use / edit_count * 1000:.2f}ms')
+    print(f'加速比：{full_time / update_time:.2f}\t结果一致：{same}')
+
+
+if __name__ == '__main__':
+    main(*[float(item) for item in sys.argv[1:2]], *[int(item) for item in sys.argv[2:4]])
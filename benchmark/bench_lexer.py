@@ -0,0 +1,38 @@
+import sys
+import time
+
+from benchmark.corpus import build_sql_parser, sql_source
+
+
+def bench(code_parser, source_code, repeat=3):
+    """
+    测量词法解析耗时
+    :param code_parser: 词法解析器
+    :param source_code: 源码
+    :param repeat: 重复次数
+    :return: 最短耗时，token列表
+    """
+    best = None
+    token_list = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        token_list = code_parser.to_token(source_code)
+        use = time.perf_counter() - start
+        best = use if best is None else min(best, use)
+    return best, token_list
+
+
+def main(size_mb=2.0):
+    source_code = sql_source(int(size_mb * 1024 * 1024))
+    print(f'源码大小：{len(source_code) / 1024 / 1024:.2f}MB')
+    normal_time, normal_token = bench(build_sql_parser(), source_code)
+    compiled_time, compiled_token = bench(build_sql_parser().compile(), source_code)
+    same = [(t.type, t.start, t.data, t.end, t.end_index, t.line_start, t.line_end) for t in normal_token] == \
+           [(t.type, t.start, t.data, t.end, t.end_index, t.line_start, t.line_end) for t in compiled_token]
+    for name, use in [("普通模式", normal_time), ("编译模式", compiled_time)]:
+        print(f'{name}：{use:.3f}s\t{len(source_code) / 1024 / 1024 / use:.2f}MB/s\t{len(normal_token) / use:.0f}token/s')
+    print(f'加速比：{normal_time / compiled_time:.2f}\t结果一致：{same}')
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
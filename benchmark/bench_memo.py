@@ -0,0 +1,50 @@
+import sys
+import time
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, subquery_source
+
+
+def dump(token_list):
+    """
+    语法树转为可比较的结构
+    :param token_list: 语法树
+    :return: 嵌套列表
+    """
+    return [(token.type, token.start, token.data, token.end, token.line_start, token.line_end, dump(token.token_tree)) for token in token_list]
+
+
+def bench(syntax_parser, code_parser, source_code, repeat=3):
+    """
+    测量语法解析耗时，每次重新生成token
+    :param syntax_parser: 语法解析器
+    :param code_parser: 词法解析器
+    :param source_code: 源码
+    :param repeat: 重复次数
+    :return: 最短耗时，语法树
+    """
+    best = None
+    tree = []
+    for _ in range(repeat):
+        token_list = code_parser.to_token(source_code, skip_type=["space", "line"])
+        start = time.perf_counter()
+        tree = syntax_parser.parser(token_list)
+        use = time.perf_counter() - start
+        best = use if best is None else min(best, use)
+    return best, tree
+
+
+def main(depth=20, count=50):
+    source_code = subquery_source(depth, count)
+    code_parser = build_sql_parser().compile()
+    print(f'子查询层数：{depth}\t语句数量：{count}\t源码大小：{len(source_code) / 1024:.0f}KB')
+    normal_time, normal_tree = bench(build_sql_syntax(), code_parser, source_code)
+    syntax_parser = build_sql_syntax()
+    syntax_parser.use_memo = True
+    memo_time, memo_tree = bench(syntax_parser, code_parser, source_code)
+    for name, use in [("逐段解析", normal_time), ("记忆表", memo_time)]:
+        print(f'{name}：{use * 1000:.1f}ms')
+    print(f'加速比：{normal_time / memo_time:.2f}\t结果一致：{dump(normal_tree) == dump(memo_tree)}')
+
+
+if __name__ == '__main__':
+    main(*[int(item) for item in sys.argv[1:3]])
@@ -0,0 +1,43 @@
+import sys
+import time
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, nested_source
+from src.code.CodeParser import Token
+from src.code.ParserUtil import CodeHandle
+
+
+def depth(token_list):
+    """
+    语法树最大深度，显式栈遍历
+    :param token_list: 语法树
+    :return: 深度
+    """
+    max_depth = 0
+    stack = [(token, 1) for token in token_list]
+    while stack:
+        token, now_depth = stack.pop()
+        max_depth = max(max_depth, now_depth)
+        if token.has_tree():
+            stack.extend((child, now_depth + 1) for child in token.token_tree)
+    return max_depth
+
+
+def main(*nest_list):
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax().compile()
+    rule = [Token.create("bracket", "(")]
+    print(f'{"嵌套层数":<8}{"token数量":<10}{"语法解析":<12}{"树深度":<8}{"查找":<12}{"找到数量":<8}')
+    for nest in nest_list or (100, 500, 1000, 3000):
+        token_list = code_parser.to_token(nested_source(nest), skip_type=["space", "line"])
+        start = time.perf_counter()
+        tree = syntax_parser.parser(token_list)
+        parser_time = time.perf_counter() - start
+        result = []
+        start = time.perf_counter()
+        CodeHandle.find(tree, rule, result)
+        find_time = time.perf_counter() - start
+        print(f'{nest:<12}{len(token_list):<12}{parser_time * 1000:<14.1f}{depth(tree):<11}{find_time * 1000:<14.1f}{len(result):<8}')
+
+
+if __name__ == '__main__':
+    main(*[int(item) for item in sys.argv[1:]])
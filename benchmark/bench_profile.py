@@ -0,0 +1,59 @@
+import cProfile
+import pstats
+import sys
+import time
+
+from benchmark.bench_syntax import dump
+from benchmark.corpus import build_sql_parser, build_sql_syntax, sql_source
+from src.code.ParserProfile import ParserProfile
+
+
+def run(code_parser, syntax_parser, source_code, repeat=3):
+    """
+    测量词法和语法解析耗时
+    :param code_parser: 词法解析器
+    :param syntax_parser: 语法解析器
+    :param source_code: 源码
+    :param repeat: 重复次数
+    :return: 最短耗时，语法树
+    """
+    best = None
+    tree = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tree = syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"]))
+        use = time.perf_counter() - start
+        best = use if best is None else min(best, use)
+    return best, dump(tree)
+
+
+def main(size_kb=200.0):
+    source_code = sql_source(int(size_kb * 1024))
+    print(f'源码大小：{len(source_code) / 1024:.0f}KB')
+    code_parser, syntax_parser = build_sql_parser().compile(), build_sql_syntax().compile()
+    base_time, base_tree = run(code_parser, syntax_parser, source_code)
+    profile = ParserProfile()
+    code_parser.set_profile(profile, "sql")
+    syntax_parser.set_profile(profile, "sql")
+    profile_time, profile_tree = run(code_parser, syntax_parser, source_code, 1)
+    code_parser.set_profile(None)
+    syntax_parser.set_profile(None)
+    close_time, close_tree = run(code_parser, syntax_parser, source_code)
+    for name, use in [("未开启统计", base_time), ("开启统计", profile_time), ("关闭统计", close_time)]:
+        print(f'{name}：{use * 1000:.0f}ms')
+    print(f'统计开销：{profile_time / base_time:.2f}\t结果一致：{base_tree == profile_tree == close_tree}')
+    print(profile.format_report(limit=10))
+    # 带标签的统计，cProfile中按解析器和语法阶段区分
+    label_profile = ParserProfile(use_label=True)
+    code_parser.set_profile(label_profile, "sql")
+    syntax_parser.set_profile(label_profile, "sql")
+    profiler = cProfile.Profile()
+    profiler.runcall(run, code_parser, syntax_parser, source_code, 1)
+    stats = pstats.Stats(profiler)
+    label_list = [(key[2], value[3]) for key, value in stats.stats.items() if key[2].startswith("<token") or key[2].startswith("<syntax")]
+    for label, use in sorted(label_list, key=lambda item: item[1], reverse=True)[0:5]:
+        print(f'{label}：{use * 1000:.0f}ms')
+
+
+if __name__ == '__main__':
+    main(*[float(item) for item in sys.argv[1:2]])
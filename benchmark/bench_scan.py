@@ -0,0 +1,78 @@
+import random
+import sys
+import time
+
+from benchmark.corpus import build_sql_parser, SQL_KEYWORD
+from src.code.CodeParser import CodeParser, MatchRule
+
+WORD = ["customer", "account", "balance", "total", "history", "record", "address", "station", "quantity", "version",
+        "payment", "invoice", "detail", "summary", "internal", "external", "region", "currency", "status", "number"]
+""" 组成标识符的单词，包含大量与关键字相同的片段 """
+
+
+def build_parser(use_scan) -> CodeParser:
+    """
+    构建关键字也作为词法规则的SQL词法解析器，标识符中的字母都可能是因子的开始
+    :param use_scan: 使用扫描索引
+    :return: 词法解析器
+    """
+    code_parser = build_sql_parser()
+    code_parser.use_scan = use_scan
+    for keyword in SQL_KEYWORD:
+        code_parser.add_token("keyword", MatchRule(keyword, ignore_case=True))
+    return code_parser
+
+
+def identifier_source(size, seed=0) -> str:
+    """
+    生成标识符很长、符号之间间隔很远的源码
+    :param size: 字符数量
+    :param seed: 随机种子
+    :return: 源码
+    """
+    rand = random.Random(seed)
+    result = []
+    length = 0
+    while length < size:
+        name = "_".join(rand.choice(WORD) for _ in range(rand.randint(4, 10)))
+        item = name + rand.choice([", ", ".", " = ", ";\n", "("])
+        result.append(item)
+        length += len(item)
+    return "".join(result)[0:size]
+
+
+def bench(code_parser, source_code, repeat=3):
+    """
+    测量词法解析耗时
+    :param code_parser: 词法解析器
+    :param source_code: 源码
+    :param repeat: 重复次数
+    :return: 最短耗时，token列表
+    """
+    best = None
+    token_list = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        token_list = code_parser.to_token(source_code)
+        use = time.perf_counter() - start
+        best = use if best is None else min(best, use)
+    return best, [(t.type, t.start, t.data, t.end, t.end_index, t.line_start, t.line_end) for t in token_list]
+
+
+def main(size_kb=512):
+    source_code = identifier_source(size_kb * 1024)
+    print(f'源码大小：{len(source_code) / 1024:.0f}KB')
+    result = {}
+    for name, use_scan, compiled in [("普通模式", False, False), ("普通模式扫描", True, False), ("编译模式", False, True), ("编译模式扫描", True, True)]:
+        code_parser = build_parser(use_scan)
+        if compiled:
+            code_parser.compile()
+        result[name] = bench(code_parser, source_code)
+        print(f'{name}：{result[name][0] * 1000:.0f}ms\t{len(source_code) / 1024 / 1024 / result[name][0]:.2f}MB/s')
+    same = all(item[1] == result["普通模式"][1] for item in result.values())
+    print(f'普通模式加速比：{result["普通模式"][0] / result["普通模式扫描"][0]:.2f}\t'
+          f'编译模式加速比：{result["编译模式"][0] / result["编译模式扫描"][0]:.2f}\t结果一致：{same}')
+
+
+if __name__ == '__main__':
+    main(*[int(item) for item in sys.argv[1:2]])
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import time
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, build_sql_format, sql_source, SQL_KEYWORD
+from src.code.CodeParser import CodeParser, MatchRule
+from src.code.ParserStore import ParserStore
+from src.util.chiyaUtil import KeyWord
+
+
+def build_config():
+    """
+    构建完整配置，关键字按忽略大小写注册
+    :return: 词法解析器，语法解析器，格式化器
+    """
+    code_parser: CodeParser = build_sql_parser()
+    for keyword in [*SQL_KEYWORD, *KeyWord.JAVA_KEYWORD]:
+        code_parser.add_token("keyword", MatchRule(keyword, ignore_case=True))
+    return code_parser.compile(), build_sql_syntax().compile(), build_sql_format()
+
+
+def run(config, source_code):
+    """
+    使用配置完成解析和格式化
+    :param config: 配置
+    :param source_code: 源码
+    :return: 格式化结果
+    """
+    code_parser, syntax_parser, format_code = config
+    return format_code.format(syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"])))
+
+
+def main(repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        config = build_config()
+    build_time = (time.perf_counter() - start) / repeat
+    with tempfile.TemporaryDirectory() as path:
+        store_path = os.path.join(path, "sql.store")
+        ParserStore.dump(config, store_path)
+        size = os.path.getsize(store_path)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            store_config = ParserStore.load(store_path)
+        load_time = (time.perf_counter() - start) / repeat
+    source_code = sql_source(16 * 1024)
+    print(f'配置文件大小：{size / 1024:.1f}KB')
+    for name, use in [("构建配置", build_time), ("加载配置", load_time)]:
+        print(f'{name}：{use * 1000:.1f}ms')
+    print(f'加速比：{build_time / load_time:.2f}\t结果一致：{run(config, source_code) == run(store_config, source_code)}')
+
+
+if __name__ == '__main__':
+    main(*[int(item) for item in sys.argv[1:2]])
@@ -0,0 +1,56 @@
+import sys
+import time
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, sql_source
+from src.code.TokenParser import SyntaxList
+
+
+def bench(syntax_parser, token_list, repeat=3):
+    """
+    测量语法解析耗时
+    :param syntax_parser: 语法解析器
+    :param token_list: token列表
+    :param repeat: 重复次数
+    :return: 最短耗时，语法树
+    """
+    best = None
+    tree = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tree = syntax_parser.parser(token_list)
+        use = time.perf_counter() - start
+        best = use if best is None else min(best, use)
+    return best, tree
+
+
+def dump(token_list):
+    """
+    语法树转为可比较的结构
+    :param token_list: 语法树
+    :return: 嵌套元组
+    """
+    return [(token.type, token.start, token.data, token.end, dump(token.token_tree)) for token in token_list]
+
+
+def main(size_kb=200.0):
+    source_code = sql_source(int(size_kb * 1024))
+    code_parser = build_sql_parser().compile()
+    token_list = code_parser.to_token(source_code, skip_type=["space", "line"])
+    print(f'源码大小：{len(source_code) / 1024:.0f}KB\ttoken数量：{len(token_list)}')
+    # 对照组：每个位置尝试全部语法
+    candidate = SyntaxList.candidate
+    SyntaxList.candidate = lambda self, token, match_pool=None: self.to_match()
+    try:
+        scan_time, scan_tree = bench(build_sql_syntax(), token_list)
+    finally:
+        SyntaxList.candidate = candidate
+    # 语法解析会修改token类型，重新生成token
+    token_list = code_parser.to_token(source_code, skip_type=["space", "line"])
+    index_time, index_tree = bench(build_sql_syntax(), token_list)
+    for name, use in [("全量尝试", scan_time), ("首token索引", index_time)]:
+        print(f'{name}：{use:.3f}s\t{len(token_list) / use:.0f}token/s')
+    print(f'加速比：{scan_time / index_time:.2f}\t结果一致：{dump(scan_tree) == dump(index_tree)}')
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 200.0)
@@ -0,0 +1,80 @@
+import gc
+import sys
+import tracemalloc
+
+from benchmark.corpus import build_sql_parser, sql_source
+from src.code.CodeParser import Token
+
+
+class _DictToken:
+    """ 使用__dict__并且每个token都带有子节点列表的旧存储方式，作为对照 """
+
+    def __init__(self, token):
+        self.type = token.type
+        self.token_tree = []
+        self.start = token.start
+        self.end = token.end
+        self.data = token.data
+        self.end_index = token.end_index
+        self.line_start = token.line_start
+        self.line_end = token.line_end
+
+
+def copy_token(token) -> Token:
+    """
+    复制token，与源token共用字符串，只统计对象本身的开销
+    :param token: token
+    :return: 新token
+    """
+    new_token = Token()
+    new_token.type = token.type
+    new_token.start = token.start
+    new_token.end = token.end
+    new_token.data = token.data
+    new_token.end_index = token.end_index
+    new_token.line_start = token.line_start
+    new_token.line_end = token.line_end
+    new_token.column = token.column
+    return new_token
+
+
+def measure(method):
+    """
+    测量方法返回结果所占用的内存
+    :param method: 方法
+    :return: 结果，占用字节，峰值字节
+    """
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    result = method()
+    now, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, now - start, peak - start
+
+
+def main(size_mb=1.0):
+    source_code = sql_source(int(size_mb * 1024 * 1024))
+    code_parser = build_sql_parser()
+    token_list, list_byte, list_peak = measure(lambda: code_parser.to_token(source_code))
+    count = len(token_list)
+    # 对象本身的开销，字符串与源token共用
+    dict_list, dict_byte, dict_peak = measure(lambda: [_DictToken(token) for token in token_list])
+    del dict_list
+    slots_list, slots_byte, slots_peak = measure(lambda: [copy_token(token) for token in token_list])
+    del slots_list
+    del token_list
+    # 包含内容字符串在内的完整开销
+    table, table_byte, table_peak = measure(lambda: code_parser.to_table(source_code))
+    print(f'源码大小：{len(source_code) / 1024 / 1024:.2f}MB\ttoken数量：{count}')
+    for name, use, peak in [
+        ("字典Token对象", dict_byte, dict_peak),
+        ("slots Token对象", slots_byte, slots_peak),
+        ("to_token完整列表", list_byte, list_peak),
+        ("to_table完整表", table_byte, table_peak),
+    ]:
+        print(f'{name}：{use / count:.1f}字节/token\t峰值：{peak / count:.1f}字节/token')
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
@@ -0,0 +1,86 @@
+import random
+import sys
+import time
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, sql_source
+from src.code.TokenParser import LexicalFactor, WordRule
+
+SKIP_TYPE = ["space", "line"]
+""" 语法解析前跳过的类型 """
+SPLIT_FACTOR = LexicalFactor(WordRule(start=";"), "symbol")
+""" 语句之间的分隔token """
+
+
+def dump(token_list):
+    """
+    语法树转为可比较的结构
+    :param token_list: 语法树
+    :return: 嵌套列表
+    """
+    return [(token.type, token.start, token.data, token.end, token.line_start, token.line_end, dump(token.token_tree)) for token in token_list]
+
+
+def format_edit(rand: random.Random, source_code):
+    """
+    随机选取一条语句重新排版，子句换行或者关键字大写
+    :param rand: 随机数
+    :param source_code: 源码
+    :return: 编辑位置，删除的字符数，插入的内容
+    """
+    index = rand.randrange(len(source_code))
+    edit_index = source_code.rfind(";", 0, index) + 1
+    end_index = source_code.find(";", index)
+    end_index = len(source_code) if end_index < 0 else end_index + 1
+    statement = source_code[edit_index:end_index]
+    new_statement = statement.replace(" from ", "\nfrom ").replace(" where ", "\nwhere ")
+    if new_statement == statement:
+        new_statement = statement.replace("select ", "SELECT ").replace("update ", "UPDATE ").replace("delete ", "DELETE ")
+    return edit_index, len(statement), new_statement
+
+
+def main(line_count=20000, edit_count=20, seed=0):
+    rand = random.Random(seed)
+    source_code = sql_source(line_count * 36, seed)
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax()
+    token_snapshot = code_parser.token_snapshot(source_code, skip_type=SKIP_TYPE)
+    syntax_snapshot = syntax_parser.syntax_snapshot(token_snapshot.token_list, SPLIT_FACTOR)
+    print(f'源码行数：{source_code.count(chr(10))}\t编辑次数：{edit_count}\t顶层token数量：{len(syntax_snapshot.tree)}')
+    full_time = [0, 0]
+    update_time = [0, 0]
+    reuse_count = 0
+    same = True
+    for _ in range(edit_count):
+        edit_index, remove_length, insert_data = format_edit(rand, source_code)
+        source_code = source_code[:edit_index] + insert_data + source_code[edit_index + remove_length:]
+        old_tree = {id(token) for token in syntax_snapshot.tree}
+        start = time.perf_counter()
+        token_snapshot = code_parser.update_token(token_snapshot, edit_index, remove_length, insert_data)
+        middle = time.perf_counter()
+        start_index, old_end, new_end = token_snapshot.change_range
+        syntax_snapshot = syntax_parser.update_syntax(syntax_snapshot, start_index, old_end, token_snapshot.token_list[start_index:new_end])
+        end = time.perf_counter()
+        update_time[0] += middle - start
+        update_time[1] += end - middle
+        reuse_count += sum(1 for token in syntax_snapshot.tree if id(token) in old_tree)
+
+        start = time.perf_counter()
+        token_list = code_parser.to_token(source_code, skip_type=SKIP_TYPE)
+        middle = time.perf_counter()
+        tree = syntax_parser.parser(token_list)
+        end = time.perf_counter()
+        full_time[0] += middle - start
+        full_time[1] += end - middle
+        # 随机校验：增量结果必须与完整解析一致
+        if dump(tree) != dump(syntax_snapshot.tree):
+            same = False
+            print(f'结果不一致：位置{edit_index}，删除{remove_length}，插入{insert_data!r}')
+            break
+    for name, use in [("完整解析", full_time), ("增量解析", update_time)]:
+        print(f'{name}：词法平均{use[0] / edit_count * 1000:.2f}ms\t语法平均{use[1] / edit_count * 1000:.2f}ms\t合计{sum(use) / edit_count * 1000:.2f}ms')
+    print(f'复用顶层token比例：{reuse_count / edit_count / len(syntax_snapshot.tree):.2%}')
+    print(f'语法加速比：{full_time[1] / update_time[1]:.2f}\t合计加速比：{sum(full_time) / sum(update_time):.2f}\t结果一致：{same}')
+
+
+if __name__ == '__main__':
+    main(*[int(item) for item in sys.argv[1:4]])
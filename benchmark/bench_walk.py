@@ -0,0 +1,90 @@
+import sys
+import time
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, nested_source, sql_source
+from src.code.FormatCode import IterationStack, TreeWalk
+
+
+def walk_iteration(tree):
+    """
+    使用IterationStack先序和后序遍历
+    :param tree: 语法树
+    :return: 先序访问顺序，后序访问数量
+    """
+    visit = []
+    leave = []
+
+    def judge_method(iteration: IterationStack, token):
+        if token.has_tree():
+            iteration.push(token.token_tree)
+
+    def before_method(iteration: IterationStack, token):
+        visit.append(token)
+
+    def after_method(iteration: IterationStack, token):
+        leave.append(token)
+
+    iteration_stack = IterationStack()
+    iteration_stack.push(tree)
+    iteration_stack.add_judge(judge_method)
+    iteration_stack.add_before(before_method)
+    iteration_stack.add_after(after_method)
+    iteration_stack.iteration()
+    return visit, len(leave)
+
+
+def walk_tree(tree):
+    """
+    使用TreeWalk先序和后序遍历，叶子节点的后序处理在进入时完成
+    :param tree: 语法树
+    :return: 先序访问顺序，后序访问数量
+    """
+    visit = []
+    leave = []
+
+    def enter(token):
+        visit.append(token)
+        if token.has_tree():
+            return token.token_tree
+        leave.append(token)
+        return None
+
+    TreeWalk.walk(tree, enter, leave.append)
+    return visit, len(leave)
+
+
+def bench(method, tree, repeat=5):
+    """
+    测量遍历耗时
+    :param method: 遍历方法
+    :param tree: 语法树
+    :param repeat: 重复次数
+    :return: 最短耗时，遍历结果
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = method(tree)
+        use = time.perf_counter() - start
+        best = use if best is None else min(best, use)
+    return best, result
+
+
+def main(size_kb=200.0):
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax().compile()
+    for name, source_code in [("平铺语句", sql_source(int(size_kb * 1024))), ("深层嵌套", nested_source(64, int(size_kb * 1024) // 400))]:
+        tree = syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"]))
+        iteration_time, iteration_result = bench(walk_iteration, tree)
+        walk_time, walk_result = bench(walk_tree, tree)
+        count = len(walk_result[0])
+        same = iteration_result[1] == walk_result[1] and all(a is b for a, b in zip(iteration_result[0], walk_result[0])) and len(iteration_result[0]) == count
+        print(f'{name}：节点数量：{count}')
+        for method_name, use in [("IterationStack", iteration_time), ("TreeWalk", walk_time)]:
+            print(f'{method_name}：{use * 1000:.1f}ms\t{count / use:.0f}节点/s')
+        print(f'加速比：{iteration_time / walk_time:.2f}\t结果一致：{same}')
+
+
+if __name__ == '__main__':
+    main(*[float(item) for item in sys.argv[1:2]])
@@ -0,0 +1,332 @@
+import random
+from functools import partial
+
+from src.code.ChiyaScript import CodeScript
+from src.code.CodeParser import CodeParser
+from src.code.FormatCode import FormatCode
+from src.code.TokenParser import SyntaxParser, SyntaxFactor, LexicalFactor, WordRule
+from src.util.chiyaUtil import KeyWord
+
+
+def build_sql_parser() -> CodeParser:
+    """
+    构建基准测试使用的SQL词法解析器
+    :return: 词法解析器
+    """
+    code_parser = CodeParser()
+    code_parser.add_token("space", " ", "\t")
+    code_parser.add_token("line", "\n")
+    code_parser.add_token("symbol", ",", ";", ".", "=", "<", ">", "<=", ">=", "<>", "!=", "+", "-", "*", "/")
+    code_parser.add_token("bracket", "(", ")")
+    code_parser.add_combination("string", "'", "'", need_escape=True)
+    code_parser.add_combination("string", '"', '"', need_escape=True)
+    code_parser.add_combination("quote", "`", "`")
+    code_parser.add_combination("note", "--", "\n")
+    code_parser.add_combination("note", "/*", "*/")
+    return code_parser
+
+
+def sql_source(size, seed=0) -> str:
+    """
+    生成指定字符数量的SQL源码
+    :param size: 字符数量
+    :param seed: 随机种子
+    :return: 源码
+    """
+    rand = random.Random(seed)
+    statement = [
+        "select `id`, name, age from user_info where id = {0} and name <> 'it\\'s {0}';\n",
+        "insert into user_info (id, name, age) values ({0}, \"name_{0}\", {1});\n",
+        "-- 注释 {0}\nupdate user_info set age = age + {1} where id >= {0};\n",
+        "/* 多行注释\n * {0}\n */\ndelete from user_info where (id = {0} or age < {1});\n",
+    ]
+    result = []
+    length = 0
+    while length < size:
+        line = rand.choice(statement).format(rand.randint(0, 100000), rand.randint(0, 100))
+        result.append(line)
+        length += len(line)
+    return "".join(result)[0:size]
+
+
+SQL_KEYWORD = ["select", "from", "where", "and", "or", "as", "insert", "into", "values", "update", "set", "delete",
+               "in", "not", "null", "is", "like", "between", "join", "on", "group", "order", "by", "limit"]
+""" 基准测试使用的SQL关键字 """
+
+
+def build_sql_syntax() -> SyntaxParser:
+    """
+    构建基准测试使用的SQL语法解析器，每个优先级包含数十条语法
+    :return: 语法解析器
+    """
+    syntax_parser = SyntaxParser()
+    syntax_parser.register_keyword(*SQL_KEYWORD)
+    syntax_parser.add_flow(0, partial(syntax_parser.mark_keyword, ignore_case=True))
+    bracket = SyntaxFactor("bracket_group", need_match=True, need_paired=True)
+    bracket.add_lexical(LexicalFactor(WordRule(start="("), "bracket"), LexicalFactor(WordRule(start=")"), "bracket"))
+    syntax_parser.add_syntax(1, bracket, need_recursion=True)
+    column = SyntaxFactor("column_ref")
+    column.add_lexical(LexicalFactor(None, "any"), LexicalFactor(WordRule(start="."), "symbol"), LexicalFactor(None, "any"))
+    column.add_type({0: "table", 2: "column"})
+    syntax_parser.add_syntax(2, column)
+    for symbol in ["=", "<", ">", "<=", ">=", "<>", "!=", "+", "-", "*", "/"]:
+        compare = SyntaxFactor("expression")
+        compare.add_lexical(LexicalFactor(None, "any", "string", "column_ref"), LexicalFactor(WordRule(start=symbol), "symbol"), LexicalFactor(None, "any", "string", "column_ref"))
+        syntax_parser.add_syntax(2, compare)
+    for keyword in SQL_KEYWORD:
+        clause = SyntaxFactor(f'{keyword}_clause')
+        clause.add_lexical(LexicalFactor(None, f'key:{keyword}'), LexicalFactor(None, "any", "quote", "expression"))
+        syntax_parser.add_syntax(3, clause)
+    statement = SyntaxFactor("statement", need_match=True)
+    statement.add_lexical(LexicalFactor(None, "select_clause", "insert_clause", "update_clause", "delete_clause"), LexicalFactor(WordRule(start=";"), "symbol", allow_end=True))
+    syntax_parser.add_syntax(4, statement, need_recursion=True)
+    return syntax_parser
+
+
+def build_sql_format() -> FormatCode:
+    """
+    构建基准测试使用的SQL格式化器
+    :return: 格式化器
+    """
+    format_code = FormatCode()
+    format_code.add_rule("statement", line_after_use=1)
+    for keyword in ["from", "where", "set", "values", "order", "group"]:
+        format_code.add_rule(f'{keyword}_clause', line_before_use=1)
+    format_code.add_rule("symbol", left_space=False, content=",")
+    format_code.add_rule("symbol", left_space=False, right_space=False, content=".")
+    format_code.add_rule("bracket", right_space=False, content="(")
+    format_code.add_rule("bracket", left_space=False, content=")")
+    format_code.add_rule("bracket_group", child_space=True)
+    format_code.add_rule("note", line_after_use=1, line_before_use=1)
+    return format_code
+
+
+def nested_source(depth, count=1) -> str:
+    """
+    生成多层嵌套括号的源码
+    :param depth: 嵌套层数
+    :param count: 重复次数
+    :return: 源码
+    """
+    statement = "select " + "(" * depth + "a + 1" + ")" * depth + " from t;\n"
+    return statement * count
+
+
+def subquery_source(depth, count=1) -> str:
+    """
+    生成多层嵌套子查询的源码，语句之间内容相同
+    :param depth: 嵌套层数
+    :param count: 重复次数
+    :return: 源码
+    """
+    statement = "select id from t0 where a.id = 1"
+    for index in range(1, depth + 1):
+        statement = f'select id, name from t{index} where id in ({statement}) and age > {index}'
+    return (statement + ";\n") * count
+
+
+def literal_source(size, seed=0) -> str:
+    """
+    生成字符串和注释很长的SQL源码
+    :param size: 字符数量
+    :param seed: 随机种子
+    :return: 源码
+    """
+    rand = random.Random(seed)
+    word = ["日志", "message", "detail", "错误", "trace", "status", "返回", "value"]
+    result = []
+    length = 0
+    while length < size:
+        text = " ".join(rand.choice(word) for _ in range(rand.randint(50, 200)))
+        line = rand.choice([
+            f"insert into log_info (id, message) values ({rand.randint(0, 100000)}, 'it\\'s {text}');\n",
+            f"/* {text}\n * {text}\n */\n",
+            f"-- {text}\n",
+        ])
+        result.append(line)
+        length += len(line)
+    return "".join(result)[0:size]
+
+
+def keyword_source(size, seed=0) -> str:
+    """
+    生成关键字密集、大小写混合的SQL源码
+    :param size: 字符数量
+    :param seed: 随机种子
+    :return: 源码
+    """
+    rand = random.Random(seed)
+    statement = [
+        "select a, b from t{0} where not a is null and b in (select b from u where c like 'x%' or d between 1 and {1}) group by a order by b limit {1};\n",
+        "SELECT id FROM t{0} WHERE id IN ({1}, 2, 3) AND name IS NOT NULL ORDER BY id LIMIT 10;\n",
+        "update t{0} set a = {1} where b = 1 or c = 2 and not d is null;\n",
+        "Select c From t{0} Join u On t{0}.id = u.id Where c > {1} Group By c;\n",
+    ]
+    result = []
+    length = 0
+    while length < size:
+        line = rand.choice(statement).format(rand.randint(0, 1000), rand.randint(0, 100))
+        result.append(line)
+        length += len(line)
+    return "".join(result)[0:size]
+
+
+def build_java_parser() -> CodeParser:
+    """
+    构建基准测试使用的Java词法解析器
+    :return: 词法解析器
+    """
+    code_parser = CodeParser()
+    code_parser.add_token("space", " ", "\t")
+    code_parser.add_token("line", "\n")
+    code_parser.add_token("symbol", ";", ",", ".", "=", "+", "-", "*", "/", "<", ">", "==", "!=", "<=", ">=", "&&", "||", "!", "++", "--", "+=", "-=", "?", ":")
+    code_parser.add_token("bracket", "(", ")", "{", "}", "[", "]")
+    code_parser.add_combination("string", '"', '"', need_escape=True)
+    code_parser.add_combination("char", "'", "'", need_escape=True)
+    code_parser.add_combination("note", "//", "\n")
+    code_parser.add_combination("note", "/*", "*/")
+    return code_parser
+
+
+def build_java_syntax() -> SyntaxParser:
+    """
+    构建基准测试使用的Java语法解析器，代码块和括号递归解析，语句以分号结尾
+    :return: 语法解析器
+    """
+    syntax_parser = SyntaxParser()
+    syntax_parser.register_keyword(*KeyWord.JAVA_KEYWORD)
+    syntax_parser.add_flow(0, syntax_parser.mark_keyword)
+    block = SyntaxFactor("block", need_match=True, need_paired=True)
+    block.add_lexical(LexicalFactor(WordRule(start="{"), "bracket"), LexicalFactor(WordRule(start="}"), "bracket"))
+    syntax_parser.add_syntax(1, block, need_recursion=True)
+    bracket = SyntaxFactor("bracket_group", need_match=True, need_paired=True)
+    bracket.add_lexical(LexicalFactor(WordRule(start="("), "bracket"), LexicalFactor(WordRule(start=")"), "bracket"))
+    syntax_parser.add_syntax(2, bracket, need_recursion=True)
+    statement = SyntaxFactor("statement", need_match=True)
+    statement.add_lexical(LexicalFactor(None), LexicalFactor(WordRule(start=";"), "symbol"))
+    syntax_parser.add_syntax(3, statement)
+    return syntax_parser
+
+
+def build_java_format() -> FormatCode:
+    """
+    构建基准测试使用的Java格式化器
+    :return: 格式化器
+    """
+    format_code = FormatCode()
+    format_code.add_rule("statement", line_after_use=1)
+    format_code.add_rule("note", line_after_use=1, line_before_use=1)
+    format_code.add_rule("bracket", line_after_use=1, indent_after_use=1, content="{")
+    format_code.add_rule("bracket", line_before_use=1, line_after_use=1, indent_before_use=-1, content="}")
+    format_code.add_rule("bracket", right_space=False, content="(")
+    format_code.add_rule("bracket", left_space=False, content=")")
+    format_code.add_rule("symbol", left_space=False, content=",")
+    format_code.add_rule("symbol", left_space=False, content=";")
+    format_code.add_rule("symbol", left_space=False, right_space=False, content=".")
+    return format_code
+
+
+def java_source(size, seed=0) -> str:
+    """
+    生成成员很多的单个Java类
+    :param size: 字符数量
+    :param seed: 随机种子
+    :return: 源码
+    """
+    rand = random.Random(seed)
+    member = [
+        "    private static final String NAME_{0} = \"name \\\"{0}\\\"\";\n    private int count{0} = {1};\n",
+        "    /**\n     * 计算 {0}\n     */\n    public int compute{0}(int a, int b) {{\n        // 累加\n        if (a > b && count{0} != 0) {{\n"
+        "            for (int i = 0; i < a; i++) {{\n                count{0} += i * b;\n            }}\n        }} else {{\n"
+        "            count{0} = a - b;\n        }}\n        return count{0};\n    }}\n",
+        "    public String name{0}(char c) {{\n        return c == 'x' ? NAME_{0}.trim() : this.name{0}(c);\n    }}\n",
+    ]
+    result = ["package demo;\n\npublic class Demo extends Base implements Runnable {\n"]
+    length = len(result[0]) + 2
+    while length < size:
+        line = rand.choice(member).format(rand.randint(0, 100000), rand.randint(0, 100))
+        result.append(line)
+        length += len(line)
+    result.append("}\n")
+    return "".join(result)
+
+
+def script_equal(a, *b):
+    """
+    脚本中的相等判断，不输出内容
+    :param a: 左值
+    :param b: 右值
+    :return: 是否相等
+    """
+    return a == b[0]
+
+
+def script_loop(list_data, loop_index):
+    """
+    脚本中的循环，遍历列表
+    :param list_data: 列表
+    :param loop_index: 循环次数
+    :return: 是否继续，当前元素
+    """
+    if loop_index < len(list_data):
+        return True, list_data[loop_index]
+    return False, None
+
+
+def script_range(count):
+    """
+    脚本中生成序列
+    :param count: 数量
+    :return: 序列
+    """
+    return list(range(int(count)))
+
+
+def script_add(a, b):
+    """
+    脚本中的加法
+    :param a: 左值
+    :param b: 右值
+    :return: 和
+    """
+    return int(a) + int(b)
+
+
+def build_script() -> CodeScript:
+    """
+    构建基准测试使用的脚本，指令都不输出内容
+    :return: 脚本
+    """
+    script = CodeScript()
+    script.register_start_block("module {}")
+    script.register_end_block("end")
+    script.register_invoke("call {}")
+    script.register_if_block(["if {}=={}"], script_equal)
+    script.register_else_block("else")
+    script.register_end_if_block("end if")
+    script.register_loop_start(["loop {} {}"], script_loop)
+    script.register_loop_end("end loop")
+    script.register_set_local_variable("@var {}", "@var {}={}")
+    script.register_get_local_variable("@get {}", "@get {}->{}")
+    script.register_note_line("#{}")
+    script.register_command(["range {}"], script_range)
+    script.register_command(["add {} {}"], script_add)
+    return script
+
+
+def script_source(size, loop_count=10) -> str:
+    """
+    生成由模块、循环、分支和模块调用组成的脚本
+    :param size: 字符数量，按完整的片段生成
+    :param loop_count: 每个循环的次数
+    :return: 脚本
+    """
+    part = "# 片段 {0}\nmodule calc{0}\n@var total\nadd {0} 1\nend\n@var items\nrange {1}\n@get items->1\nloop {{}} i\n" \
+           "@var b\n@get i->1\nadd {{}} 2\ncall calc{0}\nif {{i}}=={0}\nadd 1 2\nelse\nadd 2 3\nend if\nend loop\n"
+    result = []
+    length = 0
+    while length < size:
+        line = part.format(len(result), loop_count)
+        result.append(line)
+        length += len(line)
+    return "".join(result)
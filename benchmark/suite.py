@@ -0,0 +1,185 @@
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmark.corpus import build_sql_parser, build_sql_syntax, build_sql_format, build_java_parser, build_java_syntax, build_java_format, build_script, \
+    sql_source, nested_source, literal_source, keyword_source, java_source, script_source
+from src.code.ParserUtil import CodeHandle
+
+SUITE_VERSION = 1
+""" 结果格式版本，用例或者统计方式变化时递增，版本不同的基线不做比较 """
+SKIP_TYPE = ["space", "line"]
+""" 词法解析跳过的类型 """
+
+
+def build_case(size):
+    """
+    构建全部用例，每个用例包含源码和所需的解析器，语料使用固定随机种子生成
+    :param size: 每个用例的源码字符数量
+    :return: 用例名称到用例的字典
+    """
+    sql = (build_sql_parser().compile(), build_sql_syntax().compile(), build_sql_format())
+    java = (build_java_parser().compile(), build_java_syntax().compile(), build_java_format())
+    nested = nested_source(32, 1)
+    return {
+        "sql_flat": (sql_source(size), *sql, {"any": {"user_info": "account_info", "age": "user_age"}}),
+        "sql_nested": (nested * (size // len(nested) + 1), *sql, {"any": {"a": "b"}}),
+        "sql_literal": (literal_source(size), *sql, {"any": {"log_info": "log"}}),
+        "sql_keyword": (keyword_source(size), *sql, {"key:select": {"select": "SELECT"}, "key:from": {"from": "FROM"}}),
+        "java_class": (java_source(size), *java, {"any": {"count": "total", "a": "left", "b": "right"}}),
+        "script": (script_source(size),),
+    }
+
+
+def percentile(data, percent):
+    """
+    按最近秩计算百分位数
+    :param data: 已排序的数据
+    :param percent: 百分位
+    :return: 百分位数
+    """
+    return data[max(0, math.ceil(percent / 100 * len(data)) - 1)]
+
+
+def measure(method, prepare, repeat, unit):
+    """
+    测量单个阶段，每次执行前准备输入，准备的耗时不计入，最后单独执行一次记录内存峰值
+    :param method: 执行的方法，参数为准备好的输入
+    :param prepare: 准备输入的方法
+    :param repeat: 重复次数
+    :param unit: 处理的单元数量，用于计算吞吐
+    :return: 统计字典
+    """
+    use_list = []
+    for _ in range(repeat):
+        data = prepare()
+        gc.collect()
+        start = time.perf_counter()
+        method(data)
+        use_list.append(time.perf_counter() - start)
+    data = prepare()
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    method(data)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    use_list.sort()
+    p50 = percentile(use_list, 50)
+    return {"unit": unit, "p50": p50, "p99": percentile(use_list, 99), "min": use_list[0], "rate": unit / p50, "peak": peak}
+
+
+def run_case(name, case, repeat):
+    """
+    分别测量用例的各个阶段
+    :param name: 用例名称
+    :param case: 用例
+    :param repeat: 重复次数
+    :return: 阶段名称到统计的字典
+    """
+    result = {}
+    if name == "script":
+        script_code = case[0]
+        unit = script_code.count("\n")
+        result["CodeScript.analyze"] = measure(lambda script: script.analyze(script_code), build_script, repeat, unit)
+        script = build_script()
+        script.analyze(script_code)
+        result["CodeScript.execute"] = measure(lambda script: script.execute(), lambda: script, repeat, unit)
+        return result
+    source_code, code_parser, syntax_parser, format_code, replace_rule = case
+    token_list = code_parser.to_token(source_code, skip_type=SKIP_TYPE)
+    unit = len(token_list)
+    tree = syntax_parser.parser(code_parser.to_token(source_code, skip_type=SKIP_TYPE))
+    replace_list = CodeHandle.replace(token_list, replace_rule)
+    result["CodeParser.to_token"] = measure(lambda _: code_parser.to_token(source_code, skip_type=SKIP_TYPE), lambda: None, repeat, unit)
+    # 语法解析会修改token类型，每次重新生成token
+    result["SyntaxParser.parser"] = measure(syntax_parser.parser, lambda: code_parser.to_token(source_code, skip_type=SKIP_TYPE), repeat, unit)
+    result["FormatCode.format"] = measure(format_code.format, lambda: tree, repeat, unit)
+    result["CodeHandle.replace"] = measure(lambda data: CodeHandle.replace(data, replace_rule), lambda: token_list, repeat, unit)
+    result["CodeHandle.join"] = measure(lambda data: CodeHandle.join(source_code, data, replace_list), lambda: token_list, repeat, unit)
+    return result
+
+
+def run_suite(size, repeat, case_name=None):
+    """
+    执行基准测试
+    :param size: 每个用例的源码字符数量
+    :param repeat: 每个阶段的重复次数
+    :param case_name: 只执行的用例名称列表，为None时全部执行
+    :return: 结果，包含环境信息和每个用例每个阶段的统计
+    """
+    result = {}
+    for name, case in build_case(size).items():
+        if case_name and name not in case_name:
+            continue
+        for stage, stat in run_case(name, case, repeat).items():
+            result[f'{name}/{stage}'] = stat
+            print(f'{name:<12}\t{stage:<20}\t{stat["unit"]:>8}\t{stat["p50"] * 1000:>10.2f}\t{stat["p99"] * 1000:>10.2f}\t'
+                  f'{stat["rate"]:>12.0f}\t{stat["peak"] / 1024 / 1024:>8.2f}')
+    return {
+        "version": SUITE_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": size,
+        "repeat": repeat,
+        "result": result,
+    }
+
+
+def compare(result, baseline, threshold):
+    """
+    与基线比较，p50耗时或者内存峰值超过基线的比例视为退化，环境和规模不同时同样比较但会提示
+    :param result: 本次结果
+    :param baseline: 基线结果
+    :param threshold: 允许的增长比例
+    :return: 退化的项目
+    """
+    if baseline.get("version") != SUITE_VERSION:
+        raise ValueError(f'基线版本{baseline.get("version")}与当前版本{SUITE_VERSION}不一致，需要重新保存基线')
+    for key in ["python", "platform", "size", "repeat"]:
+        if baseline.get(key) != result[key]:
+            print(f'提示：{key}与基线不同，{baseline.get(key)} -> {result[key]}')
+    regression = []
+    for name, stat in result["result"].items():
+        if name not in baseline["result"]:
+            continue
+        base = baseline["result"][name]
+        time_ratio = stat["p50"] / base["p50"]
+        peak_ratio = stat["peak"] / base["peak"] if base["peak"] else 1.0
+        flag = time_ratio > 1 + threshold or peak_ratio > 1 + threshold
+        print(f'{name:<34}\t耗时：{time_ratio:>6.2f}\t内存：{peak_ratio:>6.2f}\t{"退化" if flag else ""}')
+        if flag:
+            regression.append(name)
+    return regression
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="词法解析、语法解析、格式化、代码替换和脚本的基准测试")
+    parser.add_argument("--size", type=int, default=32, help="每个用例的源码大小，单位KB")
+    parser.add_argument("--repeat", type=int, default=15, help="每个阶段的重复次数")
+    parser.add_argument("--case", nargs="*", help="只执行的用例")
+    parser.add_argument("--save", help="保存结果作为基线的路径")
+    parser.add_argument("--compare", help="比较的基线路径")
+    parser.add_argument("--threshold", type=float, default=0.2, help="视为退化的增长比例")
+    args = parser.parse_args(argv)
+    print(f'{"用例":<12}\t{"阶段":<20}\t{"单元":>8}\t{"p50ms":>10}\t{"p99ms":>10}\t{"单元/s":>12}\t{"峰值MB":>8}')
+    result = run_suite(args.size * 1024, args.repeat, args.case)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regression = compare(result, json.load(file), args.threshold)
+        print(f'退化项目：{len(regression)}')
+        return 1 if regression else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
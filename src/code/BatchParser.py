@@ -0,0 +1,236 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Callable, Iterator, Iterable, Tuple
+
+from src.code.CodeParser import CodeParser, Token, TokenType
+from src.code.FormatCode import FormatCode
+from src.code.ParallelFormat import decode_tree, encode_tree
+from src.code.TokenParser import SyntaxParser
+
+
+class BatchConfig:
+
+    def __init__(self, code_parser: Callable[[], CodeParser], syntax_parser: Callable[[], SyntaxParser] | None = None, format_code: Callable[[], FormatCode] | None = None,
+                 any_type="any", skip_type=None, encoding="utf-8", need_compile=True, keep_token=False):
+        """
+        批量解析配置，解析器通过工厂方法在每个进程中构建一次，工厂方法需要是可以导入的模块级方法
+        :param code_parser: 词法解析器的工厂方法
+        :param syntax_parser: 语法解析器的工厂方法，为None时不进行语法解析
+        :param format_code: 格式化器的工厂方法，为None时不进行格式化
+        :param any_type: 未识别类型
+        :param skip_type: 跳过的类型
+        :param encoding: 文件编码
+        :param need_compile: 构建后编译解析器
+        :param keep_token: 结果中返回解析后的token
+        """
+        self.code_parser = code_parser
+        """ 词法解析器的工厂方法 """
+        self.syntax_parser = syntax_parser
+        """ 语法解析器的工厂方法 """
+        self.format_code = format_code
+        """ 格式化器的工厂方法 """
+        self.any_type = any_type
+        """ 未识别类型 """
+        self.skip_type = skip_type
+        """ 跳过的类型 """
+        self.encoding = encoding
+        """ 文件编码 """
+        self.need_compile = need_compile
+        """ 构建后编译解析器 """
+        self.keep_token = keep_token
+        """ 结果中返回解析后的token """
+
+
+class BatchResult:
+
+    def __init__(self, path):
+        """
+        单个文件的解析结果
+        :param path: 文件路径
+        """
+        self.path = path
+        """ 文件路径 """
+        self.data: str | None = None
+        """ 格式化后的代码，没有格式化器时为None """
+        self.token_count = 0
+        """ 顶层token数量 """
+        self.token_list: List[Token] | None = None
+        """ 解析后的token，只在配置保留时返回 """
+        self.error: str | None = None
+        """ 解析失败的原因 """
+        self.use_time = 0.0
+        """ 解析耗时，单位秒 """
+
+    @staticmethod
+    def from_error(path, error) -> 'BatchResult':
+        """
+        生成解析失败的结果
+        :param path: 文件路径
+        :param error: 失败的原因
+        :return: 解析结果
+        """
+        result = BatchResult(path)
+        result.error = error
+        return result
+
+
+class BatchWorker:
+
+    def __init__(self, config: BatchConfig):
+        """
+        构建解析器，每个进程只构建一次
+        :param config: 批量解析配置
+        """
+        self.config = config
+        """ 批量解析配置 """
+        self.code_parser = config.code_parser()
+        """ 词法解析器 """
+        self.syntax_parser = config.syntax_parser() if config.syntax_parser else None
+        """ 语法解析器 """
+        self.format_code = config.format_code() if config.format_code else None
+        """ 格式化器 """
+        if config.need_compile:
+            self.code_parser.compile()
+            if self.syntax_parser is not None:
+                self.syntax_parser.compile()
+
+    def parse_code(self, source_code) -> BatchResult:
+        """
+        解析源码，依次进行词法解析、语法解析、格式化
+        :param source_code: 源码
+        :return: 解析结果
+        """
+        result = BatchResult(None)
+        token_list = self.code_parser.to_token(source_code, self.config.any_type, self.config.skip_type)
+        if self.syntax_parser is not None:
+            token_list = self.syntax_parser.parser(token_list)
+        if self.format_code is not None:
+            result.data = self.format_code.format(token_list)
+        result.token_count = len(token_list)
+        if self.config.keep_token:
+            result.token_list = token_list
+        return result
+
+    def parse_file(self, path) -> BatchResult:
+        """
+        解析文件，解析失败时记录原因，不影响其他文件
+        :param path: 文件路径
+        :return: 解析结果
+        """
+        start = time.perf_counter()
+        try:
+            with open(path, encoding=self.config.encoding) as file:
+                result = self.parse_code(file.read())
+            result.path = path
+        except Exception as e:
+            result = BatchResult.from_error(path, f'{type(e).__name__}: {e}')
+        result.use_time = time.perf_counter() - start
+        return result
+
+
+_worker: BatchWorker | None = None
+""" 当前进程的解析器 """
+_init_error: str | None = None
+""" 当前进程构建解析器失败的原因 """
+
+
+def _init_worker(config: BatchConfig):
+    """
+    进程初始化，构建解析器。构建失败时只记录原因，抛出异常会使整个进程池失效
+    :param config: 批量解析配置
+    """
+    global _worker, _init_error
+    try:
+        _worker = BatchWorker(config)
+    except Exception as e:
+        _worker = None
+        _init_error = f'{type(e).__name__}: {e}'
+
+
+def _parse_chunk(path_list: List[str]) -> Tuple[List[str | None], List[BatchResult], List[tuple | None]]:
+    """
+    在进程中解析一组文件，token展开为平行列表返回，深层的语法树直接序列化会超出递归限制
+    :param path_list: 文件路径
+    :return: 类型编号对应的名称，解析结果，展开的token
+    """
+    if _worker is None:
+        return [], [BatchResult.from_error(path, _init_error) for path in path_list], [None] * len(path_list)
+    result_list = []
+    tree_list = []
+    for path in path_list:
+        result = _worker.parse_file(path)
+        tree_list.append(encode_tree(result.token_list, True) if result.token_list is not None else None)
+        result.token_list = None
+        result_list.append(result)
+    return [*TokenType.name_list], result_list, tree_list
+
+
+class BatchParser:
+
+    def __init__(self, config: BatchConfig, max_workers: int | None = None, chunk_size=8):
+        """
+        多进程批量解析
+        :param config: 批量解析配置
+        :param max_workers: 进程数量，默认为CPU数量，为1时在当前进程中解析
+        :param chunk_size: 每次提交给进程的文件数量，文件较小时减少进程间通信
+        """
+        self.config = config
+        """ 批量解析配置 """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        """ 进程数量 """
+        self.chunk_size = max(chunk_size, 1)
+        """ 每次提交给进程的文件数量 """
+
+    @staticmethod
+    def collect(path_list: str | Iterable[str], suffix: str | tuple | None = None) -> List[str]:
+        """
+        收集文件，目录会递归查找，结果按路径排序
+        :param path_list: 目录、文件或者它们的列表
+        :param suffix: 文件后缀，为None时不过滤
+        :return: 文件路径
+        """
+        if isinstance(path_list, str):
+            path_list = [path_list]
+        file_list = []
+        for path in path_list:
+            if os.path.isdir(path):
+                for root, _, name_list in os.walk(path):
+                    file_list.extend(os.path.join(root, name) for name in name_list if suffix is None or name.endswith(suffix))
+            else:
+                file_list.append(path)
+        file_list.sort()
+        return file_list
+
+    def run(self, path_list: str | Iterable[str], suffix: str | tuple | None = None) -> Iterator[BatchResult]:
+        """
+        批量解析文件，按完成顺序返回结果
+        :param path_list: 目录、文件或者它们的列表
+        :param suffix: 文件后缀，为None时不过滤
+        :return: 解析结果
+        """
+        file_list = self.collect(path_list, suffix)
+        if self.max_workers == 1:
+            try:
+                worker = BatchWorker(self.config)
+            except Exception as e:
+                for path in file_list:
+                    yield BatchResult.from_error(path, f'{type(e).__name__}: {e}')
+                return
+            for path in file_list:
+                yield worker.parse_file(path)
+            return
+        chunk_list = [file_list[index:index + self.chunk_size] for index in range(0, len(file_list), self.chunk_size)]
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker, initargs=(self.config,)) as executor:
+            future_list = [executor.submit(_parse_chunk, chunk) for chunk in chunk_list]
+            try:
+                for future in as_completed(future_list):
+                    name_list, result_list, tree_list = future.result()
+                    for result, tree in zip(result_list, tree_list):
+                        if tree is not None:
+                            result.token_list = decode_tree(name_list, tree)
+                        yield result
+            finally:
+                # 提前停止迭代时，不再解析尚未开始的文件
+                for future in future_list:
+                    future.cancel()
@@ -1,5 +1,17 @@
+import codecs
+import mmap
+import re
+import threading
 import time
-from typing import List, Dict
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import List, Dict, Tuple, Iterator
+
+from src.code.ParserProfile import ParserProfile, RuleStat
+
+BYTE_ENCODING = ("utf-8", "ascii", "iso8859-1")
+""" 字节模式支持的编码，编码后的因子只会从字符的第一个字节开始匹配 """
 
 
 class MatchRule:
@@ -36,38 +48,141 @@ class IndexTree:
             return self.children[key]
 
     def __init__(self):
-        self.root: IndexTree._TreeNode = self._TreeNode()
+        self._root: IndexTree._TreeNode | None = self._TreeNode()
         """ 根节点 """
-        self.match_node = self.root
+        self._fold_root: IndexTree._TreeNode | None = self._TreeNode()
+        """ 忽略大小写的根节点，路径为折叠后的字符，每个字符只有一个节点 """
+        self.fold_map: Dict[str, str] = {}
+        """ 忽略大小写的规则中出现的字符的各种大小写形式，对应折叠后的字符 """
+        self._state: Tuple[List[Dict[str, int]], List[list], Dict[str, str]] | None = None
+        """ 反序列化后尚未重建节点的子节点表 """
+        self.match_node = self._root
         """ 当前匹配节点 """
+        self.fold_node = None
+        """ 忽略大小写的当前匹配节点 """
+
+    def _rebuild(self):
+        """ 反序列化后根据子节点表重建节点 """
+        children_list, end_list, self.fold_map = self._state
+        node_list = [IndexTree._TreeNode() for _ in children_list]
+        for node, children, end in zip(node_list, children_list, end_list):
+            node.children = {now_char: node_list[index] for now_char, index in children.items()}
+            node.end = end
+        self._root, self._fold_root = node_list[0], node_list[1]
+        self._state = None
+
+    @property
+    def root(self) -> _TreeNode:
+        """ 根节点，反序列化后在首次访问时重建 """
+        if self._root is None:
+            self._rebuild()
+        return self._root
+
+    @property
+    def fold_root(self) -> _TreeNode:
+        """ 忽略大小写的根节点，反序列化后在首次访问时重建 """
+        if self._root is None:
+            self._rebuild()
+        return self._fold_root
 
     def reset(self):
         self.match_node = self.root
+        self.fold_node = self._fold_root if self._fold_root.children else None
+
+    def __getstate__(self):
+        """ 序列化时将节点展开为按层排列的子节点表，避免逐个保存节点对象，下标0和1分别为两个根节点 """
+        if self._root is None:
+            return self._state
+        node_index = {id(self._root): 0, id(self._fold_root): 1}
+        node_list = [self._root, self._fold_root]
+        children_list = []
+        for node in node_list:
+            children = {}
+            for now_char, child in node.children.items():
+                if id(child) not in node_index:
+                    node_index[id(child)] = len(node_list)
+                    node_list.append(child)
+                children[now_char] = node_index[id(child)]
+            children_list.append(children)
+        return children_list, [node.end for node in node_list], self.fold_map
+
+    def __setstate__(self, state):
+        """ 反序列化时只保存子节点表，编译模式下不需要重建节点 """
+        self._root = None
+        self._fold_root = None
+        self._state = state
+        self.fold_map = state[2]
+        self.match_node = None
+        self.fold_node = None
+
+    def depth(self):
+        """
+        最长前缀的长度，即一次前缀匹配最多读取的字符数
+        :return: 长度
+        """
+        if self._root is None:
+            # 子节点表按层排列，逐层计算
+            children_list = self._state[0]
+            node_depth = [0] * len(children_list)
+            for index, children in enumerate(children_list):
+                for child in children.values():
+                    node_depth[child] = node_depth[index] + 1
+            return max(node_depth)
+        max_depth = 0
+        node_stack = [(self.root, 0), (self.fold_root, 0)]
+        while node_stack:
+            node, now_depth = node_stack.pop()
+            max_depth = max(max_depth, now_depth)
+            node_stack.extend((child, now_depth + 1) for child in node.children.values())
+        return max_depth
+
+    def first_char(self) -> set:
+        """
+        能够作为起始的字符，忽略大小写时包含各种大小写形式
+        :return: 字符集合
+        """
+        first_char = set(self.root.children)
+        fold_children = self.fold_root.children
+        first_char.update(now_char for now_char, fold_char in self.fold_map.items() if fold_char in fold_children)
+        return first_char
+
+    @staticmethod
+    def start_pattern(first_char) -> re.Pattern:
+        """
+        能够作为起始的字符组成的正则，查找时在C层跳过整段不可能作为起始的字符
+        :param first_char: 能够作为起始的字符
+        :return: 正则
+        """
+        if not first_char:
+            return re.compile(r'(?!)')
+        # 字节模式下字符为整数，生成字节正则
+        if isinstance(next(iter(first_char)), int):
+            return re.compile(b"[" + b"".join(re.escape(bytes((now_char,))) for now_char in sorted(first_char)) + b"]")
+        return re.compile("[" + "".join(re.escape(now_char) for now_char in sorted(first_char)) + "]")
 
     @staticmethod
     def _to_match_rule(data: str, need_match=False, ignore_case=False):
-        if isinstance(data, str):
+        if isinstance(data, (str, bytes)):
             return MatchRule(data, need_match, ignore_case)
         return data
 
     @staticmethod
-    def create_index(key, start_node: _TreeNode, match_rule: MatchRule):
-        node_list = set()
-        node_list.add(start_node)
-        for now_char in match_rule.data:
-            next_node = set()
-            # 忽略大小写情况，对所有路径进行添加
-            for now_node in node_list:
-                if match_rule.ignore_case:
-                    next_node.add(now_node.add(now_char.lower()))
-                    next_node.add(now_node.add(now_char.upper()))
-                else:
-                    next_node.add(now_node.add(now_char))
-            node_list = next_node
+    def fold_char(now_char):
+        """
+        折叠字符的大小写，转为小写后不是单个字符时保持原样
+        :param now_char: 字符
+        :return: 折叠后的字符
+        """
+        lower_char = now_char.lower()
+        return lower_char if len(lower_char) == 1 else now_char
 
-        for now_node in node_list:
-            now_node.end.append(key)
-        return node_list
+    @staticmethod
+    def create_index(key, start_node: _TreeNode, data):
+        now_node = start_node
+        for now_char in data:
+            now_node = now_node.add(now_char)
+        now_node.end.append(key)
+        return now_node
 
     def add(self, key, start_data: MatchRule | str):
         """
@@ -76,19 +191,45 @@ class IndexTree:
         :param start_data: 数据
         """
         start_data = self._to_match_rule(start_data)
-        self.create_index(key, self.root, start_data)
+        if not start_data.ignore_case:
+            self.create_index(key, self.root, start_data.data)
+            return
+        if isinstance(start_data.data, bytes):
+            # 字节模式下只折叠ASCII字母
+            for case_byte in start_data.data + start_data.data.lower() + start_data.data.upper():
+                self.fold_map[case_byte] = bytes((case_byte,)).lower()[0]
+            self.create_index(key, self.fold_root, start_data.data.lower())
+            return
+        # 忽略大小写时记录字符的各种大小写形式，匹配时输入字符只需折叠一次
+        for now_char in start_data.data:
+            for case_char in (now_char, now_char.lower(), now_char.upper()):
+                if len(case_char) == 1:
+                    self.fold_map[case_char] = self.fold_char(case_char)
+        self.create_index(key, self.fold_root, "".join(self.fold_char(now_char) for now_char in start_data.data))
 
     def match(self, now_char):
         """
         迭代匹配
         :param now_char:当前字符
         """
-        is_match = now_char in self.match_node.children
-        result = []
-        if is_match:
-            self.match_node = self.match_node.children[now_char]
-            result = self.match_node.end
-        return result, not is_match or not self.match_node.children
+        match_node = self.match_node
+        if match_node is not None:
+            match_node = self.match_node = match_node.children.get(now_char)
+        fold_node = self.fold_node
+        if fold_node is None:
+            if match_node is None:
+                return [], True
+            return match_node.end, not match_node.children
+        fold_node = self.fold_node = fold_node.children.get(self.fold_map.get(now_char))
+        if fold_node is None:
+            if match_node is None:
+                return [], True
+            return match_node.end, not match_node.children
+        if match_node is None:
+            return fold_node.end, not fold_node.children
+        # 因子下标即注册顺序，两棵树的结果按下标合并
+        result = sorted(match_node.end + fold_node.end) if match_node.end and fold_node.end else match_node.end or fold_node.end
+        return result, not match_node.children and not fold_node.children
 
 
 class IterativeMatch:
@@ -147,6 +288,53 @@ class IterativeMatch:
         return True, is_equal
 
 
+class TokenType:
+    """ 全局类型注册表，规则注册时将类型名称驻留为整数编号，编号0固定为None """
+    name_list: List[str | None] = [None]
+    """ 编号对应的类型名称 """
+    name_index: Dict[str | None, int] = {None: 0}
+    """ 类型名称对应的编号 """
+    lock = threading.Lock()
+    """ 注册新类型时加锁，多个线程同时注册不会得到相同的编号 """
+
+    @staticmethod
+    def get_id(name) -> int:
+        """
+        获取类型编号，不存在则注册
+        :param name: 类型名称
+        :return: 编号
+        """
+        type_id = TokenType.name_index.get(name)
+        if type_id is None:
+            with TokenType.lock:
+                type_id = TokenType.name_index.get(name)
+                if type_id is None:
+                    type_id = len(TokenType.name_list)
+                    TokenType.name_list.append(name)
+                    TokenType.name_index[name] = type_id
+        return type_id
+
+    @staticmethod
+    def get_name(type_id) -> str | None:
+        """
+        获取编号对应的类型名称
+        :param type_id: 编号
+        :return: 类型名称
+        """
+        return TokenType.name_list[type_id]
+
+    @staticmethod
+    def get_ids(name_list) -> frozenset:
+        """
+        获取多个类型的编号集合
+        :param name_list: 类型名称，单个字符串视为一个类型
+        :return: 编号集合
+        """
+        if isinstance(name_list, str) or name_list is None:
+            return frozenset((TokenType.get_id(name_list),))
+        return frozenset(TokenType.get_id(name) for name in name_list)
+
+
 class TokenRule:
 
     def __init__(self, status, start, end, need_escape=False, next_parser=None, self_mark=None, count_start=None, count_end=None, next_all_match=False):
@@ -168,6 +356,8 @@ class TokenRule:
         """ 结束 """
         self.status = status
         """ 状态 """
+        self.status_id = TokenType.get_id(status)
+        """ 状态的类型编号 """
         self.need_escape = need_escape
         """ 需要转义 """
         self.next_parser = next_parser
@@ -181,15 +371,43 @@ class TokenRule:
         self.next_all_match = next_all_match
         """ 下一层全部重新解析 """
 
+    def __getstate__(self):
+        """ 序列化时不保存类型编号，类型编号只在当前进程有效 """
+        state = self.__dict__.copy()
+        del state["status_id"]
+        return state
+
+    def __setstate__(self, state):
+        """ 反序列化时在当前进程重新登记类型 """
+        self.__dict__.update(state)
+        self.status_id = TokenType.get_id(self.status)
+
 
 class MatchToken:
-    def __init__(self, token_rule: TokenRule):
+    ESCAPE_CHAR = {"\\": "\\", "n": "\n", "t": "\t"}
+    """ 转义字符映射，未列出的字符保留反斜杠 """
+
+    def __init__(self, token_rule: TokenRule, source_code="", start_index=0):
+        """
+        组合因子结尾匹配
+        :param token_rule: 因子
+        :param source_code: 源码
+        :param start_index: 内容的起始位置
+        """
         self.token_rule: TokenRule = token_rule
         """ 因子 """
         self.end_match = IterativeMatch(self.token_rule.end)
         """ 结尾匹配 """
-        self.cache = ""
-        """ 缓存中间字符 """
+        self.source_code = source_code
+        """ 源码 """
+        self.start_index = start_index
+        """ 内容的起始位置 """
+        self.now_index = start_index
+        """ 下一个字符的位置 """
+        self.cache: List[str] | None = None
+        """ 出现转义后才缓存的内容片段 """
+        self.cache_start = start_index
+        """ 尚未写入缓存的起始位置 """
         self.escape = False
         """ 转义字符状态 """
         self.end_index = -1
@@ -213,41 +431,93 @@ class MatchToken:
         """
         if self.token_rule.end is None:
             return False, True
+        self.now_index += 1
         # 转义字符
         if self.token_rule.need_escape:
             if self.escape:
-                escape_char = f'\\{next_char}'
-                if escape_char == "\\\\":
-                    self.cache += f'\\'
-                elif escape_char == "\\n":
-                    self.cache += f'\n'
-                elif escape_char == "\\t":
-                    self.cache += f'\t'
-                else:
-                    self.cache += escape_char
+                if self.cache is None:
+                    self.cache = []
+                # 反斜杠之前的内容与转义后的字符
+                self.cache.append(self.source_code[self.cache_start:self.now_index - 2])
+                self.cache.append(self.ESCAPE_CHAR.get(next_char, f'\\{next_char}'))
+                self.cache_start = self.now_index
                 self.escape = False
                 return True, False
             if next_char == "\\" and not self.escape:
                 self.escape = True
                 return True, False
 
-        self.cache += next_char
         similar, equal = self.end_match.match(next_char, self)
         equal = equal and self.start_count == self.end_count
         if equal:
-            self.cache = self.cache[0:len(self.cache) - len(self.token_rule.end)]
+            self.end_index = self.now_index - 1
         return True, equal
 
+    def to_result(self) -> 'MatchResult':
+        """
+        生成匹配结果，没有转义时只记录内容在源码中的位置
+        :return: 匹配结果
+        """
+        end_length = len(self.token_rule.end)
+        if self.cache is None:
+            return MatchResult(self.token_rule, self.now_index - 1, source_code=self.source_code, data_start=self.start_index, data_end=self.now_index - end_length)
+        data = "".join(self.cache) + self.source_code[self.cache_start:self.now_index]
+        return MatchResult(self.token_rule, self.now_index - 1, data[0:len(data) - end_length])
+
 
 class MatchResult:
 
-    def __init__(self, token_rule: TokenRule, end_index: int, data: str = ""):
+    def __init__(self, token_rule: TokenRule, end_index: int, data: str = "", source_code: str | None = None, data_start=0, data_end=0):
         self.token_rule = token_rule
         self.end_index = end_index
+        self._data = data
+        self.source_code = source_code
+        """ 内容未生成时引用的源码 """
+        self.data_start = data_start
+        """ 内容在源码中的起始位置 """
+        self.data_end = data_end
+        """ 内容在源码中的结束位置 """
+
+    @property
+    def data(self) -> str:
+        """ 内容，引用源码时在访问才切片 """
+        if self.source_code is not None:
+            return self.source_code[self.data_start:self.data_end]
+        return self._data
+
+    def data_length(self):
+        """
+        内容长度，不生成内容
+        :return: 长度
+        """
+        if self.source_code is not None:
+            return self.data_end - self.data_start
+        return len(self._data)
+
+
+class ByteSource:
+    """ 字节源码，token内容引用其中的片段，访问时才解码 """
+    __slots__ = ("data", "encoding")
+
+    def __init__(self, data, encoding):
+        """
+        :param data: bytes、bytearray或者mmap
+        :param encoding: 编码
+        """
         self.data = data
+        """ 字节源码 """
+        self.encoding = encoding
+        """ 编码 """
+
+    def __getitem__(self, index):
+        return str(self.data[index], self.encoding)
+
+    def __len__(self):
+        return len(self.data)
 
 
 class Token:
+    __slots__ = ("type_id", "_token_tree", "start", "end", "_data", "_source", "_data_start", "_data_end", "end_index", "line_start", "line_end", "column")
 
     @staticmethod
     def start_type(any_type, data, index):
@@ -273,6 +543,23 @@ class Token:
         token.type = any_type
         return token
 
+    @staticmethod
+    def slice_token(any_type, source_code, data_start, data_end, index):
+        """
+        内容引用源码片段的token
+        :param any_type: 类型
+        :param source_code: 源码
+        :param data_start: 内容的起始位置
+        :param data_end: 内容的结束位置
+        :param index: 源文件字符位置
+        :return: token
+        """
+        token = Token()
+        token.end_index = index
+        token.set_source(source_code, data_start, data_end)
+        token.type = any_type
+        return token
+
     @staticmethod
     def create(token_type: str, token_start: str | None = None, token_data: str | None = "", token_end: str | None = None):
         """
@@ -291,32 +578,132 @@ class Token:
         return token
 
     def __init__(self, match_factor: MatchResult = None):
-        self.type = None
-        """ 类型 """
-        self.token_tree: List[Token] = []
-        """ Token树 """
+        self.type_id = 0
+        """ 类型编号，名称见TokenType """
+        self._token_tree: List[Token] | None = None
+        """ Token树，叶子节点不创建列表 """
         self.start = None
         """ 开始 """
         self.end = None
         """ 结束 """
-        self.data = ""
+        self._data = ""
         """ 内容 """
-        self.type = None
-        """ 类型 """
+        self._source: str | None = None
+        """ 内容尚未生成时引用的源码 """
+        self._data_start = 0
+        """ 内容在源码中的起始位置 """
+        self._data_end = 0
+        """ 内容在源码中的结束位置 """
         self.end_index = None
         """ 源文件字符位置 """
         self.line_start = None
         """ 源文件出现的起始行 """
         self.line_end = None
         """ 源文件出现的结束行 """
+        self.column = None
+        """ 源文件出现的起始列 """
 
         if match_factor is not None:
             self.start = match_factor.token_rule.start
             self.end = match_factor.token_rule.end
-            self.data = match_factor.data
-            self.type = match_factor.token_rule.status
+            if match_factor.source_code is None:
+                self._data = match_factor.data
+            else:
+                self.set_source(match_factor.source_code, match_factor.data_start, match_factor.data_end)
+            self.type_id = match_factor.token_rule.status_id
             self.end_index = match_factor.end_index
 
+    def __getstate__(self):
+        """ 序列化时保存类型名称，类型编号只在当前进程有效 """
+        return self.type, self._token_tree, self.start, self.end, self.data, self.end_index, self.line_start, self.line_end, self.column
+
+    def __setstate__(self, state):
+        """ 反序列化时在当前进程重新登记类型 """
+        token_type, self._token_tree, self.start, self.end, self._data, self.end_index, self.line_start, self.line_end, self.column = state
+        self.type_id = TokenType.get_id(token_type)
+        self._source = None
+        self._data_start = 0
+        self._data_end = 0
+
+    @property
+    def type(self) -> str | None:
+        """ 类型 """
+        return TokenType.name_list[self.type_id]
+
+    @type.setter
+    def type(self, token_type: str | None):
+        self.type_id = TokenType.get_id(token_type)
+
+    @property
+    def data(self) -> str:
+        """ 内容，引用源码时在首次访问才生成 """
+        if self._source is not None:
+            self._data = self._source[self._data_start:self._data_end]
+            self._source = None
+        return self._data
+
+    @data.setter
+    def data(self, data: str):
+        self._data = data
+        self._source = None
+
+    def set_source(self, source_code, data_start, data_end):
+        """
+        内容引用源码片段，访问时才生成
+        :param source_code: 源码
+        :param data_start: 内容的起始位置
+        :param data_end: 内容的结束位置
+        """
+        self._source = source_code
+        self._data_start = data_start
+        self._data_end = data_end
+
+    def load_data(self):
+        """
+        立即生成内容，不再引用源码
+        :return: 自身
+        """
+        if self._source is not None:
+            self._data = self._source[self._data_start:self._data_end]
+            self._source = None
+        return self
+
+    def data_length(self):
+        """
+        内容长度，不生成内容，引用字节源码时为字节数
+        :return: 长度
+        """
+        if self._source is not None:
+            return self._data_end - self._data_start
+        return len(self._data)
+
+    def peek_data(self) -> str:
+        """
+        读取内容但不保存，引用源码时token仍然延迟生成
+        :return: 内容
+        """
+        if self._source is not None:
+            return self._source[self._data_start:self._data_end]
+        return self._data
+
+    @property
+    def token_tree(self) -> List['Token']:
+        """ Token树，首次访问时才创建列表 """
+        if self._token_tree is None:
+            self._token_tree = []
+        return self._token_tree
+
+    @token_tree.setter
+    def token_tree(self, token_tree: List['Token']):
+        self._token_tree = token_tree
+
+    def has_tree(self):
+        """
+        是否存在子节点，不会为叶子节点创建列表
+        :return: True/False
+        """
+        return bool(self._token_tree)
+
     def add_tree(self, token):
         """
         添加树
@@ -335,6 +722,330 @@ class Token:
         self.token_tree.append(Token.create(token_type, token_start, token_data, token_end))
 
 
+class TokenTable:
+    """ 列式存储的token表，以平行数组保存token信息，通过TokenView访问 """
+
+    def __init__(self, source_code: str | None = None):
+        """
+        构建空的token表
+        :param source_code: 源码，内容与源码一致的token只记录偏移
+        """
+        self.source_code = source_code
+        """ 源码 """
+        self.text_list: List[str | None] = []
+        """ 开始结束字符，以及无法引用源码的内容 """
+        self.text_index: Dict[str | None, int] = {}
+        """ 文本对应的编号 """
+        self.type_id = array("i")
+        """ 类型编号，与TokenType一致 """
+        self.start_id = array("i")
+        """ 开始字符编号 """
+        self.end_id = array("i")
+        """ 结束字符编号 """
+        self.data_start = array("q")
+        """ 内容在源码中的起始位置，为-1时内容在文本中 """
+        self.data_end = array("q")
+        """ 内容在源码中的结束位置，或者文本编号 """
+        self.end_index = array("q")
+        """ 源文件字符位置 """
+        self.line_start = array("i")
+        """ 源文件出现的起始行 """
+        self.line_end = array("i")
+        """ 源文件出现的结束行 """
+        self.column = array("i")
+        """ 源文件出现的起始列 """
+        self.child_start = array("q")
+        """ 子节点在表中的起始下标 """
+        self.child_count = array("i")
+        """ 子节点数量 """
+        self.root_count = 0
+        """ 顶层token数量，顶层token位于表的最前面 """
+
+    def __getstate__(self):
+        """ 序列化时类型编号转为表内的类型名称下标，类型编号只在当前进程有效 """
+        state = self.__dict__.copy()
+        name_index = {}
+        state["type_id"] = array("i", (name_index.setdefault(type_id, len(name_index)) for type_id in self.type_id))
+        state["type_name"] = [TokenType.get_name(type_id) for type_id in name_index]
+        return state
+
+    def __setstate__(self, state):
+        """ 反序列化时在当前进程重新登记类型 """
+        id_list = [TokenType.get_id(name) for name in state.pop("type_name")]
+        self.__dict__.update(state)
+        self.type_id = array("i", (id_list[index] for index in self.type_id))
+
+    @staticmethod
+    def _intern(data, data_list: list, data_index: dict) -> int:
+        """
+        获取数据的编号，不存在则添加
+        :param data: 数据
+        :param data_list: 数据列表
+        :param data_index: 编号索引
+        :return: 编号
+        """
+        if data not in data_index:
+            data_index[data] = len(data_list)
+            data_list.append(data)
+        return data_index[data]
+
+    def get_text_id(self, text) -> int:
+        """
+        获取文本编号
+        :param text: 文本
+        :return: 编号
+        """
+        return self._intern(text, self.text_list, self.text_index)
+
+    def set_data(self, index, data):
+        """
+        设置内容，与源码一致时只记录偏移
+        :param index: 下标
+        :param data: 内容
+        """
+        end_index = self.end_index[index]
+        if data is not None and self.source_code is not None and end_index >= 0:
+            data_end = end_index + 1
+            if self.end_id[index] != 0:
+                data_end -= len(self.text_list[self.end_id[index]])
+            data_start = data_end - len(data)
+            if data_start >= 0 and self.source_code.startswith(data, data_start) and data_end <= len(self.source_code):
+                self.data_start[index] = data_start
+                self.data_end[index] = data_end
+                return
+        self.data_start[index] = -1
+        self.data_end[index] = self.get_text_id(data)
+
+    def append(self, token) -> int:
+        """
+        添加token，不处理子节点
+        :param token: token
+        :return: 在表中的下标
+        """
+        if not self.text_list:
+            self.get_text_id(None)
+        index = len(self.type_id)
+        self.type_id.append(token.type_id)
+        self.start_id.append(self.get_text_id(token.start))
+        self.end_id.append(self.get_text_id(token.end))
+        self.end_index.append(-1 if token.end_index is None else token.end_index)
+        self.data_start.append(-1)
+        self.data_end.append(0)
+        self.set_data(index, token.data)
+        self.line_start.append(-1 if token.line_start is None else token.line_start)
+        self.line_end.append(-1 if token.line_end is None else token.line_end)
+        self.column.append(-1 if token.column is None else token.column)
+        self.child_start.append(0)
+        self.child_count.append(0)
+        return index
+
+    @staticmethod
+    def from_tokens(token_list, source_code: str | None = None) -> 'TokenTable':
+        """
+        将token树转为表，按层序存储，同一节点的子节点在表中连续
+        :param token_list: token列表或者token迭代器
+        :param source_code: 源码
+        :return: token表
+        """
+        table = TokenTable(source_code)
+        # 层序遍历中尚未展开子节点的token
+        wait_list = []
+        for token in token_list:
+            table.append(token)
+            table.root_count += 1
+            wait_list.append(token if token.has_tree() else None)
+        index = 0
+        while index < len(wait_list):
+            token = wait_list[index]
+            if token is not None:
+                table.child_start[index] = len(wait_list)
+                table.child_count[index] = len(token.token_tree)
+                for child in token.token_tree:
+                    table.append(child)
+                    wait_list.append(child if child.has_tree() else None)
+            wait_list[index] = None
+            index += 1
+        return table
+
+    def view(self, index) -> 'TokenView':
+        """
+        获取表中任意下标的视图
+        :param index: 下标
+        :return: 视图
+        """
+        return TokenView(self, index)
+
+    def __len__(self):
+        return self.root_count
+
+    def __getitem__(self, item) -> 'TokenView':
+        if item < 0:
+            item += self.root_count
+        if not 0 <= item < self.root_count:
+            raise IndexError(item)
+        return TokenView(self, item)
+
+    def __iter__(self):
+        for index in range(self.root_count):
+            yield TokenView(self, index)
+
+
+class TokenView:
+    """ TokenTable中单个token的轻量视图，属性与Token一致 """
+    __slots__ = ("table", "index", "_token_tree")
+
+    def __init__(self, table: TokenTable, index):
+        self.table = table
+        """ 所在的表 """
+        self.index = index
+        """ 在表中的下标 """
+        self._token_tree: List[TokenView | Token] | None = None
+        """ 子节点，首次访问时创建 """
+
+    def __getstate__(self):
+        """ 类型编号保存在表中，序列化表时按名称转换 """
+        return self.table, self.index, self._token_tree
+
+    def __setstate__(self, state):
+        self.table, self.index, self._token_tree = state
+
+    @property
+    def type(self):
+        return TokenType.name_list[self.table.type_id[self.index]]
+
+    @type.setter
+    def type(self, token_type):
+        self.table.type_id[self.index] = TokenType.get_id(token_type)
+
+    @property
+    def type_id(self):
+        return self.table.type_id[self.index]
+
+    @type_id.setter
+    def type_id(self, type_id):
+        self.table.type_id[self.index] = type_id
+
+    @property
+    def start(self):
+        return self.table.text_list[self.table.start_id[self.index]]
+
+    @start.setter
+    def start(self, start):
+        self.table.start_id[self.index] = self.table.get_text_id(start)
+
+    @property
+    def end(self):
+        return self.table.text_list[self.table.end_id[self.index]]
+
+    @end.setter
+    def end(self, end):
+        self.table.end_id[self.index] = self.table.get_text_id(end)
+
+    @property
+    def data(self):
+        data_start = self.table.data_start[self.index]
+        if data_start < 0:
+            return self.table.text_list[self.table.data_end[self.index]]
+        return self.table.source_code[data_start:self.table.data_end[self.index]]
+
+    @data.setter
+    def data(self, data):
+        self.table.set_data(self.index, data)
+
+    def data_length(self):
+        """
+        内容长度，视图不缓存内容
+        :return: 长度
+        """
+        return len(self.data)
+
+    def peek_data(self) -> str:
+        """
+        读取内容，视图不缓存内容，与data相同
+        :return: 内容
+        """
+        return self.data
+
+    @property
+    def end_index(self):
+        end_index = self.table.end_index[self.index]
+        return None if end_index < 0 else end_index
+
+    @end_index.setter
+    def end_index(self, end_index):
+        self.table.end_index[self.index] = -1 if end_index is None else end_index
+
+    @property
+    def line_start(self):
+        line_start = self.table.line_start[self.index]
+        return None if line_start < 0 else line_start
+
+    @line_start.setter
+    def line_start(self, line_start):
+        self.table.line_start[self.index] = -1 if line_start is None else line_start
+
+    @property
+    def line_end(self):
+        line_end = self.table.line_end[self.index]
+        return None if line_end < 0 else line_end
+
+    @line_end.setter
+    def line_end(self, line_end):
+        self.table.line_end[self.index] = -1 if line_end is None else line_end
+
+    @property
+    def column(self):
+        column = self.table.column[self.index]
+        return None if column < 0 else column
+
+    @column.setter
+    def column(self, column):
+        self.table.column[self.index] = -1 if column is None else column
+
+    @property
+    def token_tree(self) -> List['TokenView | Token']:
+        """ 子节点视图，首次访问时创建 """
+        if self._token_tree is None:
+            child_start = self.table.child_start[self.index]
+            self._token_tree = [TokenView(self.table, index) for index in range(child_start, child_start + self.table.child_count[self.index])]
+        return self._token_tree
+
+    @token_tree.setter
+    def token_tree(self, token_tree):
+        self._token_tree = token_tree
+
+    def has_tree(self):
+        """
+        是否存在子节点
+        :return: True/False
+        """
+        if self._token_tree is None:
+            return self.table.child_count[self.index] > 0
+        return bool(self._token_tree)
+
+    def add_tree(self, token):
+        """
+        添加树
+        :param token: Token节点
+        """
+        self.token_tree.append(token)
+
+    def to_token(self) -> Token:
+        """
+        转为独立的Token
+        :return: Token
+        """
+        token = Token.create(self.type, self.start, self.data, self.end)
+        token.data = self.data
+        token.end_index = self.end_index
+        token.line_start = self.line_start
+        token.line_end = self.line_end
+        token.column = self.column
+        for child in self.token_tree:
+            token.add_tree(child.to_token() if isinstance(child, TokenView) else child)
+        return token
+
+
 class ParserMatch:
 
     def __init__(self):
@@ -344,6 +1055,17 @@ class ParserMatch:
         """ 前缀匹配索引 """
         self.match_index = {}
         """ 后缀匹配器索引 """
+        self.need_more = False
+        """ 上一次匹配到源码结尾仍未确定结果，需要更多字符 """
+        self._start_pattern: re.Pattern | None = None
+        """ 能够作为起始的字符组成的正则，注册因子后重新生成 """
+
+    @property
+    def start_pattern(self) -> re.Pattern:
+        """ 能够作为起始的字符组成的正则 """
+        if self._start_pattern is None:
+            self._start_pattern = IndexTree.start_pattern(self.index_tree.first_char())
+        return self._start_pattern
 
     def add_rule(self, status, start, end=None, next_parser=None, self_mark=None, need_escape=False, count_start=None, count_end=None, next_all_match=False):
         """
@@ -360,10 +1082,23 @@ class ParserMatch:
         """
         self.data.append(TokenRule(status, start, end, need_escape, next_parser=next_parser, self_mark=self_mark, count_start=count_start, count_end=count_end, next_all_match=next_all_match))
         self.index_tree.add(len(self.data) - 1, start)
+        self._start_pattern = None
         if end:
             self.match_index[len(self.data) - 1] = self.data[-1]
 
-    def match(self, index, source_code) -> List[MatchResult]:
+    def match(self, index, source_code, rule_stat: Dict[TokenRule, RuleStat] | None = None, shared_stat: RuleStat | None = None) -> List[MatchResult]:
+        """
+        匹配从下标开始的全部因子
+        :param index: 下标
+        :param source_code: 源码
+        :param rule_stat: 因子到统计的映射，为None时不记录，记录每个因子的尝试次数和查找结尾的耗时
+        :param shared_stat: 前缀查找等全部因子共用部分的统计
+        :return: 匹配结果
+        """
+        if rule_stat is not None:
+            shared_stat.tried += 1
+            start = time.perf_counter()
+            rule_use = 0.0
         self.index_tree.reset()
         result: List[MatchResult] = []
         judge_match: List[MatchToken] = []
@@ -373,10 +1108,17 @@ class ParserMatch:
             now_char = source_code[index]
 
             for match in judge_match:
-                similar, equal = match.prefix_end(now_char)
+                if rule_stat is None:
+                    similar, equal = match.prefix_end(now_char)
+                else:
+                    rule_start = time.perf_counter()
+                    similar, equal = match.prefix_end(now_char)
+                    use = time.perf_counter() - rule_start
+                    rule_stat[match.token_rule].time += use
+                    rule_use += use
                 # 前缀相同则放入符合因子中
                 if equal:
-                    result.append(MatchResult(match.token_rule, index, match.cache))
+                    result.append(match.to_result())
                 # 相似则需要进一步判断
                 elif similar:
                     next_match.append(match)
@@ -385,21 +1127,545 @@ class ParserMatch:
             if not is_over:
                 key_list, is_over = self.index_tree.match(now_char)
                 for key in key_list:
+                    if rule_stat is not None:
+                        rule_stat[self.data[key]].tried += 1
                     if key in self.match_index:
-                        match_factor = MatchToken(self.data[key])
+                        match_factor = MatchToken(self.data[key], source_code, index + 1)
                         judge_match.append(match_factor)
                     else:
                         result.append(MatchResult(self.data[key], index))
             if is_over and not judge_match:
                 break
             index += 1
+        self.need_more = index >= len(source_code) and (not is_over or len(judge_match) > 0)
+        if rule_stat is not None:
+            shared_stat.time += time.perf_counter() - start - rule_use
+        return result
+
+
+class CompiledMatch:
+    """ 编译后的表驱动匹配器，匹配结果与ParserMatch完全一致 """
+
+    def __init__(self, parser_match: ParserMatch, encoding: str | None = None):
+        """
+        将前缀树与结尾规则编译为状态表
+        :param parser_match: 原始匹配器
+        :param encoding: 因子为字节序列时源码的编码，为None时匹配字符串
+        """
+        self.encoding = encoding
+        """ 因子为字节序列时源码的编码 """
+        self.data: List[TokenRule] = parser_match.data
+        """ 全部因子信息 """
+        self.transition: List[Dict[str, int]] = []
+        """ 状态转移表，下标为状态 """
+        self.accept: List[Tuple[int, ...]] = []
+        """ 到达该状态时命中的因子 """
+        self.end_rule: Dict[int, Tuple[str, re.Pattern | None]] = {}
+        """ 组合因子的结尾扫描方式 """
+        self.first_char = set()
+        """ 能够作为起始的字符 """
+        self.need_more = False
+        """ 上一次匹配到源码结尾仍未确定结果，需要更多字符 """
+        self._compile_tree(parser_match.index_tree)
+        for key in parser_match.match_index:
+            self.end_rule[key] = self._compile_end(self.data[key])
+        self.first_char.update(self.transition[0].keys())
+        self.start_pattern = IndexTree.start_pattern(self.first_char)
+        """ 能够作为起始的字符组成的正则 """
+
+    def _compile_tree(self, index_tree: IndexTree):
+        """
+        前缀树展开为状态转移表，区分大小写和忽略大小写的两棵树同时匹配，状态为两棵树当前节点的组合
+        :param index_tree: 前缀树
+        """
+        fold_map = index_tree.fold_map
+        # 折叠后的字符对应的全部输入字符
+        case_list: Dict[str, List[str]] = {}
+        for case_char, fold_char in fold_map.items():
+            case_list.setdefault(fold_char, []).append(case_char)
+        root = (index_tree.root, index_tree.fold_root if index_tree.fold_root.children else None)
+        node_state = {(id(root[0]), id(root[1])): 0}
+        node_list = [root]
+        self.transition.append({})
+        self.accept.append(tuple(root[0].end))
+        index = 0
+        while index < len(node_list):
+            match_node, fold_node = node_list[index]
+            transition = self.transition[index]
+            char_list = list(match_node.children) if match_node is not None else []
+            if fold_node is not None:
+                for fold_char in fold_node.children:
+                    char_list.extend(case_list[fold_char])
+            for now_char in char_list:
+                if now_char in transition:
+                    continue
+                child = (match_node.children.get(now_char) if match_node is not None else None,
+                         fold_node.children.get(fold_map.get(now_char)) if fold_node is not None else None)
+                child_key = (id(child[0]), id(child[1]))
+                if child_key not in node_state:
+                    node_state[child_key] = len(self.transition)
+                    self.transition.append({})
+                    end = [*child[0].end] if child[0] is not None else []
+                    if child[1] is not None:
+                        end = sorted(end + child[1].end)
+                    self.accept.append(tuple(end))
+                    node_list.append(child)
+                transition[now_char] = node_state[child_key]
+            index += 1
+
+    @staticmethod
+    def _compile_end(token_rule: TokenRule):
+        """
+        选择结尾的扫描方式
+        :param token_rule: 组合因子
+        :return: 扫描方式，正则
+        """
+        if token_rule.count_start or token_rule.count_end:
+            return "general", None
+        if not token_rule.need_escape:
+            return "plain", None
+        if len(token_rule.end) == 1 and token_rule.end not in ("\\", b"\\"):
+            end = re.escape(token_rule.end)
+            if isinstance(end, bytes):
+                return "escape", re.compile(b'(?:[^\\\\' + end + b']|\\\\.)*+' + end, re.S)
+            return "escape", re.compile(f'(?:[^\\\\{end}]|\\\\.)*+{end}', re.S)
+        return "general", None
+
+    @staticmethod
+    def _find_end(source_code, end, start_index):
+        """
+        查找结尾，与IterativeMatch一样，失配的字符不会重新作为结尾的开头判断
+        :param source_code: 源码
+        :param end: 结尾字符
+        :param start_index: 开始查找的下标
+        :return: 结尾最后一个字符的下标，没有则为-1
+        """
+        if len(end) == 1:
+            return source_code.find(end, start_index)
+        end_set = set(end)
+        index = start_index
+        while True:
+            find_index = source_code.find(end, index)
+            if find_index < 0:
+                return -1
+            # 往前找到必然处于初始状态的位置，再模拟逐字匹配
+            now_index = find_index
+            while now_index > start_index and source_code[now_index - 1] in end_set:
+                now_index -= 1
+            match_index = 0
+            while now_index < find_index + len(end):
+                if end[match_index] == source_code[now_index]:
+                    match_index += 1
+                    if match_index == len(end):
+                        return now_index
+                else:
+                    match_index = 0
+                now_index += 1
+            index = find_index + 1
+
+    def _unescape(self, data):
+        """
+        处理转义字符
+        :param data: 原始字符
+        :return: 转义后的字符
+        """
+        return re.sub(r'\\(.)', lambda x: MatchToken.ESCAPE_CHAR.get(x.group(1), x.group(0)), data, flags=re.S)
+
+    def match_end(self, key, index, source_code) -> MatchResult | None:
+        """
+        从组合因子开始字符后，匹配结尾
+        :param key: 因子下标
+        :param index: 开始字符后的第一个下标
+        :param source_code: 源码
+        :return: 匹配结果
+        """
+        token_rule = self.data[key]
+        end_type, pattern = self.end_rule[key]
+        match end_type:
+            case "plain":
+                end_index = self._find_end(source_code, token_rule.end, index)
+                if end_index < 0:
+                    return None
+                return MatchResult(token_rule, end_index, source_code=source_code, data_start=index, data_end=end_index + 1 - len(token_rule.end))
+            case "escape":
+                result = pattern.match(source_code, index)
+                if result is None:
+                    return None
+                if source_code.find(b"\\" if self.encoding else "\\", index, result.end()) < 0:
+                    return MatchResult(token_rule, result.end() - 1, source_code=source_code, data_start=index, data_end=result.end() - 1)
+                data = result.group(0)
+                if self.encoding:
+                    # 存在转义时内容直接解码
+                    data = str(data, self.encoding)
+                data = self._unescape(data)
+                return MatchResult(token_rule, result.end() - 1, data[0:len(data) - 1])
+        match_token = MatchToken(token_rule, source_code, index)
+        while index < len(source_code):
+            similar, equal = match_token.prefix_end(source_code[index])
+            if equal:
+                return match_token.to_result()
+            index += 1
+        return None
+
+    def match(self, index, source_code, rule_stat: Dict[TokenRule, RuleStat] | None = None, shared_stat: RuleStat | None = None) -> List[MatchResult]:
+        """
+        匹配从下标开始的全部因子
+        :param index: 下标
+        :param source_code: 源码
+        :param rule_stat: 因子到统计的映射，为None时不记录，记录每个因子的尝试次数和查找结尾的耗时
+        :param shared_stat: 状态转移等全部因子共用部分的统计
+        :return: 按结束位置排序的匹配结果
+        """
+        length = len(source_code)
+        self.need_more = False
+        if rule_stat is not None:
+            shared_stat.tried += 1
+            start = time.perf_counter()
+            rule_use = 0.0
+        if index >= length or source_code[index] not in self.first_char:
+            if rule_stat is not None:
+                shared_stat.time += time.perf_counter() - start
+            return []
+        transition = self.transition
+        accept = self.accept
+        end_rule = self.end_rule
+        state = 0
+        result: List[MatchResult] = []
+        # 组合因子的结束位置不确定，需要按照结束位置，组合优先，出现顺序进行排序
+        order = None
+        while index < length:
+            state = transition[state].get(source_code[index])
+            if state is None:
+                break
+            for key in accept[state]:
+                if rule_stat is not None:
+                    rule_stat[self.data[key]].tried += 1
+                if key in end_rule:
+                    if rule_stat is None:
+                        match_result = self.match_end(key, index + 1, source_code)
+                    else:
+                        rule_start = time.perf_counter()
+                        match_result = self.match_end(key, index + 1, source_code)
+                        use = time.perf_counter() - rule_start
+                        rule_stat[self.data[key]].time += use
+                        rule_use += use
+                    if match_result is None:
+                        # 组合因子直到结尾都没有闭合
+                        self.need_more = True
+                    else:
+                        if order is None:
+                            order = [(item.end_index, 1, item_index) for item_index, item in enumerate(result)]
+                        order.append((match_result.end_index, 0, len(result)))
+                        result.append(match_result)
+                else:
+                    if order is not None:
+                        order.append((index, 1, len(result)))
+                    result.append(MatchResult(self.data[key], index))
+            if not transition[state]:
+                break
+            index += 1
+        if index >= length and state is not None and transition[state]:
+            self.need_more = True
+        if order is not None:
+            order.sort()
+            result = [result[item[2]] for item in order]
+        if rule_stat is not None:
+            shared_stat.time += time.perf_counter() - start - rule_use
+        return result
+
+
+class ScanIndex:
+    """ 前缀树加上失败链接，一次扫描找出下一个可能匹配因子的位置，不需要在每个位置尝试匹配 """
+
+    def __init__(self, index_tree: IndexTree):
+        """
+        根据前缀树构建失败链接，区分大小写和忽略大小写的两棵树各自构建
+        :param index_tree: 前缀树
+        """
+        self.goto: List[Dict[str, int]] = []
+        """ 状态转移，缺失时沿失败链接回退 """
+        self.fail: List[int] = []
+        """ 失败链接，指向当前路径最长的、同时也是前缀的后缀 """
+        self.length: List[int] = []
+        """ 结束于当前字符的最长因子开始的长度，0表示没有 """
+        self.depth: List[int] = []
+        """ 状态对应的路径长度 """
+        self.fold_map = index_tree.fold_map
+        """ 忽略大小写的字符折叠表 """
+        self.root = self._build(index_tree.root)
+        """ 区分大小写的根状态 """
+        self.fold_root = self._build(index_tree.fold_root) if index_tree.fold_root.children else -1
+        """ 忽略大小写的根状态，-1表示没有忽略大小写的因子 """
+        self.first_char = index_tree.first_char()
+        """ 能够作为起始的字符 """
+        self.start_pattern = IndexTree.start_pattern(self.first_char)
+        """ 能够作为起始的字符组成的正则 """
+        self.empty_start = bool(index_tree.root.end or index_tree.fold_root.end)
+        """ 存在开始为空的因子，每个位置都可能匹配 """
+
+    def _build(self, root: IndexTree._TreeNode) -> int:
+        """
+        按层遍历前缀树，生成状态和失败链接
+        :param root: 根节点
+        :return: 根状态
+        """
+        root_state = len(self.goto)
+        self.goto.append({})
+        self.fail.append(root_state)
+        self.length.append(0)
+        self.depth.append(0)
+        node_list = [(root, root_state)]
+        for node, state in node_list:
+            for now_char, child in node.children.items():
+                child_state = len(self.goto)
+                self.goto[state][now_char] = child_state
+                # 失败链接在上一层已经全部确定，沿父节点的失败链接查找
+                fail_state = self.fail[state]
+                while fail_state != root_state and now_char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                fail_state = self.goto[fail_state].get(now_char, root_state) if state != root_state else root_state
+                self.goto.append({})
+                self.fail.append(fail_state)
+                self.depth.append(self.depth[state] + 1)
+                self.length.append(self.depth[-1] if child.end else self.length[fail_state])
+                node_list.append((child, child_state))
+        return root_state
+
+    def _next_state(self, state, now_char, root) -> int:
+        """
+        沿失败链接查找下一个状态，结果缓存到状态转移中，之后同样的字符只需一次查找
+        :param state: 当前状态
+        :param now_char: 当前字符
+        :param root: 所在树的根状态
+        :return: 下一个状态
+        """
+        fail_state = self.fail[state]
+        while fail_state != root and now_char not in self.goto[fail_state]:
+            fail_state = self.fail[fail_state]
+        next_state = self.goto[fail_state].get(now_char, root)
+        self.goto[state][now_char] = next_state
+        return next_state
+
+    def find(self, source_code, index) -> int:
+        """
+        查找下一个可能匹配因子的位置，之前的字符都不可能作为因子的开始
+        :param source_code: 源码
+        :param index: 开始查找的下标
+        :return: 最靠前的因子开始位置，没有则为源码长度
+        """
+        if self.empty_start:
+            return index
+        goto = self.goto
+        length = self.length
+        depth = self.depth
+        fold_map = self.fold_map
+        first_char = self.first_char
+        start_search = self.start_pattern.search
+        root = self.root
+        fold_root = self.fold_root
+        state = root
+        fold_state = fold_root
+        source_length = len(source_code)
+        result = source_length
+        while index < source_length:
+            if state == root and fold_state == fold_root:
+                # 位于根状态时，跳过不可能作为开始的字符
+                if source_code[index] not in first_char:
+                    start_match = start_search(source_code, index)
+                    if start_match is None:
+                        break
+                    index = start_match.start()
+            now_char = source_code[index]
+            next_state = goto[state].get(now_char)
+            if next_state is None:
+                next_state = root if state == root else self._next_state(state, now_char, root)
+            state = next_state
+            index += 1
+            if length[state] and index - length[state] < result:
+                result = index - length[state]
+            # 尚未结束的匹配中，最靠前的开始位置
+            pending = index - depth[state]
+            if fold_root >= 0:
+                fold_char = fold_map.get(now_char)
+                next_state = goto[fold_state].get(fold_char)
+                if next_state is None:
+                    next_state = fold_root if fold_state == fold_root else self._next_state(fold_state, fold_char, fold_root)
+                fold_state = next_state
+                if length[fold_state] and index - length[fold_state] < result:
+                    result = index - length[fold_state]
+                if index - depth[fold_state] < pending:
+                    pending = index - depth[fold_state]
+            # 之后出现的因子不会比已经找到的更靠前
+            if result <= pending:
+                return result
         return result
 
 
+class LineIndex:
+    """ 行坐标索引，对源码只统计一次换行位置，之后通过二分查找定位行列 """
+
+    def __init__(self, source_code, line_count=0, column_count=0):
+        """
+        构建行坐标索引
+        :param source_code: 源码
+        :param line_count: 起始行
+        :param column_count: 第一个字符所在的列
+        """
+        self.line_count = line_count
+        """ 起始行 """
+        self.column_count = column_count
+        """ 第一个字符所在的列 """
+        self.line_offset: List[int] = [0]
+        """ 每一行起始字符的位置 """
+        newline = "\n" if isinstance(source_code, str) else b"\n"
+        index = source_code.find(newline)
+        while index >= 0:
+            self.line_offset.append(index + 1)
+            index = source_code.find(newline, index + 1)
+
+    def line(self, index):
+        """
+        获取字符所在行
+        :param index: 字符位置
+        :return: 行
+        """
+        return bisect_right(self.line_offset, index) - 1 + self.line_count
+
+    def column(self, index):
+        """
+        获取字符所在列
+        :param index: 字符位置
+        :return: 列
+        """
+        line = bisect_right(self.line_offset, index) - 1
+        return index - self.line_offset[line] + (self.column_count if line == 0 else 0)
+
+    def locate(self, token: Token, start_index, end_index):
+        """
+        设置token的行列坐标
+        :param token: token
+        :param start_index: 第一个字符的位置
+        :param end_index: 最后一个字符的位置
+        """
+        line = bisect_right(self.line_offset, start_index) - 1
+        token.line_start = line + self.line_count
+        token.column = start_index - self.line_offset[line] + (self.column_count if line == 0 else 0)
+        if line + 1 < len(self.line_offset) and self.line_offset[line + 1] <= end_index:
+            line = bisect_right(self.line_offset, end_index, line + 1) - 1
+        token.line_end = line + self.line_count
+
+    def update(self, edit_index, remove_length, insert_data) -> 'LineIndex':
+        """
+        根据文本编辑生成新的索引，只统计插入内容中的换行
+        :param edit_index: 编辑位置
+        :param remove_length: 删除的字符数
+        :param insert_data: 插入的内容
+        :return: 新的索引
+        """
+        line_index = LineIndex("", self.line_count, self.column_count)
+        delta = len(insert_data) - remove_length
+        start = bisect_right(self.line_offset, edit_index)
+        end = bisect_right(self.line_offset, edit_index + remove_length)
+        line_offset = self.line_offset[:start]
+        index = insert_data.find("\n")
+        while index >= 0:
+            line_offset.append(edit_index + index + 1)
+            index = insert_data.find("\n", index + 1)
+        line_offset.extend([offset + delta for offset in self.line_offset[end:]])
+        line_index.line_offset = line_offset
+        return line_index
+
+
+class TokenSnapshot:
+    """ 增量解析的快照，保存源码、token以及每个匹配起点，编辑后只重新解析受影响的部分 """
+
+    def __init__(self, source_code, line_index: LineIndex, any_type="any", skip_type: set | None = None):
+        """
+        构建空的快照
+        :param source_code: 源码
+        :param line_index: 行坐标索引
+        :param any_type: 未识别类型
+        :param skip_type: 跳过的类型
+        """
+        self.source_code = source_code
+        """ 源码 """
+        self.line_index = line_index
+        """ 行坐标索引 """
+        self.any_type = any_type
+        """ 未识别类型 """
+        self.skip_type = skip_type or set()
+        """ 跳过的类型 """
+        self.token_list: List[Token] = []
+        """ token列表 """
+        self.step_start = array("q")
+        """ 匹配起点，匹配成功的位置或者未知字符的开头，可以从这里重新解析 """
+        self.step_pending = array("q")
+        """ 起点之前未处理的未知字符长度，没有时为0，使用长度而不是位置，平移时不需要修改 """
+        self.step_token = array("q")
+        """ 起点产生的第一个token下标 """
+        self.step_reach = array("q")
+        """ 起点到下一个起点之间的匹配读取到的最远位置 """
+        self.step_limit = array("q")
+        """ 从开头到该起点之前的匹配读取到的最远位置，单调不减 """
+        self.change_range: Tuple[int, int, int] | None = None
+        """ 上一次编辑重新生成的token范围：起始下标，旧快照中的结束下标，新快照中的结束下标 """
+
+    def add_step(self, start_index, token_index, reach_index, pending_length=0):
+        """
+        记录匹配起点
+        :param start_index: 起点位置
+        :param token_index: 第一个token下标
+        :param reach_index: 读取到的最远位置
+        :param pending_length: 起点之前未处理的未知字符长度
+        """
+        limit = -1
+        if self.step_limit:
+            limit = max(self.step_limit[-1], self.step_reach[-1])
+        self.step_start.append(start_index)
+        self.step_pending.append(pending_length)
+        self.step_token.append(token_index)
+        self.step_reach.append(reach_index)
+        self.step_limit.append(limit)
+
+    def restart_step(self, edit_index):
+        """
+        编辑位置之前最后一个安全的起点，之前的匹配都没有读取到编辑位置
+        :param edit_index: 编辑位置
+        :return: 起点下标
+        """
+        return max(min(bisect_left(self.step_limit, edit_index), bisect_right(self.step_start, edit_index)) - 1, 0)
+
+
 class CodeParser:
-    def __init__(self):
+    def __init__(self, use_scan=True):
+        """
+        词法解析器
+        :param use_scan: 未匹配时通过扫描索引直接跳到下一个可能匹配的位置，不在每个位置尝试匹配
+        """
+        self.use_scan = use_scan
+        """ 使用扫描索引 """
         self.parser_match = ParserMatch()
         """ 因子 """
+        self.is_compiled = False
+        """ 使用编译后的匹配器 """
+        self.compiled_match: CompiledMatch | None = None
+        """ 编译后的匹配器 """
+        self.scan_index: ScanIndex | None = None
+        """ 查找下一个可能匹配位置的扫描索引 """
+        self.encoding: str | None = None
+        """ 因子为字节序列时源码的编码，为None时解析字符串 """
+        self.byte_parser_map: Dict[str, CodeParser] = {}
+        """ 按编码缓存的字节解析器 """
+        self.text_parser: CodeParser | None = None
+        """ 字节解析器对应的字符串解析器，转义后已经解码的内容交给它解析 """
+        self.profile: ParserProfile | None = None
+        """ 性能统计，为None时不记录 """
+
+    def __getstate__(self):
+        """ 序列化时不保存性能统计 """
+        state = self.__dict__.copy()
+        state["profile"] = None
+        return state
 
     def add_token(self, token_type: str, *args: str):
         """
@@ -409,6 +1675,9 @@ class CodeParser:
         """
         for token in args:
             self.parser_match.add_rule(token_type, token)
+        self.compiled_match = None
+        self.scan_index = None
+        self.byte_parser_map = {}
 
     def add_combination(self, token_type: str, start: str, end: str, next_parser=None, self_mark=None, need_escape=False, count_start=None, count_end=None, next_all_match=False):
         """
@@ -424,93 +1693,542 @@ class CodeParser:
         :param next_all_match: 下一层全部重新解析
         """
         self.parser_match.add_rule(token_type, start, end, next_parser, self_mark, need_escape, count_start, count_end, next_all_match)
+        self.compiled_match = None
+        self.scan_index = None
+        self.byte_parser_map = {}
 
-    def to_token(self, source_code, any_type="any", skip_type=None, line_count=0) -> List[Token]:
+    def compile(self):
         """
-        将代码解析成token
-        :param source_code:源码
+        启用编译模式，将注册的全部因子编译为状态表，下一层解析器同样编译
+        :return: 自身
+        """
+        self.is_compiled = True
+        self.compiled_match = CompiledMatch(self.parser_match, self.encoding)
+        if self.use_scan:
+            self.scan_index = ScanIndex(self.parser_match.index_tree)
+        for token_rule in self.parser_match.data:
+            if token_rule.next_parser is not None and not token_rule.next_parser.is_compiled:
+                token_rule.next_parser.compile()
+        return self
+
+    def set_profile(self, profile: ParserProfile | None, name="token"):
+        """
+        设置性能统计，下一层解析器和字节解析器使用同一个统计
+        :param profile: 性能统计，为None时关闭
+        :param name: 统计中的解析器名称，下一层解析器为名称加上因子类型
+        :return: 自身
+        """
+        # 下一层解析器可能引用上层解析器，已经设置过的不再处理
+        if self.profile is profile:
+            return self
+        self.profile = profile
+        if profile is not None:
+            profile.add_parser(self, name)
+        for token_rule in self.parser_match.data:
+            if token_rule.next_parser is not None:
+                token_rule.next_parser.set_profile(profile, f'{name}.{token_rule.status}')
+        for byte_parser in self.byte_parser_map.values():
+            byte_parser.set_profile(profile, name)
+        return self
+
+    def get_match(self) -> ParserMatch | CompiledMatch:
+        """
+        获取当前使用的匹配器，开启性能统计时返回记录统计的包装
+        :return: 匹配器
+        """
+        if not self.is_compiled:
+            parser_match = self.parser_match
+        else:
+            if self.compiled_match is None:
+                self.compiled_match = CompiledMatch(self.parser_match, self.encoding)
+            parser_match = self.compiled_match
+        if self.profile is not None:
+            return self.profile.token_match(self, parser_match)
+        return parser_match
+
+    def get_scan(self) -> ScanIndex | None:
+        """
+        获取扫描索引，注册因子后重新构建
+        :return: 扫描索引，不使用时为None
+        """
+        if self.scan_index is None and self.use_scan:
+            self.scan_index = ScanIndex(self.parser_match.index_tree)
+        return self.scan_index
+
+    @staticmethod
+    def _encode(data, encoding):
+        """
+        因子的字符转为字节序列
+        :param data: 字符串、匹配规则或者None
+        :param encoding: 编码
+        :return: 字节序列
+        """
+        if isinstance(data, MatchRule):
+            if data.ignore_case and any(not now_char.isascii() and now_char.lower() != now_char.upper() for now_char in data.data):
+                raise ValueError(f'字节模式下忽略大小写只支持ASCII字母：{data.data}')
+            return MatchRule(data.data.encode(encoding), data.need_match, data.ignore_case)
+        return data.encode(encoding) if data else data
+
+    def byte_parser(self, encoding="utf-8") -> 'CodeParser':
+        """
+        生成直接匹配字节的解析器，因子按编码转为字节序列，总是使用编译后的匹配器，结果按编码缓存
+        :param encoding: 编码
+        :return: 字节解析器
+        """
+        encoding = codecs.lookup(encoding).name
+        if encoding not in BYTE_ENCODING:
+            raise ValueError(f'字节模式不支持编码{encoding}，只支持{"、".join(BYTE_ENCODING)}')
+        if encoding in self.byte_parser_map:
+            return self.byte_parser_map[encoding]
+        byte_parser = CodeParser(self.use_scan)
+        byte_parser.encoding = encoding
+        byte_parser.text_parser = self
+        for token_rule in self.parser_match.data:
+            next_parser = token_rule.next_parser.byte_parser(encoding) if token_rule.next_parser is not None else None
+            byte_parser.parser_match.add_rule(token_rule.status, self._encode(token_rule.start, encoding), self._encode(token_rule.end, encoding), next_parser, token_rule.self_mark,
+                                              token_rule.need_escape, self._encode(token_rule.count_start, encoding), self._encode(token_rule.count_end, encoding), token_rule.next_all_match)
+        byte_parser.compile()
+        for key, (end_type, _) in byte_parser.compiled_match.end_rule.items():
+            if end_type == "general":
+                raise ValueError(f'字节模式不支持带计数或者多字节结尾转义的组合因子：{self.parser_match.data[key].start}')
+        if self.profile is not None:
+            byte_parser.set_profile(self.profile, self.profile.parser_name[self])
+        self.byte_parser_map[encoding] = byte_parser
+        return byte_parser
+
+    @staticmethod
+    def _byte_buffer(source_code):
+        """
+        获取可以直接查找的字节源码，覆盖完整对象的memoryview直接使用原对象，其余memoryview复制为bytes
+        :param source_code: bytes、bytearray、mmap或者memoryview
+        :return: 字节源码
+        """
+        if not isinstance(source_code, memoryview):
+            return source_code
+        if isinstance(source_code.obj, (bytes, bytearray, mmap.mmap)) and source_code.nbytes == len(source_code.obj):
+            return source_code.obj
+        return source_code.tobytes()
+
+    def _to_token_bytes(self, source_code, any_type, skip_type, line_count, encoding) -> List[Token]:
+        """
+        直接解析字节源码，token的内容引用字节片段，访问时才解码
+        :param source_code: 字节源码
         :param any_type: 未识别类型
         :param skip_type: 跳过的类型
         :param line_count: 行坐标信息
+        :param encoding: 编码
         :return: token列表
         """
+        byte_parser = self.byte_parser(encoding)
+        encoding = byte_parser.encoding
+        source_code = self._byte_buffer(source_code)
+        token_list = byte_parser.to_token(source_code, any_type, skip_type, line_count)
+        # 下一层解析会引用内容片段，每个字节源码只包装一次
+        source_map = {}
+        for token in token_list:
+            if isinstance(token.start, (bytes, bytearray)):
+                token.start = str(token.start, encoding)
+            if isinstance(token.end, (bytes, bytearray)):
+                token.end = str(token.end, encoding)
+            # 转义后交给字符串解析器的内容已经解码，不需要包装
+            if token._source is not None and not isinstance(token._source, str):
+                if id(token._source) not in source_map:
+                    source_map[id(token._source)] = ByteSource(token._source, encoding)
+                token._source = source_map[id(token._source)]
+        return token_list
+
+    @staticmethod
+    def _next_start(start_pattern: re.Pattern, source_code, index) -> int:
+        """
+        查找下一个能够作为起始的字符，之间的字符都不可能匹配
+        :param start_pattern: 能够作为起始的字符组成的正则
+        :param source_code: 源码
+        :param index: 开始查找的下标
+        :return: 下标，没有则为源码长度
+        """
+        start_match = start_pattern.search(source_code, index)
+        return len(source_code) if start_match is None else start_match.start()
+
+    @staticmethod
+    def _skip_set(skip_type) -> set:
+        """
+        跳过的类型统一转为集合
+        :param skip_type: 跳过的类型
+        :return: 类型集合
+        """
         if skip_type:
             if isinstance(skip_type, str):
-                skip_type = {skip_type}
-            else:
-                skip_type = set(skip_type)
+                return {skip_type}
+            return set(skip_type)
+        return set()
+
+    def _add_token(self, token_list: List[Token], last_match: MatchResult, now_index, source_code, any_type, skip_type: set, line_index: LineIndex, offset):
+        """
+        根据匹配结果生成token
+        :param token_list: 添加到的token列表
+        :param last_match: 匹配结果
+        :param now_index: 匹配的起始位置
+        :param source_code: 源码
+        :param any_type: 未识别类型
+        :param skip_type: 跳过的类型
+        :param line_index: 行坐标索引
+        :param offset: 源码在行坐标索引中的起始位置
+        """
+        token_rule = last_match.token_rule
+        # 缓存结尾下标，防止递归解析时，信息丢失
+        end_index = last_match.end_index
+        if token_rule.status in skip_type:
+            return
+        # 如果不需要递归解析
+        if token_rule.next_parser is None:
+            token_list.append(Token(last_match))
+            # 开始为匹配规则时，记录源码中的原文，忽略大小写时与规则不同
+            if token_rule.end is None and isinstance(token_rule.start, MatchRule):
+                token_list[-1].start = source_code[now_index:end_index + 1]
+            line_index.locate(token_list[-1], offset + now_index, offset + end_index)
+            return
+        # 先进性计算，递归解析中会将当前状态信息重置
+        start_index = end_index - last_match.data_length() - 1
+        next_parser = token_rule.next_parser
+        start, data, end = token_rule.start, last_match.data, token_rule.end
+        if self.encoding is not None and isinstance(data, str):
+            # 字节模式下存在转义时内容已经解码，使用下一层的字符串解析器
+            next_parser = next_parser.text_parser
+            start, end = str(start, self.encoding), str(end, self.encoding)
+        self_mark = token_rule.status
+        # 如果有自身类型，则装配自身类型
+        if token_rule.self_mark:
+            self_mark = token_rule.self_mark
+        # 如果需要下层全部重新解析
+        if token_rule.next_all_match:
+            # 进行递归解析
+            temp_token_list = next_parser.to_token(
+                start + data + end,
+                any_type,
+                skip_type,
+                line_index=line_index,
+                offset=offset + now_index)
+            # 此处计算的是起始坐标
+            for token in temp_token_list:
+                token.end_index = start_index + token.end_index + 1
+            token_list.extend(temp_token_list)
         else:
-            skip_type = set()
+            temp_token_list = next_parser.to_token(
+                data,
+                token_rule.status,
+                skip_type,
+                line_index=line_index,
+                offset=offset + now_index + len(token_rule.start))
+            # 此处计算的是起始坐标
+            temp_token = Token.start_type(self_mark, token_rule.start, start_index)
+            line_index.locate(temp_token, offset + now_index, offset + now_index + len(token_rule.start) - 1)
+            token_list.append(temp_token)
+            for token in temp_token_list:
+                token.end_index = start_index + token.end_index + 1
+            token_list.extend(temp_token_list)
+            temp_token = Token.end_type(self_mark, token_rule.end, end_index)
+            line_index.locate(temp_token, offset + end_index - len(token_rule.end) + 1, offset + end_index)
+            token_list.append(temp_token)
+
+    def to_token(self, source_code, any_type="any", skip_type=None, line_count=0, line_index: LineIndex | None = None, offset=0, encoding="utf-8") -> List[Token]:
+        """
+        将代码解析成token
+        :param source_code:源码，可以是字符串，或者bytes、bytearray、mmap、memoryview，字节源码不解码直接匹配
+        :param any_type: 未识别类型
+        :param skip_type: 跳过的类型
+        :param line_count: 行坐标信息
+        :param line_index: 行坐标索引，递归解析时沿用上层源码的索引
+        :param offset: 源码在行坐标索引中的起始位置
+        :param encoding: 字节源码的编码，此时token的位置和列都是字节下标
+        :return: token列表
+        """
+        if self.encoding is None and not isinstance(source_code, str):
+            return self._to_token_bytes(source_code, any_type, skip_type, line_count, encoding)
+        skip_type = self._skip_set(skip_type)
+        if line_index is None:
+            line_index = LineIndex(source_code, line_count)
 
         token_list = []
         now_index = 0
-        any_token = ""
-        line_start = 0
+        # 未知字符的起始位置，-1表示没有未知字符
+        any_start = -1
+        parser_match = self.get_match()
+        start_pattern = parser_match.start_pattern
+        scan_index = self.get_scan()
 
         while now_index < len(source_code):
-            match_result = self.parser_match.match(now_index, source_code)
+            match_result = parser_match.match(now_index, source_code)
             if match_result:
-                line_start = line_count
                 # 未知字符处理
-                if any_token != "":
+                if any_start >= 0:
                     if any_type not in skip_type:
-                        token_list.append(Token.any_token(any_type, any_token, now_index - 1))
-                        token_list[-1].line_start = line_start
-                        token_list[-1].line_end = line_count
-                    any_token = ""
-
-                last_match = match_result[-1]
-                # 缓存结尾下标，防止递归解析时，信息丢失
-                end_index = last_match.end_index
-                # 计算行坐标
-                for char_index in range(end_index - now_index + 1):
-                    if source_code[char_index + now_index] == '\n':
-                        line_count += 1
-                if last_match.token_rule.status not in skip_type:
-                    # 如果需要递归解析
-                    if last_match.token_rule.next_parser is not None:
-                        # 先进性计算，递归解析中会将当前状态信息重置
-                        start_index = end_index - len(last_match.data) - 1
-                        self_mark = last_match.token_rule.status
-                        # 如果有自身类型，则装配自身类型
-                        if last_match.token_rule.self_mark:
-                            self_mark = last_match.token_rule.self_mark
-                        # 如果需要下层全部重新解析
-                        if last_match.token_rule.next_all_match:
-                            # 进行递归解析
-                            temp_token_list = last_match.token_rule.next_parser.to_token(
-                                last_match.token_rule.start + last_match.data + last_match.token_rule.end,
-                                any_type,
-                                skip_type,
-                                line_count - 1)
-                            # 此处计算的是起始坐标
-                            for token in temp_token_list:
-                                token.end_index = start_index + token.end_index + 1
-                            token_list.extend(temp_token_list)
-                        else:
-                            temp_token_list = last_match.token_rule.next_parser.to_token(last_match.data, last_match.token_rule.status, skip_type, line_count - 1)
-                            # 此处计算的是起始坐标
-                            temp_token = Token.start_type(self_mark, last_match.token_rule.start, start_index)
-                            temp_token.line_start = line_start
-                            temp_token.line_end = line_start
-                            token_list.append(temp_token)
-                            for token in temp_token_list:
-                                token.end_index = start_index + token.end_index + 1
-                            token_list.extend(temp_token_list)
-                            token_list.append(Token.end_type(self_mark, last_match.token_rule.end, end_index))
-                    else:
-                        token_list.append(Token(last_match))
-                    token_list[-1].line_start = line_start
-                    token_list[-1].line_end = line_count
-                    if source_code[now_index] == '\n':
-                        token_list[-1].line_end -= 1
-                now_index = end_index
+                        token_list.append(Token.slice_token(any_type, source_code, any_start, now_index, now_index - 1))
+                        line_index.locate(token_list[-1], offset + any_start, offset + now_index - 1)
+                    any_start = -1
+                self._add_token(token_list, match_result[-1], now_index, source_code, any_type, skip_type, line_index, offset)
+                now_index = match_result[-1].end_index
             else:
-                any_token += source_code[now_index]
+                if any_start < 0:
+                    any_start = now_index
+                if scan_index is not None:
+                    # 直接跳到下一个可能匹配因子的位置，之间的字符并入未知字符
+                    now_index = scan_index.find(source_code, now_index + 1) - 1
+                else:
+                    # 不可能作为起始的字符整段并入未知字符
+                    now_index = self._next_start(start_pattern, source_code, now_index + 1) - 1
             now_index += 1
-        if any_token != "":
-            token_list.append(Token.any_token(any_type, any_token, now_index - 1))
-            # 此处解决any的问题
-            token_list[-1].line_start = line_count
-            token_list[-1].line_end = line_count
+        if any_start >= 0:
+            token_list.append(Token.slice_token(any_type, source_code, any_start, now_index, now_index - 1))
+            line_index.locate(token_list[-1], offset + any_start, offset + now_index - 1)
         return token_list
+
+    def to_table(self, source_code, any_type="any", skip_type=None, line_count=0, encoding="utf-8") -> TokenTable:
+        """
+        将代码解析成列式存储的token表，解析过程中不保留Token对象
+        :param source_code:源码，字节源码与to_token相同直接匹配字节，位置为字节下标，内容不引用源码而保存在文本中
+        :param any_type: 未识别类型
+        :param skip_type: 跳过的类型
+        :param line_count: 行坐标信息
+        :param encoding: 字节源码的编码
+        :return: token表
+        """
+        if not isinstance(source_code, str):
+            return TokenTable.from_tokens(self.to_token(self._byte_buffer(source_code), any_type, skip_type, line_count, encoding=encoding))
+        return TokenTable.from_tokens(self.iter_tokens(source_code, any_type, skip_type, line_count, len(source_code) or 1), source_code)
+
+    def token_snapshot(self, source_code, any_type="any", skip_type=None, line_count=0) -> TokenSnapshot:
+        """
+        解析代码并保存增量解析需要的快照
+        :param source_code: 源码
+        :param any_type: 未识别类型
+        :param skip_type: 跳过的类型
+        :param line_count: 行坐标信息
+        :return: 快照
+        """
+        snapshot = TokenSnapshot(source_code, LineIndex(source_code, line_count), any_type, self._skip_set(skip_type))
+        self._scan_step(snapshot, 0)
+        return snapshot
+
+    def update_token(self, snapshot: TokenSnapshot, edit_index, remove_length, insert_data) -> TokenSnapshot:
+        """
+        根据文本编辑增量解析，从编辑位置之前的安全起点重新解析，直到与旧的匹配起点重合，之后的token只平移坐标。
+        旧快照的token会被复用并修改，更新后不应再使用旧快照
+        :param snapshot: 旧快照
+        :param edit_index: 编辑位置
+        :param remove_length: 删除的字符数
+        :param insert_data: 插入的内容
+        :return: 新快照
+        """
+        old_source = snapshot.source_code
+        if edit_index < 0 or remove_length < 0 or edit_index + remove_length > len(old_source):
+            raise IndexError(f'编辑范围越界：{edit_index}，{remove_length}')
+        source_code = old_source[:edit_index] + insert_data + old_source[edit_index + remove_length:]
+        delta = len(insert_data) - remove_length
+        line_index = snapshot.line_index.update(edit_index, remove_length, insert_data)
+        new_snapshot = TokenSnapshot(source_code, line_index, snapshot.any_type, snapshot.skip_type)
+        if not snapshot.step_start:
+            self._scan_step(new_snapshot, 0)
+            new_snapshot.change_range = (0, len(snapshot.token_list), len(new_snapshot.token_list))
+            return new_snapshot
+        # 保留重新解析起点之前的部分，起点之前的未知字符重新合并
+        restart = snapshot.restart_step(edit_index)
+        any_start = -1
+        token_index = snapshot.step_token[restart]
+        if snapshot.step_pending[restart]:
+            any_start = snapshot.step_start[restart] - snapshot.step_pending[restart]
+            if snapshot.any_type not in snapshot.skip_type:
+                token_index -= 1
+        new_snapshot.token_list = snapshot.token_list[:token_index]
+        new_snapshot.step_start = snapshot.step_start[:restart]
+        new_snapshot.step_pending = snapshot.step_pending[:restart]
+        new_snapshot.step_token = snapshot.step_token[:restart]
+        new_snapshot.step_reach = snapshot.step_reach[:restart]
+        new_snapshot.step_limit = snapshot.step_limit[:restart]
+        sync, any_start = self._scan_step(new_snapshot, snapshot.step_start[restart], any_start, snapshot.step_start, delta, edit_index + len(insert_data))
+        if sync < 0:
+            new_snapshot.change_range = (token_index, len(snapshot.token_list), len(new_snapshot.token_list))
+            return new_snapshot
+        # 同步之后的token平移坐标
+        old_sync = snapshot.step_start[sync]
+        line_delta = len(line_index.line_offset) - len(snapshot.line_index.line_offset)
+        sync_line = snapshot.line_index.line(old_sync)
+        column_delta = line_index.column(old_sync + delta) - snapshot.line_index.column(old_sync)
+        token_delta = len(new_snapshot.token_list) - snapshot.step_token[sync]
+        new_snapshot.change_range = (token_index, snapshot.step_token[sync], len(new_snapshot.token_list))
+        for token in snapshot.token_list[snapshot.step_token[sync]:]:
+            if token.line_start == sync_line:
+                token.column += column_delta
+            token.end_index += delta
+            token.line_start += line_delta
+            token.line_end += line_delta
+            new_snapshot.token_list.append(token)
+        new_snapshot.add_step(old_sync + delta, snapshot.step_token[sync] + token_delta, snapshot.step_reach[sync] + delta, old_sync + delta - any_start if any_start >= 0 else 0)
+        # 之后的起点整体平移，最远位置的前缀最大值重新累计
+        tail = sync + 1
+        if tail < len(snapshot.step_start):
+            new_snapshot.step_start.extend(map(delta.__add__, snapshot.step_start[tail:]))
+            new_snapshot.step_pending.extend(snapshot.step_pending[tail:])
+            new_snapshot.step_token.extend(map(token_delta.__add__, snapshot.step_token[tail:]))
+            limit = max(new_snapshot.step_limit[-1], new_snapshot.step_reach[-1])
+            new_snapshot.step_limit.extend(accumulate(map(delta.__add__, snapshot.step_reach[tail:-1]), max, initial=limit))
+            new_snapshot.step_reach.extend(map(delta.__add__, snapshot.step_reach[tail:]))
+        return new_snapshot
+
+    def _scan_step(self, snapshot: TokenSnapshot, now_index, any_start=-1, sync_start: array | None = None, sync_delta=0, sync_index=0):
+        """
+        从匹配起点开始解析并记录起点，遇到与旧快照相同的起点时停止
+        :param snapshot: 写入的快照
+        :param now_index: 开始位置，必须是匹配起点
+        :param any_start: 开始位置之前未处理的未知字符起始位置
+        :param sync_start: 旧快照的匹配起点，为None时解析到结尾
+        :param sync_delta: 新旧源码的位置差
+        :param sync_index: 新源码中允许同步的最小位置
+        :return: 同步的旧起点下标，没有同步时为-1；同步位置之前的未知字符起始位置
+        """
+        source_code = snapshot.source_code
+        token_list = snapshot.token_list
+        line_index = snapshot.line_index
+        any_type = snapshot.any_type
+        skip_type = snapshot.skip_type
+        parser_match = self.get_match()
+        start_pattern = parser_match.start_pattern
+        # 前缀匹配最多读取的字符数
+        lookahead = self.parser_match.index_tree.depth()
+
+        while now_index < len(source_code):
+            match_result = parser_match.match(now_index, source_code)
+            # 匹配成功或者没有未处理的未知字符时，作为起点
+            if match_result or any_start < 0:
+                step_any = any_start
+                pending_length = now_index - any_start if any_start >= 0 else 0
+                if any_start >= 0:
+                    if any_type not in skip_type:
+                        token_list.append(Token.slice_token(any_type, source_code, any_start, now_index, now_index - 1))
+                        line_index.locate(token_list[-1], any_start, now_index - 1)
+                    any_start = -1
+                # 编辑之后的起点与旧起点重合，之后的解析结果相同
+                if sync_start is not None and now_index >= sync_index:
+                    old_index = bisect_left(sync_start, now_index - sync_delta)
+                    if old_index < len(sync_start) and sync_start[old_index] == now_index - sync_delta:
+                        return old_index, step_any
+                snapshot.add_step(now_index, len(token_list), now_index, pending_length)
+            # 本次匹配读取到的最远位置，到达结尾时记为源码长度
+            if parser_match.need_more:
+                reach_index = len(source_code)
+            else:
+                reach_index = max(match_result[-1].end_index if match_result else now_index, now_index + lookahead - 1)
+            if match_result:
+                self._add_token(token_list, match_result[-1], now_index, source_code, any_type, skip_type, line_index, 0)
+                now_index = match_result[-1].end_index
+            else:
+                if any_start < 0:
+                    any_start = now_index
+                next_index = self._next_start(start_pattern, source_code, now_index + 1)
+                reach_index = max(reach_index, next_index)
+                now_index = next_index - 1
+            snapshot.step_reach[-1] = max(snapshot.step_reach[-1], reach_index)
+            now_index += 1
+        if any_start >= 0:
+            token_list.append(Token.slice_token(any_type, source_code, any_start, now_index, now_index - 1))
+            line_index.locate(token_list[-1], any_start, now_index - 1)
+        return -1, -1
+
+    @staticmethod
+    def _read_chunk(stream, chunk_size, encoding):
+        """
+        将数据源统一为字符块迭代
+        :param stream: 字符串，文本/二进制文件对象，mmap，或者字符块的可迭代对象
+        :param chunk_size: 每次读取的大小
+        :param encoding: 二进制数据的编码
+        :return: 字符块
+        """
+        decoder = codecs.getincrementaldecoder(encoding)()
+        if isinstance(stream, (str, bytes)):
+            stream = [stream]
+        if isinstance(stream, mmap.mmap):
+            for index in range(0, len(stream), chunk_size):
+                yield decoder.decode(stream[index:index + chunk_size])
+        elif hasattr(stream, "read"):
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                yield decoder.decode(chunk) if isinstance(chunk, (bytes, bytearray, memoryview)) else chunk
+        else:
+            for chunk in stream:
+                yield decoder.decode(chunk) if isinstance(chunk, (bytes, bytearray, memoryview)) else chunk
+        yield decoder.decode(b"", True)
+
+    def iter_tokens(self, stream, any_type="any", skip_type=None, line_count=0, chunk_size=65536, encoding="utf-8") -> Iterator[Token]:
+        """
+        流式解析token，只在缓冲区中保留尚未确定的字符，跨越字符块的组合token会继续读取直到闭合
+        :param stream: 字符串，文本/二进制文件对象，mmap，或者字符块的可迭代对象
+        :param any_type: 未识别类型
+        :param skip_type: 跳过的类型
+        :param line_count: 起始行
+        :param chunk_size: 每次读取的大小
+        :param encoding: 二进制数据的编码
+        :return: token迭代器
+        """
+        skip_type = self._skip_set(skip_type)
+        chunk_iter = self._read_chunk(stream, chunk_size, encoding)
+        parser_match = self.get_match()
+        start_pattern = parser_match.start_pattern
+        # 缓冲区，缓冲区起始字符的源码位置
+        buffer = ""
+        buffer_offset = 0
+        line_index = LineIndex(buffer, line_count)
+        is_final = False
+        token_list = []
+        now_index = 0
+        any_start = -1
+
+        while now_index < len(buffer) or not is_final:
+            match_result = None
+            if now_index < len(buffer):
+                match_result = parser_match.match(now_index, buffer)
+            if now_index >= len(buffer) or parser_match.need_more and not is_final:
+                # 丢弃已经确定的字符，读取至缓冲区容量翻倍
+                keep_index = any_start if any_start >= 0 else now_index
+                column_count = line_index.column(keep_index)
+                line_count += buffer.count("\n", 0, keep_index)
+                chunk_list = [buffer[keep_index:]]
+                buffer_offset += keep_index
+                now_index -= keep_index
+                if any_start >= 0:
+                    any_start -= keep_index
+                size = max(len(chunk_list[0]), chunk_size)
+                while size > 0:
+                    chunk = next(chunk_iter, None)
+                    if chunk is None:
+                        is_final = True
+                        break
+                    chunk_list.append(chunk)
+                    size -= len(chunk)
+                buffer = "".join(chunk_list)
+                line_index = LineIndex(buffer, line_count, column_count)
+                continue
+            if match_result:
+                # 未知字符处理
+                if any_start >= 0:
+                    if any_type not in skip_type:
+                        token_list.append(Token.slice_token(any_type, buffer, any_start, now_index, now_index - 1))
+                        line_index.locate(token_list[-1], any_start, now_index - 1)
+                    any_start = -1
+                self._add_token(token_list, match_result[-1], now_index, buffer, any_type, skip_type, line_index, 0)
+                now_index = match_result[-1].end_index
+            else:
+                if any_start < 0:
+                    any_start = now_index
+                now_index = self._next_start(start_pattern, buffer, now_index + 1) - 1
+            now_index += 1
+            for token in token_list:
+                # 生成内容，不让token持有缓冲区
+                token.load_data()
+                token.end_index += buffer_offset
+                yield token
+            token_list.clear()
+        if any_start >= 0:
+            token = Token.slice_token(any_type, buffer, any_start, now_index, buffer_offset + now_index - 1)
+            line_index.locate(token, any_start, now_index - 1)
+            yield token.load_data()
@@ -1,4 +1,4 @@
-from typing import List, Dict, TypeVar, Generic
+from typing import List, Dict, Tuple, TypeVar, Generic
 
 FlowConfig = TypeVar("FlowConfig")
 
@@ -30,6 +30,8 @@ class Flow(Generic[FlowConfig]):
         """ 流容器 """
         self.context = FlowContext()
         """ 上下文 """
+        self.plan: Tuple[FlowInfo[FlowConfig], ...] | None = None
+        """ 按顺序排列的执行计划，添加流时失效 """
 
     def add_flow(self, index, flow_type, flow_data, config: FlowConfig):
         """
@@ -40,14 +42,20 @@ class Flow(Generic[FlowConfig]):
         :param config:流迭代时的配置
         """
         flow: FlowInfo[FlowConfig] = FlowInfo(index, flow_type, config, flow_data, self.context)
+        self.plan = None
         if index in self.flow:
             self.flow[index].append(flow)
         else:
             self.flow[index] = [flow]
 
+    def get_plan(self) -> Tuple[FlowInfo[FlowConfig], ...]:
+        """
+        获取执行计划，只在添加流之后重新排序
+        :return: 按顺序排列的流
+        """
+        if self.plan is None:
+            self.plan = tuple(flow for index in sorted(self.flow.keys()) for flow in self.flow[index])
+        return self.plan
+
     def __iter__(self):
-        now_index = list(self.flow.keys())
-        now_index.sort()
-        for index in now_index:
-            for flow in self.flow[index]:
-                yield flow
+        return iter(self.get_plan())
@@ -0,0 +1,190 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from src.code.CodeParser import Token, TokenType
+from src.code.FormatCode import TreeWalk
+from src.code.ParserStore import ParserStore
+
+CACHE_VERSION = 1
+""" 缓存格式版本，摘要或者状态的组成变化时递增，旧版本的缓存文件不再加载 """
+DIGEST_PROTOCOL = 4
+""" 计算摘要时序列化使用的协议，固定协议保证不同进程中摘要一致 """
+
+
+class FormatCache:
+    """
+    格式化结果的缓存，键为子树的结构摘要、进入子树时的格式化状态和父级的子项换行配置，值为子树格式化后的代码和结束时的状态。
+    摘要由类型名称、开始字符、内容、结束字符和子节点计算，并以格式化规则的摘要作为密钥，规则不同的格式化器可以共用同一个缓存。
+    通过FormatCode.set_cache启用，容量满时淘汰最久未使用的结果
+    """
+
+    def __init__(self, max_size=65536, max_depth=1, path=None):
+        """
+        :param max_size: 最多缓存的子树数量
+        :param max_depth: 缓存的子树层数，1为只缓存顶层token，层数越多修改后能复用的部分越多，计算摘要和保存结果的开销也越大
+        :param path: 缓存文件路径，存在时加载，文件损坏或者版本不同时忽略，通过save保存
+        """
+        self.max_size = max(max_size, 1)
+        """ 最多缓存的子树数量 """
+        self.max_depth = max(max_depth, 1)
+        """ 缓存的子树层数 """
+        self.path = path
+        """ 缓存文件路径 """
+        self.data: OrderedDict[tuple, Tuple[str, tuple]] = OrderedDict()
+        """ 缓存结果，按使用顺序排列 """
+        self.hit_count = 0
+        """ 命中次数 """
+        self.miss_count = 0
+        """ 未命中次数 """
+        self.store_count = 0
+        """ 保存次数 """
+        self.evict_count = 0
+        """ 淘汰次数 """
+        self.saved_bytes = 0
+        """ 命中时复用的字符数 """
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __getstate__(self):
+        """ 序列化时只保存缓存结果，统计不保存 """
+        return {"version": CACHE_VERSION, "data": list(self.data.items())}
+
+    def __setstate__(self, state):
+        self.__init__()
+        if state.get("version") == CACHE_VERSION:
+            self.data.update(state["data"])
+
+    @property
+    def hit_rate(self) -> float:
+        """ 命中率，没有查询时为0 """
+        total = self.hit_count + self.miss_count
+        return self.hit_count / total if total else 0.0
+
+    def get(self, key) -> Tuple[str, tuple] | None:
+        """
+        查询缓存，命中时记录复用的字符数
+        :param key: 键
+        :return: 格式化后的代码和结束时的状态，未命中时为None
+        """
+        value = self.data.get(key)
+        if value is None:
+            self.miss_count += 1
+            return None
+        self.data.move_to_end(key)
+        self.hit_count += 1
+        self.saved_bytes += len(value[0])
+        return value
+
+    def put(self, key, value: Tuple[str, tuple]):
+        """
+        保存结果，超出容量时淘汰最久未使用的结果
+        :param key: 键
+        :param value: 格式化后的代码和结束时的状态
+        """
+        self.data[key] = value
+        self.data.move_to_end(key)
+        self.store_count += 1
+        while len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+            self.evict_count += 1
+
+    def digest_tree(self, token_list: List[Token], rule_digest: bytes) -> Dict[int, bytes]:
+        """
+        计算max_depth层以内存在子节点的token的摘要。
+        语法树按先序展开为平行列表，每个子树在列表中连续，摘要由子树对应的片段计算
+        :param token_list: 语法树
+        :param rule_digest: 格式化规则的摘要，作为摘要的密钥
+        :return: token的id到摘要的映射，只在语法树存活期间有效
+        """
+        name_list = TokenType.name_list
+        max_depth = self.max_depth
+        type_list, start_list, data_list, end_list, count_list = [], [], [], [], []
+        # 计算摘要的token和在列表中的开始下标
+        range_stack: List[Tuple[Token, int]] = []
+        range_list: List[Tuple[Token, int, int]] = []
+
+        def enter(token: Token):
+            if len(range_stack) < max_depth and token.has_tree():
+                range_stack.append((token, len(type_list)))
+            type_list.append(name_list[token.type_id])
+            start_list.append(token.start)
+            data_list.append(token.data)
+            end_list.append(token.end)
+            if token.has_tree():
+                token_tree = token.token_tree
+                count_list.append(len(token_tree))
+                return token_tree
+            count_list.append(0)
+            return None
+
+        def leave(token: Token):
+            if range_stack and range_stack[-1][0] is token:
+                range_list.append((*range_stack.pop(), len(type_list)))
+
+        TreeWalk.walk(token_list, enter, leave)
+        digest_map = {}
+        for token, start, end in range_list:
+            data = (type_list[start:end], start_list[start:end], data_list[start:end], end_list[start:end], count_list[start:end])
+            digest_map[id(token)] = hashlib.blake2b(pickle.dumps(data, DIGEST_PROTOCOL), digest_size=16, key=rule_digest).digest()
+        return digest_map
+
+    def clear(self):
+        """ 清空缓存结果和统计 """
+        self.data.clear()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """ 清空统计，缓存结果保留 """
+        self.hit_count = 0
+        self.miss_count = 0
+        self.store_count = 0
+        self.evict_count = 0
+        self.saved_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        输出统计
+        :return: 统计字典
+        """
+        return {
+            "size": len(self.data),
+            "hit": self.hit_count,
+            "miss": self.miss_count,
+            "hit_rate": self.hit_rate,
+            "store": self.store_count,
+            "evict": self.evict_count,
+            "saved_bytes": self.saved_bytes,
+        }
+
+    def save(self, path=None):
+        """
+        保存缓存结果到文件，先写入临时文件再替换
+        :param path: 文件路径，为None时使用构建时的路径
+        """
+        path = self.path if path is None else path
+        if path is None:
+            raise ValueError("没有指定缓存文件路径")
+        ParserStore.dump(self, path)
+
+    def load(self, path=None):
+        """
+        从文件加载缓存结果，文件损坏或者版本不同时保留当前结果，超出容量时只保留最近使用的结果
+        :param path: 文件路径，为None时使用构建时的路径
+        :return: 是否加载成功
+        """
+        path = self.path if path is None else path
+        try:
+            cache = ParserStore.load(path)
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            return False
+        if not isinstance(cache, FormatCache) or not cache.data:
+            return False
+        for key, value in cache.data.items():
+            self.data[key] = value
+            self.data.move_to_end(key)
+        while len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+        return True
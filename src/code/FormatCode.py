@@ -1,6 +1,8 @@
-from typing import Dict, List
+import hashlib
+import pickle
+from typing import Dict, List, Tuple, Callable
 
-from src.code.CodeParser import Token
+from src.code.CodeParser import Token, TokenType
 
 
 class IndexDict:
@@ -203,9 +205,53 @@ class IterationStack:
         self.iteration_method = method
 
 
+class TreeWalk:
+    """ 显式栈的树遍历，直接迭代原列表，不复制列表，也不为每层创建变量 """
+
+    @staticmethod
+    def walk(token_list: List, enter: Callable, leave: Callable | None = None):
+        """
+        先序遍历，进入节点时调用enter，返回的子项列表会立即展开，子项全部遍历后对该节点调用leave。
+        叶子节点没有后序事件，后续处理直接在enter中完成
+        :param token_list: 遍历的列表
+        :param enter: 进入节点的方法，参数为节点，返回需要展开的子项列表，不展开时返回None或者空列表
+        :param leave: 展开了子项的节点遍历结束的方法，参数为节点
+        """
+        iter_stack = [iter(token_list)]
+        parent_stack = []
+        while iter_stack:
+            for token in iter_stack[-1]:
+                children = enter(token)
+                if children:
+                    iter_stack.append(iter(children))
+                    parent_stack.append(token)
+                    break
+            else:
+                iter_stack.pop()
+                if parent_stack:
+                    token = parent_stack.pop()
+                    if leave is not None:
+                        leave(token)
+
+
 class FormatData:
 
-    def __init__(self):
+    def __init__(self, writer=None, flush_count=4096):
+        """
+        格式化结果
+        :param writer: 写入对象，需要有write方法，为None时在内存中保存全部结果
+        :param flush_count: 存在写入对象时，缓存的片段达到该数量后写出，至少为1
+        """
+        if flush_count < 1:
+            raise ValueError(f'写出数量至少为1：{flush_count}')
+        self.writer = writer
+        """ 写入对象 """
+        self.flush_count = flush_count
+        """ 缓存片段的写出数量 """
+        self.write_length = 0
+        """ 已经写出的字符数 """
+        self.drop_count = 0
+        """ 已经写出并移出缓存的片段数量 """
         self.indent = 0
         """ 当前缩进数量 """
         self._data: List[str] = []
@@ -218,6 +264,8 @@ class FormatData:
         """ 右侧需要空格 """
         self.last_priority_space = 0
         """ 上一个配置的优先级 """
+        self._placeholder = False
+        """ 开头是否为恢复状态时放入的占位片段，输出时跳过 """
 
     def is_not_space(self):
         """ 最后一个字符是否为空 """
@@ -266,14 +314,86 @@ class FormatData:
             if self.need_space and self.is_not_space():
                 self._data.append(" ")
             self._data.append(temp)
+            if self.writer is not None and len(self._data) >= self.flush_count:
+                self.flush()
+
+    def flush(self, is_end=False):
+        """
+        写出缓存的片段，最后一个片段保留在缓存中，用于判断结尾是否为空白
+        :param is_end: 格式化结束，全部写出
+        """
+        if not self._data:
+            return
+        if is_end:
+            data = "".join(self._data)
+            self.drop_count += len(self._data)
+            self._data.clear()
+        else:
+            data = "".join(self._data[:-1])
+            self.drop_count += len(self._data) - 1
+            del self._data[:-1]
+        if data:
+            self.writer.write(data)
+            self.write_length += len(data)
 
     def get_data(self):
         """
         获取数据
         :return:数据
         """
+        if self._placeholder:
+            return "".join(self._data[1:])
         return "".join(self._data)
 
+    def position(self) -> int:
+        """
+        当前写入位置，以片段计数，写出的片段也计算在内
+        :return: 位置
+        """
+        return self.drop_count + len(self._data)
+
+    def data_from(self, position) -> str | None:
+        """
+        获取从指定位置开始写入的数据
+        :param position: position返回的位置
+        :return: 数据，部分已经写出时为None
+        """
+        if position < self.drop_count:
+            return None
+        return "".join(self._data[position - self.drop_count:])
+
+    def replay(self, data: str, state: tuple):
+        """
+        直接写入已经格式化的数据并设置结束时的状态，用于复用缓存的结果
+        :param data: 格式化后的数据
+        :param state: get_state返回的结束时的状态，最后一个字符由数据决定
+        """
+        if data:
+            self._data.append(data)
+        self.indent, self.need_indent, self.last_right_space, self.last_priority_space = state[0:4]
+        if self.writer is not None and len(self._data) >= self.flush_count:
+            self.flush()
+
+    def get_state(self) -> tuple:
+        """
+        获取影响后续格式化结果的状态，need_space在每个token写入前重新计算，不属于状态
+        :return: 缩进数量，是否需要缩进，右侧是否需要空格，上一个配置的优先级，最后一个字符是否不为空白
+        """
+        return self.indent, self.need_indent, self.last_right_space, self.last_priority_space, bool(self.is_not_space())
+
+    def set_state(self, state: tuple):
+        """
+        恢复状态，之后的格式化结果与从该状态继续格式化相同，只用于没有写入对象的空结果
+        :param state: get_state返回的状态
+        """
+        if self._data or self.writer is not None:
+            raise ValueError('只能对没有写入对象的空结果恢复状态')
+        self.indent, self.need_indent, self.last_right_space, self.last_priority_space, not_space = state
+        if not_space:
+            # 最后一个字符只影响是否添加空格和换行，用不为空白的占位片段代替
+            self._data.append("_")
+            self._placeholder = True
+
 
 class FormatCode:
     class _Config:
@@ -335,8 +455,94 @@ class FormatCode:
             self.line_after_interval = line_after_interval
             """ 使用之后强制具有间距 """
 
+    class _Rule:
+        """ 编译后的规则，使用前后的处理按配置生成为闭包，没有处理时为None """
+        __slots__ = ("config", "before", "after")
+
+        def __init__(self, config: 'FormatCode._Config'):
+            self.config = config
+            """ 配置 """
+            self.before: Callable[[FormatData], None] | None = self._before(config)
+            """ 使用前的处理 """
+            self.after: Callable[[FormatData], None] | None = self._after(config)
+            """ 使用后的处理 """
+
+        @staticmethod
+        def _before(config: 'FormatCode._Config'):
+            """
+            生成使用前的处理
+            :param config: 配置
+            :return: 处理方法
+            """
+            indent, line_count, interval = config.indent_before_use, config.line_before_use, config.line_before_interval
+            if not indent and line_count == 0 and not interval:
+                return None
+
+            def before(form_data: FormatData):
+                form_data.indent += indent
+                if line_count != 0:
+                    form_data.code_line(line_count=line_count)
+                if interval:
+                    form_data.code_line(interval)
+
+            return before
+
+        @staticmethod
+        def _after(config: 'FormatCode._Config'):
+            """
+            生成使用后的处理
+            :param config: 配置
+            :return: 处理方法
+            """
+            indent, line_count, interval = config.indent_after_use, config.line_after_use, config.line_after_interval
+            next_line_indent, child_space = config.next_line_indent, config.child_space
+            right_space, priority_space = config.right_space, config.priority_space
+            if not indent and line_count == 0 and not interval and not next_line_indent and not child_space:
+                return None
+
+            def after(form_data: FormatData):
+                form_data.indent += indent
+                if line_count != 0:
+                    form_data.code_line(line_count=line_count)
+                if interval:
+                    form_data.code_line(interval)
+                if next_line_indent:
+                    form_data.code_line()
+                    form_data.code_indent(1)
+                if child_space:
+                    form_data.last_right_space = right_space
+                    form_data.last_priority_space = priority_space
+
+            return after
+
     def __init__(self):
         self.rule = IndexDict()
+        """ 规则，键为类型编号，辅助键为开始字符 """
+        self.rule_table: Dict[Tuple[int, str | None], FormatCode._Rule | None] | None = None
+        """ 编译后的规则表，键为类型编号和开始字符，未登记的开始字符在使用时填充，添加规则时失效 """
+        self.rule_default: Dict[int, FormatCode._Rule | None] = {}
+        """ 编译后每个类型的默认规则 """
+        self.rule_digest: bytes | None = None
+        """ 规则的摘要，用于区分不同规则的缓存结果，添加规则时失效 """
+        self.cache = None
+        """ 格式化结果的缓存，为None时不使用缓存 """
+
+    def __getstate__(self):
+        """ 规则以类型编号为键，序列化时保存类型名称，编译后的规则表使用时重新生成，不保存缓存 """
+        state = self.__dict__.copy()
+        state["rule"] = {TokenType.get_name(type_id): node for type_id, node in self.rule.data.items()}
+        state["rule_table"] = None
+        state["rule_default"] = {}
+        state["rule_digest"] = None
+        state["cache"] = None
+        return state
+
+    def __setstate__(self, state):
+        """ 反序列化时在当前进程重新登记类型 """
+        rule = state.pop("rule")
+        self.__dict__.update(state)
+        self.rule = IndexDict()
+        self.rule.data = {TokenType.get_id(token_type): node for token_type, node in rule.items()}
 
     def add_rule(self, token_type,
                  line_before_use: bool | int = 0,
@@ -393,73 +599,194 @@ class FormatCode:
             line_before_interval,
             line_after_interval,
         )
-        self.rule.set(token_type, data, content)
+        self.rule.set(TokenType.get_id(token_type), data, content)
+        self.rule_table = None
+        self.rule_digest = None
+
+    def set_cache(self, cache):
+        """
+        设置格式化结果的缓存，之后的格式化复用结构和状态相同的子树的结果
+        :param cache: FormatCache，为None时不使用缓存
+        :return: 自身
+        """
+        self.cache = cache
+        return self
+
+    def get_rule_digest(self) -> bytes:
+        """
+        计算规则的摘要，由类型名称、开始字符和配置计算，不同进程中相同的规则摘要相同
+        :return: 摘要
+        """
+        if self.rule_digest is None:
+            rule_list = []
+            for type_id, node in self.rule.data.items():
+                name = TokenType.get_name(type_id)
+                for start, config in node.data.items():
+                    rule_list.append(repr((name, start, None if config is None else sorted(vars(config).items()))))
+                rule_list.append(repr((name, None if node.default is None else sorted(vars(node.default).items()))))
+            rule_list.sort()
+            self.rule_digest = hashlib.blake2b(pickle.dumps(rule_list, 4), digest_size=32).digest()
+        return self.rule_digest
+
+    def compile(self):
+        """
+        将规则编译为以类型编号和开始字符为键的平铺表，相同配置只编译一次
+        :return: 自身
+        """
+        compiled = {}
+        self.rule_table = {}
+        self.rule_default = {}
+        for type_id, node in self.rule.data.items():
+            for start, config in [*node.data.items(), (None, node.default)]:
+                if config is not None and id(config) not in compiled:
+                    compiled[id(config)] = FormatCode._Rule(config)
+            self.rule_default[type_id] = compiled[id(node.default)] if node.default is not None else None
+            for start, config in node.data.items():
+                self.rule_table[(type_id, start)] = compiled[id(config)] if config is not None else None
+        return self
+
+    def get_rule(self, type_id, start) -> _Rule | None:
+        """
+        获取编译后的规则，开始字符未登记时使用类型的默认规则，结果写入规则表
+        :param type_id: 类型编号
+        :param start: 开始字符
+        :return: 规则，没有时为None
+        """
+        key = (type_id, start)
+        rule_table = self.rule_table
+        if key in rule_table:
+            return rule_table[key]
+        rule = self.rule_default.get(type_id)
+        rule_table[key] = rule
+        return rule
 
     def format(self, list_token: List[Token]):
-        iteration_stack = IterationStack()
+        """
+        格式化
+        :param list_token: 语法树
+        :return: 格式化后的代码
+        """
         form_data = FormatData()
+        self._format(list_token, form_data)
+        return form_data.get_data()
 
-        def judge_method(iteration: IterationStack, token: Token):
-            if token.token_tree:
-                iteration.push(token.token_tree)
-                now_rule: FormatCode._Config = self.rule.get(token.type, token.start)
-                if now_rule:
-                    iteration.set("child_line", now_rule.child_line)
-                    iteration.set("child_interval", now_rule.child_interval)
-                    iteration.set("next_token", token.token_tree[0])
-
-        def before_method(iteration: IterationStack, token: Token):
-            now_rule: FormatCode._Config = self.rule.get(token.type, token.start)
-            if now_rule:
-                form_data.indent += now_rule.indent_before_use
-                if now_rule.line_before_use != 0:
-                    form_data.code_line(line_count=now_rule.line_before_use)
-                if now_rule.line_before_interval:
-                    form_data.code_line(now_rule.line_before_interval)
-
-            if iteration.get("child_line", False):
-                form_data.code_line()
-            if iteration.get("child_interval", False):
-                if iteration.get("next_token", None) != token:
+    def format_to(self, list_token: List[Token], writer, flush_count=4096):
+        """
+        格式化并分段写入，遍历语法树的同时写出，不在内存中保留完整结果，写入的内容与format的结果相同
+        :param list_token: 语法树
+        :param writer: 写入对象，如文本模式打开的文件、io.StringIO
+        :param flush_count: 缓存的片段达到该数量后写出，至少为1
+        :return: 写入的字符数
+        """
+        form_data = FormatData(writer, flush_count)
+        self._format(list_token, form_data)
+        form_data.flush(True)
+        return form_data.write_length
+
+    def format_state(self, list_token: List[Token], state: tuple | None = None) -> Tuple[str, tuple]:
+        """
+        从指定状态开始格式化顶层token，用于分段格式化后拼接，各段的结果拼接后与整体格式化的结果相同
+        :param list_token: 语法树
+        :param state: 开始时的状态，为None时从初始状态开始
+        :return: 格式化后的代码，结束时的状态
+        """
+        form_data = FormatData()
+        if state is not None:
+            form_data.set_state(state)
+        self._format(list_token, form_data)
+        return form_data.get_data(), form_data.get_state()
+
+    def _format(self, list_token: List[Token], form_data: FormatData):
+        """
+        遍历语法树，格式化的结果写入form_data
+        :param list_token: 语法树
+        :param form_data: 格式化结果
+        """
+        if self.rule_table is None:
+            self.compile()
+        get_rule = self.get_rule
+        # 展开了子项的节点的规则
+        rule_stack: List[FormatCode._Rule | None] = []
+        # 子项的换行配置：是否换行，是否具有间隔，第一个子项，父级没有规则时为None
+        child_stack: List[Tuple[bool, bool, Token] | None] = [None]
+
+        def enter(token: Token):
+            now_rule = get_rule(token.type_id, token.start)
+            if now_rule and now_rule.before is not None:
+                now_rule.before(form_data)
+
+            child = child_stack[-1]
+            if child is not None:
+                if child[0]:
+                    form_data.code_line()
+                if child[1] and child[2] != token:
                     form_data.code_line(True)
 
             if now_rule:
-                if now_rule.priority_space > form_data.last_priority_space:
-                    form_data.need_space = now_rule.left_space
-                elif now_rule.priority_space == form_data.last_priority_space:
-                    form_data.need_space = now_rule.left_space and form_data.last_right_space
+                config = now_rule.config
+                if config.priority_space > form_data.last_priority_space:
+                    form_data.need_space = config.left_space
+                elif config.priority_space == form_data.last_priority_space:
+                    form_data.need_space = config.left_space and form_data.last_right_space
                 else:
                     form_data.need_space = form_data.last_right_space
-                form_data.last_right_space = now_rule.right_space
-                form_data.last_priority_space = now_rule.priority_space
+                form_data.last_right_space = config.right_space
+                form_data.last_priority_space = config.priority_space
             else:
                 form_data.need_space = form_data.last_right_space
-                flag = False
-                for data in [token.start, token.data, token.end]:
-                    if data is not None and data != "":
-                        flag = True
-                if flag:
+                if token.start or token.data or token.end:
                     form_data.last_right_space = True
             form_data.add_data(token.start, token.data, token.end)
 
-        def after_method(iteration: IterationStack, token: Token):
-            now_rule: FormatCode._Config = self.rule.get(token.type, token.start)
-            if now_rule:
-                form_data.indent += now_rule.indent_after_use
-                if now_rule.line_after_use != 0:
-                    form_data.code_line(line_count=now_rule.line_after_use)
-                if now_rule.line_after_interval:
-                    form_data.code_line(now_rule.line_after_interval)
-                if now_rule.next_line_indent:
-                    form_data.code_line()
-                    form_data.code_indent(1)
-                if now_rule.child_space:
-                    form_data.last_right_space = now_rule.right_space
-                    form_data.last_priority_space = now_rule.priority_space
-
-        iteration_stack.push(list_token)
-        iteration_stack.add_judge(judge_method)
-        iteration_stack.add_before(before_method)
-        iteration_stack.add_after(after_method)
-        iteration_stack.iteration()
-        return form_data.get_data()
+            if token.has_tree():
+                token_tree = token.token_tree
+                rule_stack.append(now_rule)
+                child_stack.append((now_rule.config.child_line, now_rule.config.child_interval, token_tree[0]) if now_rule else None)
+                return token_tree
+            if now_rule and now_rule.after is not None:
+                now_rule.after(form_data)
+            return None
+
+        def leave(token: Token):
+            child_stack.pop()
+            now_rule = rule_stack.pop()
+            if now_rule and now_rule.after is not None:
+                now_rule.after(form_data)
+
+        cache = self.cache
+        if cache is None:
+            TreeWalk.walk(list_token, enter, leave)
+            return
+        digest_map = cache.digest_tree(list_token, self.get_rule_digest())
+        # 展开了子项的节点的缓存键和开始写入的位置，不缓存的节点为None
+        cache_stack: List[Tuple[tuple, int] | None] = []
+
+        def cache_enter(token: Token):
+            digest = digest_map.get(id(token))
+            if digest is None:
+                token_tree = enter(token)
+                if token_tree:
+                    cache_stack.append(None)
+                return token_tree
+            # 子树的结果只取决于进入时的状态和父级的子项换行配置
+            child = child_stack[-1]
+            key = (digest, form_data.get_state(), None if child is None else (child[0], child[1], child[2] is token))
+            value = cache.get(key)
+            if value is not None:
+                form_data.replay(*value)
+                return None
+            position = form_data.position()
+            token_tree = enter(token)
+            if token_tree:
+                cache_stack.append((key, position))
+            return token_tree
+
+        def cache_leave(token: Token):
+            leave(token)
+            item = cache_stack.pop()
+            if item is not None:
+                data = form_data.data_from(item[1])
+                if data is not None:
+                    cache.put(item[0], (data, form_data.get_state()))
+
+        TreeWalk.walk(list_token, cache_enter, cache_leave)
@@ -0,0 +1,219 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Deque, List, Tuple
+
+from src.code.CodeParser import Token, TokenType
+from src.code.FormatCode import FormatCode, FormatData, TreeWalk
+from src.code.ParserProfile import ParserProfile
+
+_format_code: FormatCode | None = None
+""" 当前进程的格式化器 """
+
+
+def _init_worker(format_code: FormatCode):
+    """
+    进程初始化，保存格式化器
+    :param format_code: 格式化器
+    """
+    global _format_code
+    _format_code = format_code
+
+
+def encode_tree(token_list: List[Token], position=False) -> tuple:
+    """
+    将语法树按先序展开为平行列表，只保留格式化需要的信息，序列化的开销远小于直接序列化token
+    :param token_list: 语法树
+    :param position: 同时保留位置和行列
+    :return: 类型编号，开始字符，内容，结束字符，子节点数量，保留位置时还有位置，起始行，结束行，起始列
+    """
+    type_list, start_list, data_list, end_list, count_list = [], [], [], [], []
+    position_list = ([], [], [], []) if position else ()
+
+    def enter(token: Token):
+        type_list.append(token.type_id)
+        start_list.append(token.start)
+        data_list.append(token.data)
+        end_list.append(token.end)
+        if position:
+            position_list[0].append(token.end_index)
+            position_list[1].append(token.line_start)
+            position_list[2].append(token.line_end)
+            position_list[3].append(token.column)
+        if token.has_tree():
+            token_tree = token.token_tree
+            count_list.append(len(token_tree))
+            return token_tree
+        count_list.append(0)
+        return None
+
+    TreeWalk.walk(token_list, enter)
+    return type_list, start_list, data_list, end_list, count_list, *position_list
+
+
+def decode_tree(name_list: List[str | None], data: tuple) -> List[Token]:
+    """
+    还原encode_tree展开的语法树
+    :param name_list: 展开时进程中类型编号对应的名称
+    :param data: encode_tree的结果
+    :return: 语法树
+    """
+    type_id = [TokenType.get_id(name) for name in name_list]
+    root_list = []
+    # 尚未填满子节点的父级列表和剩余数量
+    tree_stack = [root_list]
+    count_stack = [-1]
+    position_iter = zip(*data[5:]) if len(data) > 5 else None
+    for type_index, start, token_data, end, count in zip(*data[:5]):
+        token = Token()
+        token.type_id = type_id[type_index]
+        token.start = start
+        token.data = token_data
+        token.end = end
+        if position_iter is not None:
+            token.end_index, token.line_start, token.line_end, token.column = next(position_iter)
+        tree_stack[-1].append(token)
+        count_stack[-1] -= 1
+        if count:
+            tree_stack.append(token.token_tree)
+            count_stack.append(count)
+        else:
+            while count_stack[-1] == 0:
+                tree_stack.pop()
+                count_stack.pop()
+    return root_list
+
+
+def _format_chunk(name_list: List[str | None], warm_data: tuple | None, chunk_data: tuple) -> Tuple[tuple | None, str, tuple]:
+    """
+    在进程中格式化一段顶层token，开始状态由前面的顶层token推测
+    :param name_list: 类型编号对应的名称
+    :param warm_data: 用于推测开始状态的前置token，为None时从初始状态开始
+    :param chunk_data: 格式化的顶层token
+    :return: 推测的开始状态，格式化后的代码，结束时的状态
+    """
+    state = _format_code.format_state(decode_tree(name_list, warm_data))[1] if warm_data is not None else None
+    return (state, *_format_code.format_state(decode_tree(name_list, chunk_data), state))
+
+
+class ParallelFormat:
+
+    def __init__(self, format_code: FormatCode, max_workers: int | None = None, chunk_size=512, warm_size=1):
+        """
+        多进程分段格式化顶层token，结果与FormatCode.format完全相同。
+        每段展开为平行列表后交给进程，进程中还原为token后格式化。
+        每段的开始状态由前面warm_size个顶层token格式化后的状态推测，拼接时与上一段的结束状态比较，
+        不一致时在当前进程中从实际状态重新格式化该段。
+        同时在进程中的分段最多max_workers个，取回一段后再展开提交下一段，不会一次展开整个语法树
+        :param format_code: 格式化器
+        :param max_workers: 进程数量，默认为CPU数量，为1时在当前进程中格式化
+        :param chunk_size: 每段的顶层token数量
+        :param warm_size: 推测开始状态使用的前置顶层token数量
+        """
+        self.format_code = format_code
+        """ 格式化器 """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        """ 进程数量 """
+        self.chunk_size = max(chunk_size, 1)
+        """ 每段的顶层token数量 """
+        self.warm_size = max(warm_size, 1)
+        """ 推测开始状态使用的前置顶层token数量 """
+        self.chunk_count = 0
+        """ 上一次格式化的分段数量 """
+        self.retry_count = 0
+        """ 上一次格式化中推测状态不一致、重新格式化的分段数量 """
+        self.profile: ParserProfile | None = None
+        """ 性能统计，为None时不记录 """
+
+    def set_profile(self, profile: ParserProfile | None, name="parallel"):
+        """
+        设置性能统计，记录分段数量和重新格式化的分段数量、token数量及耗时
+        :param profile: 性能统计，为None时关闭
+        :param name: 统计中的格式化器名称
+        :return: 自身
+        """
+        self.profile = profile
+        if profile is not None:
+            profile.add_parser(self, name)
+        return self
+
+    def format(self, list_token: List[Token]) -> str:
+        """
+        格式化
+        :param list_token: 语法树
+        :return: 格式化后的代码
+        """
+        return "".join(self.iter_format(list_token))
+
+    def format_to(self, list_token: List[Token], writer) -> int:
+        """
+        格式化并按分段顺序写入
+        :param list_token: 语法树
+        :param writer: 写入对象，需要有write方法
+        :return: 写入的字符数
+        """
+        write_length = 0
+        for data in self.iter_format(list_token):
+            writer.write(data)
+            write_length += len(data)
+        return write_length
+
+    def _submit(self, executor: ProcessPoolExecutor, name_list: List[str | None], list_token: List[Token], index) -> Future:
+        """
+        展开一段顶层token并提交给进程
+        :param executor: 进程池
+        :param name_list: 类型编号对应的名称
+        :param list_token: 语法树
+        :param index: 分段的起始下标
+        :return: 格式化结果
+        """
+        warm_data = encode_tree(list_token[max(index - self.warm_size, 0):index]) if index else None
+        chunk_data = encode_tree(list_token[index:index + self.chunk_size])
+        return executor.submit(_format_chunk, name_list, warm_data, chunk_data)
+
+    def iter_format(self, list_token: List[Token]):
+        """
+        按顺序返回每段格式化后的代码
+        :param list_token: 语法树
+        :return: 每段格式化后的代码
+        """
+        index_list = range(0, len(list_token), self.chunk_size)
+        self.chunk_count = len(index_list)
+        self.retry_count = 0
+        chunk_stat = retry_stat = None
+        if self.profile is not None:
+            name = self.profile.parser_name[self]
+            chunk_stat = self.profile.get_stat("format", name, 0, None, "<分段>")
+            retry_stat = self.profile.get_stat("format", name, 1, None, "<重新格式化>")
+            chunk_stat.matched += self.chunk_count
+            chunk_stat.length += len(list_token)
+        if self.max_workers == 1 or self.chunk_count <= 1:
+            yield self.format_code.format(list_token)
+            return
+        state = FormatData().get_state()
+        name_list = [*TokenType.name_list]
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker, initargs=(self.format_code,)) as executor:
+            future_list: Deque[Future] = deque()
+            submit_iter = iter(index_list)
+            try:
+                for index in index_list:
+                    # 补充提交到max_workers个分段
+                    for submit_index in islice(submit_iter, self.max_workers - len(future_list)):
+                        future_list.append(self._submit(executor, name_list, list_token, submit_index))
+                    start_state, data, end_state = future_list.popleft().result()
+                    if start_state is not None and start_state != state:
+                        self.retry_count += 1
+                        start = time.perf_counter()
+                        data, end_state = self.format_code.format_state(list_token[index:index + self.chunk_size], state)
+                        if retry_stat is not None:
+                            retry_stat.matched += 1
+                            retry_stat.length += len(list_token[index:index + self.chunk_size])
+                            retry_stat.time += time.perf_counter() - start
+                    state = end_state
+                    yield data
+            finally:
+                # 提前停止迭代时，不再格式化尚未开始的分段
+                for future in future_list:
+                    future.cancel()
@@ -0,0 +1,298 @@
+import types
+from typing import List, Dict, Callable
+
+
+def _label_call(method, *args):
+    """
+    调用方法，复制代码对象改名后作为cProfile中的阶段标签
+    :param method: 方法
+    :param args: 参数
+    :return: 方法的返回值
+    """
+    return method(*args)
+
+
+class RuleStat:
+    """ 单个规则的统计 """
+    __slots__ = ("kind", "parser", "index", "type", "rule", "tried", "matched", "selected", "length", "time")
+
+    def __init__(self, kind, parser, index, rule_type, rule):
+        """
+        :param kind: 统计来源，token为词法，syntax为语法，format为分段格式化
+        :param parser: 解析器名称，语法带上流的优先级
+        :param index: 规则在解析器中的下标，-1为没有规则匹配的位置，-2为全部规则共用的部分
+        :param rule_type: 规则的类型
+        :param rule: 规则的文本
+        """
+        self.kind = kind
+        """ 统计来源 """
+        self.parser = parser
+        """ 解析器名称 """
+        self.index = index
+        """ 规则下标 """
+        self.type = rule_type
+        """ 规则类型 """
+        self.rule = rule
+        """ 规则文本 """
+        self.tried = 0
+        """ 尝试的次数，词法为读取到开始、开始判断的次数，语法为根据首个token选为候选的次数，共用部分为匹配的位置数量 """
+        self.matched = 0
+        """ 满足的次数，词法为完整匹配、进入候选结果的次数，语法为匹配完成、进入候选结果的次数，没有规则匹配的位置记在下标-1上，分段格式化为分段数量和重新格式化的分段数量 """
+        self.selected = 0
+        """ 被选中的次数，同一位置的候选结果中只有一个被选中 """
+        self.length = 0
+        """ 选中时消耗的长度，词法为字符数，字节模式为字节数，语法为token数，分段格式化为顶层token数 """
+        self.time = 0.0
+        """ 规则自身的累计耗时，不论是否满足，词法为组合因子查找结尾的耗时，语法为逐个token判断的耗时；前缀查找、候选选取和排序等共用部分记在下标-2上；分段格式化只记录重新格式化的耗时 """
+
+    def to_dict(self) -> dict:
+        """
+        转为字典
+        :return: 统计字典
+        """
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class ProfiledMatch:
+    """ 记录统计的词法匹配器，接口与被包装的匹配器相同 """
+
+    def __init__(self, parser_match, stat_map: Dict[object, RuleStat], miss_stat: RuleStat, shared_stat: RuleStat, method: Callable):
+        """
+        :param parser_match: 被包装的匹配器
+        :param stat_map: 规则到统计的映射
+        :param miss_stat: 没有规则匹配时的统计
+        :param shared_stat: 全部规则共用部分的统计
+        :param method: 实际调用的匹配方法，尝试次数和耗时由匹配方法记录
+        """
+        self.parser_match = parser_match
+        """ 被包装的匹配器 """
+        self.stat_map = stat_map
+        """ 规则到统计的映射 """
+        self.miss_stat = miss_stat
+        """ 没有规则匹配时的统计 """
+        self.shared_stat = shared_stat
+        """ 全部规则共用部分的统计 """
+        self.method = method
+        """ 实际调用的匹配方法 """
+
+    @property
+    def start_pattern(self):
+        """ 能够作为起始的字符组成的正则 """
+        return self.parser_match.start_pattern
+
+    @property
+    def need_more(self):
+        """ 上一次匹配到源码结尾仍未确定结果，需要更多字符 """
+        return self.parser_match.need_more
+
+    def match(self, index, source_code):
+        """
+        匹配从下标开始的全部因子，并记录统计
+        :param index: 下标
+        :param source_code: 源码
+        :return: 匹配结果
+        """
+        result = self.method(index, source_code, self.stat_map, self.shared_stat)
+        if not result:
+            self.miss_stat.matched += 1
+            return result
+        for match_result in result:
+            self.stat_map[match_result.token_rule].matched += 1
+        # 解析时总是选取最后一个结果
+        stat = self.stat_map[result[-1].token_rule]
+        stat.selected += 1
+        stat.length += result[-1].end_index + 1 - index
+        return result
+
+
+class ProfiledSyntax:
+    """ 记录统计的语法阶段匹配 """
+
+    def __init__(self, stat_map: Dict[object, RuleStat], miss_stat: RuleStat, shared_stat: RuleStat, method: Callable):
+        """
+        :param stat_map: 语法到统计的映射
+        :param miss_stat: 没有语法匹配时的统计
+        :param shared_stat: 全部语法共用部分的统计
+        :param method: 实际调用的匹配方法，尝试次数和耗时由匹配方法记录
+        """
+        self.stat_map = stat_map
+        """ 语法到统计的映射 """
+        self.miss_stat = miss_stat
+        """ 没有语法匹配时的统计 """
+        self.shared_stat = shared_stat
+        """ 全部语法共用部分的统计 """
+        self.method = method
+        """ 实际调用的匹配方法 """
+
+    def match(self, factor, index, token_list, match_pool=None):
+        """
+        选取因子，并记录统计
+        :param factor: 因子列表
+        :param index: 当前下标
+        :param token_list: token列表
+        :param match_pool: 复用的匹配对象，为None时新建
+        :return: 因子匹配式子，是否读取到结尾
+        """
+        result = self.method(factor, index, token_list, None, match_pool, self.stat_map, self.shared_stat)
+        if not result[0]:
+            self.miss_stat.matched += 1
+            return result
+        for syntax_match in result[0]:
+            self.stat_map[syntax_match.syntax_factor].matched += 1
+        # 解析时总是选取第一个结果
+        stat = self.stat_map[result[0][0].syntax_factor]
+        stat.selected += 1
+        stat.length += result[0][0].now_index
+        return result
+
+
+class ParserProfile:
+    """
+    解析器的性能统计，记录每个词法规则和语法的尝试次数、满足次数、选中次数、消耗长度和自身的匹配耗时，多个规则共用的耗时单独记录。
+    通过CodeParser.set_profile、SyntaxParser.set_profile和ParallelFormat.set_profile启用，未启用时解析器不做任何额外工作。
+    use_label为True时匹配通过以解析器命名的方法调用，cProfile的结果中可以按解析器和语法阶段区分耗时
+    """
+
+    def __init__(self, use_label=False):
+        """
+        :param use_label: 匹配通过带标签的方法调用，供cProfile区分阶段
+        """
+        self.use_label = use_label
+        """ 匹配通过带标签的方法调用 """
+        self.parser_name: Dict[object, str] = {}
+        """ 解析器名称，名称相同的解析器合并统计 """
+        self.stat: Dict[tuple, RuleStat] = {}
+        """ 全部统计，键为来源、解析器名称和规则下标 """
+        self.match_map: Dict[object, ProfiledMatch] = {}
+        """ 按匹配器缓存的包装，注册因子后匹配器重新生成 """
+        self.syntax_map: Dict[object, ProfiledSyntax] = {}
+        """ 按语法流缓存的包装 """
+        self.label_map: Dict[str, Callable] = {}
+        """ 按名称缓存的标签方法 """
+
+    def add_parser(self, parser, name=None) -> str:
+        """
+        登记解析器名称
+        :param parser: 解析器
+        :param name: 名称，为None时按登记顺序命名
+        :return: 名称
+        """
+        if name is None:
+            name = self.parser_name.get(parser, f'parser{len(self.parser_name)}')
+        self.parser_name[parser] = name
+        return name
+
+    def get_stat(self, kind, parser, index, rule_type, rule) -> RuleStat:
+        """
+        获取统计，不存在时新建
+        :param kind: 统计来源
+        :param parser: 解析器名称
+        :param index: 规则下标
+        :param rule_type: 规则类型
+        :param rule: 规则文本
+        :return: 统计
+        """
+        key = (kind, parser, index)
+        if key not in self.stat:
+            self.stat[key] = RuleStat(kind, parser, index, rule_type, rule)
+        return self.stat[key]
+
+    def label(self, name) -> Callable:
+        """
+        获取带标签的调用方法，cProfile中以标签作为方法名
+        :param name: 标签
+        :return: 调用方法，第一个参数为实际调用的方法
+        """
+        if name not in self.label_map:
+            self.label_map[name] = types.FunctionType(_label_call.__code__.replace(co_name=name), _label_call.__globals__, name)
+        return self.label_map[name]
+
+    @staticmethod
+    def _rule_text(token_rule) -> str:
+        """
+        词法规则的文本
+        :param token_rule: 词法规则
+        :return: 开始和结束组成的文本
+        """
+        start, end = token_rule.start, token_rule.end
+        start = getattr(start, "data", start)
+        text = start if isinstance(start, str) else str(start, "utf-8", "replace")
+        if end is not None:
+            text += "…" + (end if isinstance(end, str) else str(end, "utf-8", "replace"))
+        return text
+
+    def token_match(self, code_parser, parser_match) -> ProfiledMatch:
+        """
+        包装词法匹配器
+        :param code_parser: 词法解析器
+        :param parser_match: 匹配器
+        :return: 记录统计的匹配器
+        """
+        profiled = self.match_map.get(parser_match)
+        if profiled is not None:
+            return profiled
+        name = self.add_parser(code_parser, self.parser_name.get(code_parser))
+        stat_map = {}
+        for index, token_rule in enumerate(code_parser.parser_match.data):
+            stat_map[token_rule] = self.get_stat("token", name, index, token_rule.status, self._rule_text(token_rule))
+        miss_stat = self.get_stat("token", name, -1, None, "<未匹配>")
+        shared_stat = self.get_stat("token", name, -2, None, "<共用>")
+        method = parser_match.match
+        if self.use_label:
+            method = types.MethodType(self.label(f'<token {name}>'), method)
+        profiled = ProfiledMatch(parser_match, stat_map, miss_stat, shared_stat, method)
+        self.match_map[parser_match] = profiled
+        return profiled
+
+    def syntax_match(self, syntax_parser, flow, method) -> ProfiledSyntax:
+        """
+        包装语法阶段的匹配
+        :param syntax_parser: 语法解析器
+        :param flow: 语法流
+        :param method: 匹配方法
+        :return: 记录统计的匹配
+        """
+        profiled = self.syntax_map.get(flow)
+        if profiled is not None:
+            return profiled
+        name = f'{self.add_parser(syntax_parser, self.parser_name.get(syntax_parser))}:{flow.index}'
+        stat_map = {}
+        for index, syntax_factor in enumerate(flow.flow_data.data):
+            stat_map.setdefault(syntax_factor, self.get_stat("syntax", name, index, syntax_factor.status, syntax_factor.status))
+        miss_stat = self.get_stat("syntax", name, -1, None, "<未匹配>")
+        shared_stat = self.get_stat("syntax", name, -2, None, "<共用>")
+        if self.use_label:
+            method = types.MethodType(self.label(f'<syntax {name}>'), method)
+        profiled = ProfiledSyntax(stat_map, miss_stat, shared_stat, method)
+        self.syntax_map[flow] = profiled
+        return profiled
+
+    def reset(self):
+        """ 清空统计，解析器的登记保留 """
+        self.stat.clear()
+        self.match_map.clear()
+        self.syntax_map.clear()
+
+    def report(self, kind=None) -> List[dict]:
+        """
+        输出结构化的统计，按耗时降序
+        :param kind: 只输出的来源，token、syntax或者format，为None时全部输出
+        :return: 统计字典列表
+        """
+        stat_list = [stat for stat in self.stat.values() if kind is None or stat.kind == kind]
+        stat_list.sort(key=lambda stat: stat.time, reverse=True)
+        return [stat.to_dict() for stat in stat_list]
+
+    def format_report(self, kind=None, limit=20) -> str:
+        """
+        输出统计表格
+        :param kind: 只输出的来源，token、syntax或者format，为None时全部输出
+        :param limit: 最多输出的行数
+        :return: 表格文本
+        """
+        line_list = [f'{"来源":<6}\t{"解析器":<16}\t{"下标":>4}\t{"规则":<24}\t{"尝试":>8}\t{"满足":>8}\t{"选中":>8}\t{"长度":>10}\t{"耗时ms":>10}']
+        for stat in self.report(kind)[0:limit]:
+            # 规则中的空白和换行转义显示
+            rule = stat["rule"] if stat["index"] < 0 else repr(stat["rule"])
+            line_list.append(f'{stat["kind"]:<6}\t{stat["parser"]:<16}\t{stat["index"]:>4}\t{rule:<24}\t{stat["tried"]:>8}\t{stat["matched"]:>8}\t{stat["selected"]:>8}\t{stat["length"]:>10}\t{stat["time"] * 1000:>10.2f}')
+        return "\n".join(line_list)
@@ -0,0 +1,80 @@
+import gc
+import hashlib
+import os
+import pickle
+import struct
+import zlib
+
+STORE_MAGIC = b"CPSTORE\0"
+""" 文件标识 """
+STORE_VERSION = 1
+""" 存储格式版本，发布的版本之间解析器的内部结构不兼容时递增，旧版本的文件不再加载 """
+STORE_HEADER = struct.Struct("<8sHQ32s")
+""" 文件头：文件标识，格式版本，载荷长度，载荷的sha256 """
+
+
+class ParserStore:
+    """ 构建完成的解析器配置的存储，加载时不再重复注册规则和构建前缀树，载荷使用pickle，只加载可信来源的文件 """
+
+    @staticmethod
+    def dumps(config) -> bytes:
+        """
+        导出配置，可以是CodeParser、SyntaxParser、FormatCode或者它们组成的容器
+        :param config: 配置
+        :return: 文件内容
+        """
+        try:
+            payload = pickle.dumps(config, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise ValueError(f'配置中存在无法导出的对象，处理方法需要使用模块级方法或者partial，不能使用lambda：{e}') from e
+        payload = zlib.compress(payload)
+        return STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, len(payload), hashlib.sha256(payload).digest()) + payload
+
+    @staticmethod
+    def loads(data: bytes):
+        """
+        加载配置，校验文件标识、格式版本和内容摘要
+        :param data: 文件内容
+        :return: 配置
+        """
+        if len(data) < STORE_HEADER.size:
+            raise ValueError("配置文件不完整")
+        magic, version, length, digest = STORE_HEADER.unpack_from(data)
+        if magic != STORE_MAGIC:
+            raise ValueError("不是解析器配置文件")
+        if version != STORE_VERSION:
+            raise ValueError(f'配置文件版本{version}与当前版本{STORE_VERSION}不一致，需要重新导出')
+        payload = memoryview(data)[STORE_HEADER.size:]
+        if len(payload) != length or hashlib.sha256(payload).digest() != digest:
+            raise ValueError("配置文件校验失败，内容已损坏")
+        # 加载时会创建大量小对象，暂停垃圾回收避免反复扫描
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return pickle.loads(zlib.decompress(payload))
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    @staticmethod
+    def dump(config, path):
+        """
+        导出配置到文件，先写入临时文件再替换，不会留下写了一半的文件
+        :param config: 配置
+        :param path: 文件路径
+        """
+        data = ParserStore.dumps(config)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path):
+        """
+        从文件加载配置
+        :param path: 文件路径
+        :return: 配置
+        """
+        with open(path, "rb") as file:
+            return ParserStore.loads(file.read())
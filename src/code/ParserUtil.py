@@ -1,6 +1,7 @@
 from typing import List, Dict
 
-from src.code.CodeParser import Token
+from src.code.CodeParser import Token, TokenType
+from src.code.FormatCode import TreeWalk
 
 
 class CodeHandle:
@@ -10,17 +11,15 @@ class CodeHandle:
         替换代码
         :param old_code: 旧代码
         :param code_token: 旧代码的token
-        :param token_list: 要替换的新token
+        :param token_list: 要替换的新token，与树中的token按先序一一对应
         :return:
         """
         new_code = []
         now_index = 0
-        token_index = 0
-        recursion_stack = [*code_token]
-        recursion_stack.reverse()
+        replace_data = iter(token_list)
 
-        while recursion_stack:
-            token = recursion_stack.pop()
+        def enter(token: Token):
+            nonlocal now_index
             # 计算切割位置
             end_index = token.end_index
             if token.end:
@@ -30,13 +29,14 @@ class CodeHandle:
             new_code.append(old_code[now_index:start_index])
             now_index = end_index + 1
             # 替换
-            new_code.append(token_list[token_index])
-            token_index += 1
+            data = next(replace_data, None)
+            if data is None:
+                raise ValueError(f'替换内容的数量少于token数量：{len(token_list)}')
+            new_code.append(data)
             # 深层递归
-            if token.token_tree:
-                next_list = [*token.token_tree]
-                next_list.reverse()
-                recursion_stack.extend(next_list)
+            return token.token_tree if token.has_tree() else None
+
+        TreeWalk.walk(code_token, enter)
         new_code.append(old_code[now_index:len(old_code)])
         return "".join(new_code)
 
@@ -53,70 +53,88 @@ class CodeHandle:
         :return:
         """
         replace_data = []
-        rule = replace_rule
-        # 大小写统一处理
-        if ignore_case:
-            rule = {}
-            for token_type, token_replace in replace_rule.items():
-                rule[token_type.lower()] = {}
-                for old_data, new_data in token_replace.items():
-                    rule[token_type.lower()][old_data.lower()] = new_data
-        recursion_stack = [*code_token]
-        recursion_stack.reverse()
-        while recursion_stack:
-            token = recursion_stack.pop()
+        rule = {}
+        for token_type, token_replace in replace_rule.items():
+            # 大小写统一处理
+            if ignore_case:
+                rule[TokenType.get_id(token_type.lower())] = {old_data.lower(): new_data for old_data, new_data in token_replace.items()}
+            else:
+                rule[TokenType.get_id(token_type)] = token_replace
+
+        def enter(token: Token):
             # 类型
             compare = token.data
             if ignore_case:
                 compare = compare.lower()
-            if token.type in rule and compare in rule[token.type]:
-                replace_data.append(rule[token.type][compare])
+            if token.type_id in rule and compare in rule[token.type_id]:
+                replace_data.append(rule[token.type_id][compare])
             else:
                 replace_data.append(token.data)
             # 如果有深层，则对深层的进行递归
-            if token.token_tree:
-                next_list = [*token.token_tree]
-                next_list.reverse()
-                recursion_stack.extend(next_list)
+            return token.token_tree if token.has_tree() else None
+
+        TreeWalk.walk(code_token, enter)
         # 返回
         return replace_data
 
     @staticmethod
     def equal(a_token: Token, b_token: Token):
-        type_flag = b_token.type is None or a_token.type == b_token.type
+        type_flag = b_token.type_id == 0 or a_token.type_id == b_token.type_id
         data_flag = b_token.start is None or b_token.start == a_token.start
         data_flag = data_flag and (b_token.data is None or b_token.data == "" or b_token.data == a_token.data)
         data_flag = data_flag and (b_token.end is None or b_token.end == a_token.end)
         return type_flag and data_flag
 
     @staticmethod
-    def match(list_token: List[Token], rule: List[Token]):
-        flag = True
-        for index in range(0, len(rule)):
-            match_token = list_token[index]
-            rule_token = rule[index]
-            if CodeHandle.equal(match_token, rule_token):
-                flag = flag and CodeHandle.match(match_token.token_tree, rule_token.token_tree)
-            else:
+    def match(list_token: List[Token], rule: List[Token], start_index=0):
+        """
+        判断从指定位置开始的token是否满足规则，子节点同样需要满足规则的子节点
+        :param list_token: token列表
+        :param rule: 规则
+        :param start_index: 起始下标
+        :return: 是否满足
+        """
+        recursion_stack = [(list_token, rule, start_index)]
+        while recursion_stack:
+            now_list, now_rule, now_index = recursion_stack.pop()
+            # 剩余token不足时不满足
+            if len(now_list) - now_index < len(now_rule):
                 return False
-        return flag
+            for rule_token in now_rule:
+                match_token = now_list[now_index]
+                if not CodeHandle.equal(match_token, rule_token):
+                    return False
+                if rule_token.has_tree():
+                    recursion_stack.append((match_token.token_tree, rule_token.token_tree, 0))
+                now_index += 1
+        return True
 
     @staticmethod
     def find(list_token: List[Token], rule: List[Token], result: []):
-        index = 0
-        for token in list_token:
-            if CodeHandle.match(list_token[index:], rule):
+        # 先序遍历，先判断当前位置，再进入子节点，最后处理下一个兄弟节点
+        recursion_stack = [(list_token, 0)]
+        while recursion_stack:
+            now_list, index = recursion_stack.pop()
+            if index >= len(now_list):
+                continue
+            token = now_list[index]
+            if CodeHandle.match(now_list, rule, index):
                 result.append(token)
-            index += 1
-            if token.token_tree:
-                CodeHandle.find(token.token_tree, rule, result)
+            recursion_stack.append((now_list, index + 1))
+            if token.has_tree():
+                recursion_stack.append((token.token_tree, 0))
 
     @staticmethod
     def tree_replace(list_token: List[Token], rule: List[Token], get_token_method):
-        index = 0
-        for token in list_token:
-            if CodeHandle.match(list_token[index:], rule):
-                list_token[index] = get_token_method(list_token[index])
-            index += 1
-            if token.token_tree:
-                CodeHandle.tree_replace(token.token_tree, rule, get_token_method)
+        recursion_stack = [(list_token, 0)]
+        while recursion_stack:
+            now_list, index = recursion_stack.pop()
+            if index >= len(now_list):
+                continue
+            # 替换后仍然进入原token的子节点
+            token = now_list[index]
+            if CodeHandle.match(now_list, rule, index):
+                now_list[index] = get_token_method(token)
+            recursion_stack.append((now_list, index + 1))
+            if token.has_tree():
+                recursion_stack.append((token.token_tree, 0))
@@ -1,17 +1,25 @@
 import time
-from typing import List, Dict
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from functools import partial
+from typing import List, Dict, Set, Tuple, Callable, Generator
 
 from src.code.ChiyaScript import LoggerUtil
-from src.code.CodeParser import Token
+from src.code.CodeParser import Token, TokenType
 from src.code.Flow import Flow
+from src.code.ParserProfile import ParserProfile, RuleStat
 
 
 def token_debug(tokens: Token | List[Token], indent=0):
     if isinstance(tokens, Token):
         tokens = [tokens]
-    for token in tokens:
+    # 显式栈先序遍历，嵌套层数不受递归深度限制
+    stack = [(token, indent) for token in reversed(tokens)]
+    while stack:
+        token, now_indent = stack.pop()
         token_info = LoggerUtil.padding([
-            f'{indent * "  "}{token.type}',
+            f'{now_indent * "  "}{token.type}',
             f'开始行:{token.line_start}',
             f'结束行:{token.line_end}',
             token.end_index,
@@ -20,8 +28,8 @@ def token_debug(tokens: Token | List[Token], indent=0):
             f'{token.end}'.encode()
         ], [35, 15, 15, 20, 15, 25, 5])
         print(token_info)
-        if token.token_tree:
-            token_debug(token.token_tree, indent + 1)
+        if token.has_tree():
+            stack.extend((child, now_indent + 1) for child in reversed(token.token_tree))
 
 
 class WordRule:
@@ -64,9 +72,24 @@ class LexicalFactor:
         self.word_rule = word_rule
         """ token的值 """
         self.type.extend(token_type)
+        self.type_id = TokenType.get_ids(self.type)
+        """ token类型编号 """
+        self.any_type = None in self.type or len(self.type) == 0
+        """ 匹配任意类型 """
         self.allow_end = allow_end
         """ 允许结尾没有匹配 """
 
+    def __getstate__(self):
+        """ 序列化时不保存类型编号，类型编号只在当前进程有效 """
+        state = self.__dict__.copy()
+        del state["type_id"]
+        return state
+
+    def __setstate__(self, state):
+        """ 反序列化时在当前进程重新登记类型 """
+        self.__dict__.update(state)
+        self.type_id = TokenType.get_ids(self.type)
+
 
 class SyntaxFactor:
 
@@ -84,12 +107,16 @@ class SyntaxFactor:
         """ 语法结构 """
         self.status = status
         """ 自身类型 """
+        self.status_id = TokenType.get_id(status)
+        """ 自身类型编号 """
         self.need_match = need_match
         """ 需要匹配 """
         self.need_paired = need_paired
         """ 需要左右成对 """
         self.token_type: Dict[int, str | Dict[str, str]] = {}
         """ 匹配后替换的token类型 """
+        self.type_id: Dict[int, int | Dict[int, int]] = {}
+        """ 匹配后替换的token类型编号 """
         self.extend_type = extend_type
         """ 继承类型为特定位置上的类型 """
         self.father_index = father_index
@@ -112,6 +139,25 @@ class SyntaxFactor:
         :param type_info:类型列表
         """
         self.token_type.update(type_info)
+        for index, token_type in type_info.items():
+            if isinstance(token_type, str):
+                self.type_id[index] = TokenType.get_id(token_type)
+            elif isinstance(token_type, dict):
+                self.type_id[index] = {TokenType.get_id(old_type): TokenType.get_id(new_type) for old_type, new_type in token_type.items()}
+
+    def __getstate__(self):
+        """ 序列化时不保存类型编号，类型编号只在当前进程有效 """
+        state = self.__dict__.copy()
+        del state["status_id"]
+        del state["type_id"]
+        return state
+
+    def __setstate__(self, state):
+        """ 反序列化时在当前进程重新登记类型 """
+        self.__dict__.update(state)
+        self.status_id = TokenType.get_id(self.status)
+        self.type_id = {}
+        self.add_type(self.token_type)
 
 
 class SyntaxMatch:
@@ -131,6 +177,16 @@ class SyntaxMatch:
         """ 标记允许匹配到结尾中止 """
         self.first_flag = True
 
+    def reset(self):
+        """ 重置匹配状态，复用匹配对象 """
+        self.now_index = 0
+        self.paired_start_count = 0
+        self.paired_end_count = 0
+        self.paired_flag = False
+        self.end_flag = False
+        self.first_flag = True
+        return self
+
     @staticmethod
     def token_same(now_factor, now_token):
         """
@@ -139,7 +195,7 @@ class SyntaxMatch:
         :param now_token:
         :return:
         """
-        in_type = None in now_factor.type or now_token.type in now_factor.type or len(now_factor.type) == 0
+        in_type = now_factor.any_type or now_token.type_id in now_factor.type_id
         in_data = now_factor.word_rule is None or now_factor.word_rule.is_same(now_token)
         return in_type and in_data
 
@@ -181,24 +237,38 @@ class SyntaxMatch:
                 is_similar = self.token_same(now_factor, next_token)
                 return is_similar, is_similar and is_end
 
-    def change_type(self, token_list: List[Token]):
+    def change_type(self, token_list: List[Token], offset=0, length=None):
         """
         匹配后更改对应位置的token类型，以配置的类型为基准
         :param token_list:token列表
+        :param offset: 匹配片段在列表中的起始下标
+        :param length: 匹配片段长度，默认到列表结尾
         """
-        for index, token_type in self.syntax_factor.token_type.items():
-            if isinstance(token_type, str):
+        if length is None:
+            length = len(token_list) - offset
+        for index, type_id in self.syntax_factor.type_id.items():
+            # 负数下标从片段结尾计算
+            token = token_list[offset + (index if index >= 0 else length + index)]
+            if isinstance(type_id, int):
                 # 字符串的情况
-                token_list[index].type = token_type
-            elif isinstance(token_type, dict) and token_list[index].type in token_type:
+                token.type_id = type_id
+            elif token.type_id in type_id:
                 # 字典的情况
-                token_list[index].type = token_type[token_list[index].type]
+                token.type_id = type_id[token.type_id]
 
 
 class SyntaxList:
     def __init__(self):
         self.data: List[SyntaxFactor] = []
         """ 语法 """
+        self.word_data = set()
+        """ 语法首个词法限定的内容 """
+        self.dispatch: Dict[Tuple[int, str | None], List[Tuple[int, WordRule | None]]] = {}
+        """ 首个token的分派索引，键为类型编号和内容，值为可能匹配的语法下标以及仍需判断的字符规则 """
+        self.word_type: Set[int] | None = None
+        """ 首个词法限定内容的语法接受的类型编号，只有这些类型需要读取内容，与分派索引一起生成 """
+        self.word_any = False
+        """ 存在首个词法限定内容且不限类型的语法，此时全部类型都需要读取内容 """
 
     def add_syntax(self, syntax: SyntaxFactor):
         """
@@ -206,6 +276,83 @@ class SyntaxList:
         :param syntax: 语法
         """
         self.data.append(syntax)
+        self.dispatch.clear()
+        self.word_type = None
+        if syntax.syntax and syntax.syntax[0].word_rule is not None and syntax.syntax[0].word_rule.data is not None:
+            self.word_data.add(syntax.syntax[0].word_rule.data)
+
+    def __getstate__(self):
+        """ 分派索引以类型编号为键，序列化时丢弃，使用时重新生成 """
+        state = self.__dict__.copy()
+        state["dispatch"] = {}
+        state["word_type"] = None
+        return state
+
+    def _build_word_type(self):
+        """ 生成需要读取内容的类型编号 """
+        self.word_type = set()
+        self.word_any = False
+        for syntax in self.data:
+            if syntax.syntax and syntax.syntax[0].word_rule is not None and syntax.syntax[0].word_rule.data is not None:
+                if syntax.syntax[0].any_type:
+                    self.word_any = True
+                self.word_type.update(syntax.syntax[0].type_id)
+
+    @staticmethod
+    def _first_accept(syntax: SyntaxFactor, type_id, data):
+        """
+        首个token的类型和内容是否可能满足语法
+        :param syntax: 语法
+        :param type_id: 类型编号
+        :param data: 内容，不在限定内容中时为None
+        :return: True/False
+        """
+        if not syntax.syntax:
+            return True
+        first = syntax.syntax[0]
+        type_flag = first.any_type or type_id in first.type_id
+        data_flag = first.word_rule is None or first.word_rule.data is None or first.word_rule.data == data
+        return type_flag and data_flag
+
+    def match_pool(self) -> List[SyntaxMatch]:
+        """
+        生成复用的匹配对象，与语法一一对应，只在单个解析任务内使用，不同任务和线程之间不共享
+        :return: 匹配对象
+        """
+        return [SyntaxMatch(syntax) for syntax in self.data]
+
+    def candidate(self, token: Token, match_pool: List[SyntaxMatch] | None = None) -> List[SyntaxMatch]:
+        """
+        根据首个token选取可能匹配的语法
+        :param token: 首个token
+        :param match_pool: 复用的匹配对象，由match_pool生成，返回其中重置后的对象，为None时新建匹配对象
+        :return: 匹配对象
+        """
+        if self.word_type is None:
+            self._build_word_type()
+        type_id = token.type_id
+        # 只有存在限定内容的语法时才读取内容，其余token的内容保持延迟生成
+        if self.word_any or type_id in self.word_type:
+            data = token.data
+            key = (type_id, data if data in self.word_data else None)
+        else:
+            key = (type_id, None)
+        candidate_list = self.dispatch.get(key)
+        if candidate_list is None:
+            candidate_list = []
+            for index, syntax in enumerate(self.data):
+                if self._first_accept(syntax, *key):
+                    word_rule = syntax.syntax[0].word_rule if syntax.syntax else None
+                    # 内容已经由索引判断，只保留还需判断开始结束字符的规则
+                    if word_rule is not None and word_rule.start is None and word_rule.end is None:
+                        word_rule = None
+                    candidate_list.append((index, word_rule))
+            self.dispatch[key] = candidate_list
+        out_list = []
+        for index, word_rule in candidate_list:
+            if word_rule is None or word_rule.is_same(token):
+                out_list.append(SyntaxMatch(self.data[index]) if match_pool is None else match_pool[index].reset())
+        return out_list
 
     def to_match(self) -> List[SyntaxMatch]:
         """
@@ -243,11 +390,181 @@ class SyntaxParserConfig:
         self.next_paser = next_paser
 
 
+class SyntaxMemo:
+    """ 递归片段的解析结果模板，可以在内容相同的片段上重放 """
+
+    def __init__(self, token_list: List[Token], tree_size: List[int], result: List[Token]):
+        """
+        根据一次解析记录模板
+        :param token_list: 解析的片段
+        :param tree_size: 解析前片段中每个token的子节点数量
+        :param result: 解析结果
+        """
+        position = {id(token): index for index, token in enumerate(token_list)}
+        self.token_list = token_list
+        """ 解析的片段，键相同时用于比较内容 """
+        self.type_list = [token.type_id for token in token_list]
+        """ 解析后片段中每个token的类型编号 """
+        self.step_list: List[Tuple[int, int, tuple | None]] = []
+        """ 按后序排列的重放步骤，片段中的token记录下标，新建的token记录内容，以及添加的子节点数量 """
+        stack = [(token, False) for token in reversed(result)]
+        while stack:
+            token, visited = stack.pop()
+            index = position.get(id(token), -1)
+            children = []
+            if token.has_tree():
+                # 片段中的token只记录合并进来的子节点
+                children = token.token_tree[tree_size[index]:] if index >= 0 else token.token_tree
+            if visited:
+                info = None if index >= 0 else (token.type_id, token.start, token.data, token.end, token.line_start, token.line_end)
+                self.step_list.append((index, len(children), info))
+                continue
+            stack.append((token, True))
+            stack.extend((child, False) for child in reversed(children))
+
+    def same_data(self, token_list: List[Token]) -> bool:
+        """
+        片段内容是否与模板相同，只在记忆表的键相同时调用，类型和长度已经相同
+        :param token_list: 片段
+        :return: True/False
+        """
+        return all(token.peek_data() == memo_token.peek_data() for token, memo_token in zip(token_list, self.token_list))
+
+    def apply(self, token_list: List[Token]) -> List[Token]:
+        """
+        在内容相同的片段上重放解析结果
+        :param token_list: 片段
+        :return: 解析结果
+        """
+        for token, type_id in zip(token_list, self.type_list):
+            token.type_id = type_id
+        value_stack = []
+        for index, count, info in self.step_list:
+            if index >= 0:
+                token = token_list[index]
+            else:
+                token = Token()
+                token.type_id, token.start, token.data, token.end, token.line_start, token.line_end = info
+            if count:
+                for child in value_stack[len(value_stack) - count:]:
+                    token.add_tree(child)
+                del value_stack[len(value_stack) - count:]
+                token.line_start = token.token_tree[0].line_start
+                token.line_end = token.token_tree[-1].line_end
+            value_stack.append(token)
+        return value_stack
+
+
+class SyntaxSnapshot:
+    """ 增量语法解析的快照，原始token按分隔token切分为片段，每个片段单独解析，编辑后只重新解析受影响的片段 """
+
+    def __init__(self, split_factor: LexicalFactor):
+        """
+        构建空的快照
+        :param split_factor: 分隔token的词法
+        """
+        self.split_factor = split_factor
+        """ 分隔token的词法，片段以满足该词法的token结尾 """
+        self.token_list: List[Token] = []
+        """ 原始token列表 """
+        self.type_list = array("q")
+        """ 原始token解析前的类型编号，解析会修改token类型，重新解析前需要还原 """
+        self.tree_size = array("q")
+        """ 原始token解析前的子节点数量 """
+        self.split_flag = bytearray()
+        """ 原始token解析前是否为分隔token """
+        self.segment_end = array("q")
+        """ 每个片段在原始token列表中的结束下标，不包含 """
+        self.segment_open = bytearray()
+        """ 片段的匹配是否读取到结尾，只有最后一个片段可能为真 """
+        self.segment_tree: List[List[Token]] = []
+        """ 每个片段的解析结果 """
+        self.tree: List[Token] = []
+        """ 语法树，各片段解析结果按顺序拼接 """
+
+    def token_state(self, token_list: List[Token]) -> Tuple[array, array, bytearray]:
+        """
+        记录token解析前的状态
+        :param token_list: token列表
+        :return: 类型编号，子节点数量，是否为分隔token
+        """
+        type_list = array("q", [token.type_id for token in token_list])
+        tree_size = array("q", [len(token.token_tree) if token.has_tree() else 0 for token in token_list])
+        split_flag = bytearray(SyntaxMatch.token_same(self.split_factor, token) for token in token_list)
+        return type_list, tree_size, split_flag
+
+    def split_segment(self, start_index, end_index):
+        """
+        切分片段，每个片段到分隔token为止，最后一个片段可以没有分隔token
+        :param start_index: 起始下标
+        :param end_index: 结束下标，不包含
+        :return: 依次产出每个片段的结束下标
+        """
+        index = self.split_flag.find(1, start_index, end_index)
+        while index >= 0:
+            yield index + 1
+            start_index = index + 1
+            index = self.split_flag.find(1, start_index, end_index)
+        if start_index < end_index:
+            yield end_index
+
+    def restore(self, start_index, end_index):
+        """
+        还原原始token解析前的类型和子节点
+        :param start_index: 起始下标
+        :param end_index: 结束下标，不包含
+        """
+        for index in range(start_index, end_index):
+            token = self.token_list[index]
+            token.type_id = self.type_list[index]
+            if token.has_tree():
+                del token.token_tree[self.tree_size[index]:]
+
+
 class SyntaxParser:
 
-    def __init__(self):
+    def __init__(self, use_memo=False):
+        """
+        语法解析器
+        :param use_memo: 使用记忆表，内容相同的递归片段只解析一次，要求处理方法只依赖token的类型和内容。
+            记忆表的键只使用类型、开始结束和内容长度，键相同时才比较内容，延迟生成的token不会因此生成内容
+        """
         self.flow: Flow[SyntaxParserConfig] = Flow()
         self.keyword_list = []
+        self.use_memo = use_memo
+        """ 使用记忆表 """
+        self.memo: Dict[tuple, List[SyntaxMemo]] | None = None
+        """ 本次解析的记忆表，键为片段中token的类型、开始结束和内容长度，键相同的片段再按内容区分 """
+        self.is_compiled = False
+        """ 是否使用编译后的阶段列表 """
+        self.stage_list: List[Callable[[List[Token], bool], Generator]] | None = None
+        """ 编译后的阶段任务列表，添加语法或流时失效 """
+        self.task_depth = 0
+        """ 当前执行的任务层数，1为顶层 """
+        self.open_end: bool | None = None
+        """ 顶层是否有匹配读取到列表结尾仍未结束，此时解析结果依赖之后的token，为None时不记录 """
+        self.profile: ParserProfile | None = None
+        """ 性能统计，为None时不记录 """
+        self.local_flow = True
+        """ 全部处理方法只依赖传入片段内的token，为False时增量解析不切分片段，整体重新解析 """
+
+    def __getstate__(self):
+        """ 序列化时不保存性能统计 """
+        state = self.__dict__.copy()
+        state["profile"] = None
+        return state
+
+    def set_profile(self, profile: ParserProfile | None, name="syntax"):
+        """
+        设置性能统计，语法按流的优先级分组
+        :param profile: 性能统计，为None时关闭
+        :param name: 统计中的解析器名称
+        :return: 自身
+        """
+        self.profile = profile
+        if profile is not None:
+            profile.add_parser(self, name)
+        return self
 
     def add_syntax(self, index, syntax_factor: SyntaxFactor, need_recursion=False, prefix_outside=False, suffix_outside=False, prefix_match=False, suffix_match=False, next_paser=None):
         """
@@ -262,6 +579,7 @@ class SyntaxParser:
         :param next_paser:下一层解析器
         """
 
+        self.stage_list = None
         if index in self.flow.flow:
             self.flow.flow[index][0].flow_data.add_syntax(syntax_factor)
         else:
@@ -269,14 +587,45 @@ class SyntaxParser:
             syntax.add_syntax(syntax_factor)
             self.flow.add_flow(index, "syntax", syntax, SyntaxParserConfig(need_recursion, prefix_outside, suffix_outside, prefix_match, suffix_match, next_paser))
 
-    def add_flow(self, index, method):
+    def add_flow(self, index, method, is_local=True):
         """
         添加流
         :param index:流索引
         :param method: 处理方法
+        :param is_local: 处理方法只依赖传入片段内的token，为False时增量解析不再切分片段，每次整体重新解析
         """
+        self.stage_list = None
+        if not is_local:
+            self.local_flow = False
         self.flow.add_flow(index, "flow", method, None)
 
+    def compile(self):
+        """
+        将流编译为按顺序执行的阶段列表，解析时不再遍历流
+        :return: 自身
+        """
+        self.is_compiled = True
+        self.stage_list = []
+        for flow in self.flow:
+            match flow.type:
+                case "syntax":
+                    self.stage_list.append(partial(self._to_token_task, flow))
+                case "flow":
+                    self.stage_list.append(partial(self._call_flow, flow.flow_data))
+        return self
+
+    @staticmethod
+    def _call_flow(method, while_list, is_debug=False):
+        """
+        执行处理方法阶段，与语法阶段一样以任务形式执行
+        :param method: 处理方法
+        :param while_list: token列表
+        :param is_debug: debug选项
+        :return: token列表
+        """
+        yield from ()
+        return method(while_list)
+
     @staticmethod
     def mark_type(token_list: List[Token], old_type: List[str] | str, new_type: str, old_data: List[str] = None, not_case_data: List[str] | None = None):
         """
@@ -295,15 +644,17 @@ class SyntaxParser:
             not_case_data = new_case
         if isinstance(old_data, str):
             old_data = [old_data]
+        old_type = TokenType.get_ids(old_type)
+        new_type = TokenType.get_id(new_type)
         for token_data in token_list:
-            if token_data.type in old_type:
+            if token_data.type_id in old_type:
                 if old_data or not_case_data:
                     if old_data and token_data.data in old_data:
-                        token_data.type = new_type
+                        token_data.type_id = new_type
                     elif not_case_data and token_data.data.lower() in not_case_data:
-                        token_data.type = new_type
+                        token_data.type_id = new_type
                 else:
-                    token_data.type = new_type
+                    token_data.type_id = new_type
         return token_list
 
     def mark_keyword(self, token_list: List[Token], ignore_case=False, replace_type="any"):
@@ -321,11 +672,14 @@ class SyntaxParser:
         else:
             keyword.update(self.keyword_list)
 
+        replace_type = TokenType.get_id(replace_type)
         for token_data in token_list:
+            if token_data.type_id != replace_type:
+                continue
             now_data = token_data.data
             if ignore_case:
                 now_data = now_data.lower()
-            if token_data.type == replace_type and now_data in keyword:
+            if now_data in keyword:
                 token_data.type = "key:" + now_data
         return token_list
 
@@ -346,16 +700,51 @@ class SyntaxParser:
         :param token_list: token列表
         :return: 因子匹配式子
         """
+        return SyntaxParser.match_factor(factor, index, token_list)[0]
+
+    @staticmethod
+    def match_factor(factor: SyntaxList, index, token_list: List[Token], start_list: List[SyntaxMatch] | None = None, match_pool: List[SyntaxMatch] | None = None,
+                     rule_stat: Dict[SyntaxFactor, RuleStat] | None = None, shared_stat: RuleStat | None = None) -> Tuple[List[SyntaxMatch], bool]:
+        """
+        选取因子，同时判断是否有因子读取到列表结尾仍未结束
+        :param factor: 因子列表
+        :param index: 当前下标
+        :param token_list: token列表
+        :param start_list: 已经选取的起始因子，为None时根据首个token选取
+        :param match_pool: 复用的匹配对象，返回的匹配对象在下一次使用同一组对象选取时失效，为None时返回新建的匹配对象
+        :param rule_stat: 语法到统计的映射，为None时不记录，记录每个候选语法的尝试次数和逐个token判断的耗时
+        :param shared_stat: 候选选取和排序等全部语法共用部分的统计
+        :return: 因子匹配式子，是否读取到结尾
+        """
+        if rule_stat is not None:
+            shared_stat.tried += 1
+            start = time.perf_counter()
+            rule_use = 0.0
         # 符合的因子
         satisfy_factor = []
-        # 判断起始因子队列
-        judge_start_list = factor.to_match()
+        # 判断起始因子队列，只取首个token可能满足的因子
+        if start_list is not None:
+            judge_start_list = start_list
+        elif index < len(token_list):
+            judge_start_list = factor.candidate(token_list[index], match_pool)
+        else:
+            judge_start_list = factor.to_match()
+        if rule_stat is not None:
+            for factor_match in judge_start_list:
+                rule_stat[factor_match.syntax_factor].tried += 1
         # 下一次待判断因子
         next_start_list = []
         while index < len(token_list):
             now_token = token_list[index]
             for factor_match in judge_start_list:
-                similar, equal = factor_match.prefix(now_token)
+                if rule_stat is None:
+                    similar, equal = factor_match.prefix(now_token)
+                else:
+                    rule_start = time.perf_counter()
+                    similar, equal = factor_match.prefix(now_token)
+                    use = time.perf_counter() - rule_start
+                    rule_stat[factor_match.syntax_factor].time += use
+                    rule_use += use
                 if equal:
                     satisfy_factor.append(factor_match)
                 elif similar:
@@ -366,6 +755,8 @@ class SyntaxParser:
             if len(judge_start_list) == 0:
                 break
             index += 1
+        # 读取到结尾仍有因子未结束
+        open_end = len(judge_start_list) > 0
         # 对循环结束，允许匹配到结尾的类型
         if judge_start_list:
             for factor_match in judge_start_list:
@@ -374,7 +765,9 @@ class SyntaxParser:
                     satisfy_factor.append(factor_match)
         # 排序，起始标识进行升序
         satisfy_factor.sort(key=lambda x: x.now_index)
-        return satisfy_factor[::-1]
+        if rule_stat is not None:
+            shared_stat.time += time.perf_counter() - start - rule_use
+        return satisfy_factor[::-1], open_end
 
     @staticmethod
     def father_token(syntax: SyntaxMatch, branch: Token, while_list: List[Token], now_index):
@@ -388,7 +781,7 @@ class SyntaxParser:
         """
         if syntax.syntax_factor.father_index is not None:
             temp_branch = branch.token_tree[syntax.syntax_factor.father_index]
-            if syntax.syntax_factor.merge and temp_branch.type == syntax.syntax_factor.status or syntax.syntax_factor.merge is False:
+            if syntax.syntax_factor.merge and temp_branch.type_id == syntax.syntax_factor.status_id or syntax.syntax_factor.merge is False:
                 # 如果需要合并，且和自身类型相同或者是不需要合并
                 for temp_token in branch.token_tree:
                     if temp_branch != temp_token:
@@ -403,53 +796,81 @@ class SyntaxParser:
             while_list[now_index] = branch
 
     def to_token(self, flow, while_list, is_debug=False):
+        """
+        执行单个语法阶段
+        :param flow: 语法流
+        :param while_list: token列表
+        :param is_debug: debug选项
+        :return: 解析后的token列表
+        """
+        return self._run(self._to_token_task(flow, while_list, is_debug), is_debug)
+
+    def _to_token_task(self, flow, while_list, is_debug=False):
+        """
+        语法阶段的解析任务，需要递归解析时产出片段，由_run解析后送回结果
+        :param flow: 语法流
+        :param while_list: token列表
+        :param is_debug: debug选项
+        :return: 解析后的token列表
+        """
         now_index = 0
         next_list = []
+        match_factor = self.match_factor if self.profile is None else self.profile.syntax_match(self, flow, self.match_factor).match
+        # 匹配对象只在本任务内复用，嵌套解析和其他线程使用各自的对象
+        match_pool = flow.flow_data.match_pool()
         while now_index < len(while_list):
             # 匹配找到的token
-            syntax_factor = self.switch_factor(flow.flow_data, now_index, while_list)
+            syntax_factor, open_end = match_factor(flow.flow_data, now_index, while_list, match_pool=match_pool)
+            if open_end and self.task_depth == 1 and self.open_end is False:
+                self.open_end = True
             # 如果存在构成词法的，则进行添加
             if syntax_factor:
                 syntax = syntax_factor[0]
+                match_length = syntax.now_index
+                end_flag = syntax.end_flag
                 branch = Token()
-                branch.type = syntax.syntax_factor.status
+                branch.type_id = syntax.syntax_factor.status_id
                 if is_debug:
-                    print("当前判别类型", syntax.syntax_factor.status, "找到的结尾", syntax.now_index)
+                    print("当前判别类型", syntax.syntax_factor.status, "找到的结尾", match_length)
                     token_debug(while_list)
                     print()
                 # 需要递归
                 if flow.config.need_recursion:
-                    temp_list = while_list[now_index:now_index + syntax.now_index]
-                    syntax.change_type(temp_list)
+                    # 匹配结果按下标范围修改类型，递归片段在_sub_parser中复制一次交给子任务
+                    span_end = now_index + match_length
+                    first_token = while_list[now_index]
+                    last_token = while_list[span_end - 1]
+                    syntax.change_type(while_list, now_index, match_length)
 
-                    start_index = 1
-                    end_index = -1
+                    start_index = now_index + 1
+                    end_index = span_end - 1
                     if flow.config.prefix_match:
-                        start_index = 0
+                        start_index = now_index
                     else:
                         # 该token是否放置外层
                         if flow.config.prefix_outside:
-                            next_list.append(temp_list[0])
+                            next_list.append(first_token)
                         else:
-                            branch.add_tree(temp_list[0])
+                            branch.add_tree(first_token)
                     if flow.config.suffix_match:
-                        end_index = None
+                        end_index = span_end
                     if is_debug:
-                        print("递归解析", start_index, end_index, len(temp_list))
-                        token_debug(temp_list[start_index:end_index])
+                        print("递归解析", start_index - now_index, end_index - span_end, match_length)
+                        token_debug(while_list[start_index:end_index])
                         print()
 
-                    for token in self.parser(temp_list[start_index:end_index], is_debug):
+                    # 递归片段交给调用方入栈解析，不占用调用栈
+                    for token in (yield from self._sub_parser(while_list, start_index, end_index)):
                         branch.add_tree(token)
                     if is_debug:
-                        print("回退", syntax.now_index)
-                    now_index = now_index + syntax.now_index - 1
-                    if flow.config.suffix_outside and not flow.config.suffix_match and not syntax.end_flag:
+                        print("回退", match_length)
+                    now_index = now_index + match_length - 1
+                    if flow.config.suffix_outside and not flow.config.suffix_match and not end_flag:
                         # 如果有放置在外层，且不要后续匹配，且不需要结尾匹配
                         next_list.append(branch)
                     else:
                         if not flow.config.suffix_match:
-                            branch.add_tree(temp_list[-1])
+                            branch.add_tree(last_token)
                         # 改变token树
                         self.father_token(syntax, branch, while_list, now_index)
                     if is_debug:
@@ -457,18 +878,18 @@ class SyntaxParser:
                         token_debug(branch)
                         print()
                 else:
-                    for token in while_list[now_index:now_index + syntax.now_index]:
+                    for token in while_list[now_index:now_index + match_length]:
                         branch.add_tree(token)
                     if is_debug:
                         print("以常规方式判别到的", syntax.syntax_factor.status)
                         token_debug(branch)
                         print()
-                    now_index = now_index + syntax.now_index - 1
+                    now_index = now_index + match_length - 1
                     # 改变token树
                     self.father_token(syntax, branch, while_list, now_index)
                     syntax.change_type(branch.token_tree)
                 if syntax.syntax_factor.extend_type is not None:
-                    branch.type = branch.token_tree[syntax.syntax_factor.extend_type].type
+                    branch.type_id = branch.token_tree[syntax.syntax_factor.extend_type].type_id
                 # 更新当前分支的所在行信息
                 branch.line_start = branch.token_tree[0].line_start
                 branch.line_end = branch.token_tree[-1].line_end
@@ -477,6 +898,51 @@ class SyntaxParser:
                 now_index += 1
         return next_list
 
+    def _sub_parser(self, token_list: List[Token], start_index, end_index):
+        """
+        递归解析列表中的片段，产出待解析的片段并接收结果，开启记忆表时内容相同的片段直接重放。
+        子任务会替换列表中的元素，片段需要复制为新列表，解析过程中token_list保持不变
+        :param token_list: token列表
+        :param start_index: 片段起始下标
+        :param end_index: 片段结束下标
+        :return: 解析结果
+        """
+        span = token_list[start_index:end_index]
+        if self.memo is None:
+            return (yield span)
+        key = tuple((token.type_id, token.start, token.end, token.data_length()) for token in span)
+        memo_list = self.memo.get(key)
+        if memo_list is not None:
+            for memo in memo_list:
+                if memo.same_data(span):
+                    return memo.apply(span)
+        tree_size = [len(token.token_tree) if token.has_tree() else 0 for token in span]
+        result = yield span
+        # 子任务替换了span中的元素，模板使用原列表中解析前的token
+        self.memo.setdefault(key, []).append(SyntaxMemo(token_list[start_index:end_index], tree_size, result))
+        return result
+
+    def _run(self, task, is_debug=False):
+        """
+        以显式栈执行解析任务，任务产出的片段作为新任务入栈，嵌套层数不受递归深度限制
+        :param task: 解析任务
+        :param is_debug: debug选项
+        :return: 解析结果
+        """
+        task_stack = [task]
+        value = None
+        while task_stack:
+            self.task_depth = len(task_stack)
+            try:
+                span = task_stack[-1].send(value)
+            except StopIteration as stop:
+                task_stack.pop()
+                value = stop.value
+                continue
+            task_stack.append(self._parser_task(span, is_debug))
+            value = None
+        return value
+
     def parser(self, token_list: List[Token], is_debug=False):
         """
         解析生成语法树
@@ -484,13 +950,174 @@ class SyntaxParser:
         :param is_debug: debug选项
         :return:
         """
-        while_list = [*token_list]
-        for flow in self.flow:
-            match flow.type:
-                case "syntax":
-                    while_list = self.to_token(flow, while_list, is_debug)
-                case "flow":
-                    while_list = flow.flow_data(while_list)
+        with self._memo_session():
+            return self._run(self._parser_task([*token_list], is_debug), is_debug)
+
+    @contextmanager
+    def _memo_session(self):
+        """ 记忆表只在本次解析中有效，已经开启时沿用 """
+        if not self.use_memo or self.memo is not None:
+            yield
+            return
+        self.memo = {}
+        try:
+            yield
+        finally:
+            self.memo = None
+
+    def syntax_snapshot(self, token_list: List[Token], split_factor: LexicalFactor, is_debug=False) -> SyntaxSnapshot:
+        """
+        按分隔token把token列表切分为片段分别解析，并保存增量解析需要的快照，拼接后的语法树与整体解析相同。
+        存在依赖片段外token的处理方法时整体作为一个片段解析
+        :param token_list: token列表
+        :param split_factor: 分隔token的词法，片段以满足该词法的token结尾
+        :param is_debug: debug选项
+        :return: 快照
+        """
+        snapshot = SyntaxSnapshot(split_factor)
+        snapshot.token_list = [*token_list]
+        snapshot.type_list, snapshot.tree_size, snapshot.split_flag = snapshot.token_state(token_list)
+        self._parser_segment(snapshot, 0, is_debug=is_debug)
+        snapshot.tree = [token for tree in snapshot.segment_tree for token in tree]
+        return snapshot
+
+    def update_syntax(self, snapshot: SyntaxSnapshot, start_index, end_index, insert_list: List[Token], is_debug=False) -> SyntaxSnapshot:
+        """
+        根据token范围的替换增量解析，只重新解析受影响的片段，其余片段的语法树原样复用。
+        替换范围可以直接使用TokenSnapshot.change_range，旧快照的token会被复用并修改，更新后不应再使用旧快照。
+        片段单独解析的结果与整体解析相同的前提是处理方法只依赖传入片段内的token，依赖片段外token的处理方法需要以is_local=False添加，
+        此时不复用任何片段，整体重新解析
+        :param snapshot: 旧快照
+        :param start_index: 替换的起始下标
+        :param end_index: 替换的结束下标，不包含
+        :param insert_list: 插入的token
+        :param is_debug: debug选项
+        :return: 新快照
+        """
+        if start_index < 0 or end_index < start_index or end_index > len(snapshot.token_list):
+            raise IndexError(f'替换范围越界：{start_index}，{end_index}')
+        delta = len(insert_list) - (end_index - start_index)
+        new_snapshot = SyntaxSnapshot(snapshot.split_factor)
+        new_snapshot.token_list = snapshot.token_list[:start_index] + insert_list + snapshot.token_list[end_index:]
+        type_list, tree_size, split_flag = snapshot.token_state(insert_list)
+        new_snapshot.type_list = snapshot.type_list[:start_index] + type_list + snapshot.type_list[end_index:]
+        new_snapshot.tree_size = snapshot.tree_size[:start_index] + tree_size + snapshot.tree_size[end_index:]
+        new_snapshot.split_flag = snapshot.split_flag[:start_index] + split_flag + snapshot.split_flag[end_index:]
+        # 替换位置所在的片段，前一个片段依赖之后的token时一起重新解析
+        first = bisect_right(snapshot.segment_end, start_index) if self.local_flow else 0
+        if first > 0 and snapshot.segment_open[first - 1]:
+            first -= 1
+        segment_start = snapshot.segment_end[first - 1] if first else 0
+        new_snapshot.segment_end = snapshot.segment_end[:first]
+        new_snapshot.segment_open = snapshot.segment_open[:first]
+        new_snapshot.segment_tree = snapshot.segment_tree[:first]
+        sync = self._parser_segment(new_snapshot, segment_start, snapshot, delta, start_index + len(insert_list), is_debug)
+        if sync >= 0:
+            reuse_tree = snapshot.segment_tree[sync + 1:]
+            self._shift_line(reuse_tree)
+            new_snapshot.segment_end.extend(map(delta.__add__, snapshot.segment_end[sync + 1:]))
+            new_snapshot.segment_open.extend(snapshot.segment_open[sync + 1:])
+            new_snapshot.segment_tree.extend(reuse_tree)
+        new_snapshot.tree = [token for tree in new_snapshot.segment_tree for token in tree]
+        return new_snapshot
+
+    def _parser_segment(self, snapshot: SyntaxSnapshot, segment_start, sync_snapshot: SyntaxSnapshot | None = None, sync_delta=0, sync_index=0, is_debug=False):
+        """
+        从片段起点开始切分并解析，片段的匹配读取到结尾时结果依赖之后的token，与之后的片段合并重新解析，合并的片段数量每次翻倍。
+        合并后的片段结尾与旧快照的片段结尾重合时停止
+        :param snapshot: 写入的快照
+        :param segment_start: 片段起点
+        :param sync_snapshot: 旧快照，为None时解析到结尾
+        :param sync_delta: 新旧token列表的下标差
+        :param sync_index: 新token列表中允许同步的最小下标
+        :param is_debug: debug选项
+        :return: 同步的旧片段下标，没有同步时为-1
+        """
+        token_list = snapshot.token_list
+        merge_count = 1
+        now_count = 0
+        with self._memo_session():
+            # 处理方法依赖片段外的token时不切分
+            split_list = snapshot.split_segment(segment_start, len(token_list)) if self.local_flow else [len(token_list)][segment_start >= len(token_list):]
+            for segment_end in split_list:
+                now_count += 1
+                if now_count < merge_count and segment_end < len(token_list):
+                    continue
+                # 合并解析失败时token已被修改，每次解析前还原
+                snapshot.restore(segment_start, segment_end)
+                self.open_end = False
+                try:
+                    tree = self._run(self._parser_task(token_list[segment_start:segment_end], is_debug), is_debug)
+                    open_end = self.open_end
+                finally:
+                    self.open_end = None
+                if open_end and segment_end < len(token_list):
+                    merge_count *= 2
+                    continue
+                snapshot.segment_end.append(segment_end)
+                snapshot.segment_open.append(open_end)
+                snapshot.segment_tree.append(tree)
+                segment_start = segment_end
+                merge_count = 1
+                now_count = 0
+                # 之后的token与旧快照相同，片段同样不受影响
+                if sync_snapshot is not None and segment_end >= sync_index:
+                    old_index = bisect_left(sync_snapshot.segment_end, segment_end - sync_delta)
+                    if old_index < len(sync_snapshot.segment_end) and sync_snapshot.segment_end[old_index] == segment_end - sync_delta:
+                        return old_index
+        return -1
+
+    @staticmethod
+    def _shift_line(segment_tree: List[List[Token]]):
+        """
+        复用的语法树按原始token修正行信息，原始token已经由词法增量解析平移，只修正解析时新建的父级token
+        :param segment_tree: 复用的片段语法树
+        """
+        line_delta = 0
+        for tree in segment_tree:
+            branch = next((token for token in tree if token.end_index is None and token.has_tree()), None)
+            if branch is None:
+                continue
+            leaf = branch
+            while leaf.end_index is None and leaf.has_tree():
+                leaf = leaf.token_tree[0]
+            if leaf.line_start is not None and branch.line_start is not None:
+                line_delta = leaf.line_start - branch.line_start
+            break
+        if line_delta == 0:
+            return
+        # 同一个节点可能在树中出现多次，只修正一次
+        visited = set()
+        stack = [token for tree in segment_tree for token in tree if token.has_tree()]
+        while stack:
+            token = stack.pop()
+            if id(token) in visited:
+                continue
+            visited.add(id(token))
+            if token.end_index is None and token.line_start is not None:
+                token.line_start += line_delta
+                token.line_end += line_delta
+            stack.extend([child for child in token.token_tree if child.has_tree()])
+
+    def _parser_task(self, while_list: List[Token], is_debug=False):
+        """
+        按流顺序解析的任务，会修改传入的列表
+        :param while_list: token列表
+        :param is_debug: debug选项
+        :return: 语法树
+        """
+        if self.is_compiled:
+            if self.stage_list is None:
+                self.compile()
+            for stage in self.stage_list:
+                while_list = yield from stage(while_list, is_debug)
+        else:
+            for flow in self.flow:
+                match flow.type:
+                    case "syntax":
+                        while_list = yield from self._to_token_task(flow, while_list, is_debug)
+                    case "flow":
+                        while_list = flow.flow_data(while_list)
         if is_debug:
             print("解析结束返回")
             token_debug(while_list)
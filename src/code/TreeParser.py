@@ -2,7 +2,7 @@ from abc import abstractmethod
 from typing import Dict, List
 
 from src.code.CodeParser import Token
-from src.code.FormatCode import IterationStack
+from src.code.FormatCode import TreeWalk
 
 
 class AssignmentSyntaxTree:
@@ -43,28 +43,16 @@ class SyntaxTreeParser:
         """ 待判断队列 """
 
     def recursion(self):
-        iteration_stack = IterationStack()
-
-        def judge_method(iteration: IterationStack, token: Token):
+        def enter(token: Token):
+            # 构建过程中新加入的待判断项作为子项展开
             if self.need_judge:
-                iteration.push(self.need_judge)
-                self.need_judge.clear()
-
-        def before_method(iteration: IterationStack, token: Token):
-            pass
-
-        def after_method(iteration: IterationStack, token: Token):
-            pass
+                next_judge, self.need_judge = self.need_judge, []
+                return next_judge
+            return None
 
-        iteration_stack.is_list_copy = True
         # 初始化迭代数据
-        iteration_stack.push(self.need_judge)
-        self.need_judge.clear()
-        # 封装方法
-        iteration_stack.add_judge(judge_method)
-        iteration_stack.add_before(before_method)
-        iteration_stack.add_after(after_method)
-        iteration_stack.iteration()
+        judge_list, self.need_judge = self.need_judge, []
+        TreeWalk.walk(judge_list, enter)
         # 清除上下文
         self.context.clear()
 
@@ -0,0 +1,411 @@
+import random
+from functools import partial
+
+from src.code.CodeParser import CodeParser, MatchRule, Token
+from src.code.FormatCode import FormatCode
+from src.code.TokenParser import LexicalFactor, SyntaxFactor, SyntaxParser, WordRule
+from src.util.chiyaUtil import KeyWord
+
+
+SOURCE_CHAR = ["a", "b", "Se", "LECT", "select", " ", "\n", "\t", "'", '"', "\\", "(", ")", "{", "}", "<", "=", ">", "<=", "<>",
+               "-", "--", "/", "*", "/*", "*/", "$", ",", ";", "中", "1"]
+""" 随机源码的组成片段，覆盖因子的开头、结尾、转义和多字节字符 """
+
+
+def build_lexer(use_scan=True) -> CodeParser:
+    """
+    构建覆盖各类因子的词法解析器：单字符、多字符前缀重叠、忽略大小写、转义、计数、下一层解析和下一层全部重新解析
+    :param use_scan: 使用扫描索引
+    :return: 词法解析器
+    """
+    inner = CodeParser(use_scan)
+    inner.add_token("dollar", "$")
+    inner.add_token("brace", "{", "}")
+    whole = CodeParser(use_scan)
+    whole.add_token("quote", "'")
+    whole.add_token("word", "ab")
+    code_parser = CodeParser(use_scan)
+    code_parser.add_token("space", " ", "\t")
+    code_parser.add_token("line", "\n")
+    code_parser.add_token("symbol", ",", ";", "=", "<", ">", "<=", ">=", "<>", "-", "/", "*")
+    code_parser.add_token("bracket", "(", ")")
+    code_parser.add_token("keyword", MatchRule("select", ignore_case=True))
+    code_parser.add_combination("string", '"', '"', next_parser=inner, need_escape=True)
+    code_parser.add_combination("single", "'", "'", next_parser=whole, need_escape=True, next_all_match=True)
+    code_parser.add_combination("note", "--", "\n")
+    code_parser.add_combination("note", "/*", "*/")
+    return code_parser
+
+
+def build_count_lexer(use_scan=True) -> CodeParser:
+    """
+    构建带计数组合因子的词法解析器，字节模式不支持计数
+    :param use_scan: 使用扫描索引
+    :return: 词法解析器
+    """
+    code_parser = build_lexer(use_scan)
+    code_parser.add_combination("block", "{", "}", count_start="{", count_end="}")
+    return code_parser
+
+
+def random_source(rand: random.Random, max_count=24, char_list=None) -> str:
+    """
+    随机拼接源码片段
+    :param rand: 随机数生成器
+    :param max_count: 最多拼接的片段数量
+    :param char_list: 片段，默认为SOURCE_CHAR
+    :return: 源码
+    """
+    char_list = char_list or SOURCE_CHAR
+    return "".join(rand.choice(char_list) for _ in range(rand.randint(0, max_count)))
+
+
+def token_key(token_list, position=True) -> list:
+    """
+    token树转为可比较的结构，显式栈遍历，深层的树不会超出递归限制
+    :param token_list: token列表
+    :param position: 包含位置和行列
+    :return: 先序排列的token信息，每项带有子节点数量
+    """
+    result = []
+    stack = [iter(token_list)]
+    while stack:
+        for token in stack[-1]:
+            item = (token.type, token.start, token.data, token.end, len(token.token_tree) if token.has_tree() else 0)
+            if position:
+                item += (token.end_index, token.line_start, token.line_end, token.column)
+            result.append(item)
+            if token.has_tree():
+                stack.append(iter(token.token_tree))
+                break
+        else:
+            stack.pop()
+    return result
+
+
+def build_sql_parser() -> CodeParser:
+    """
+    构建测试使用的SQL词法解析器
+    :return: 词法解析器
+    """
+    code_parser = CodeParser()
+    code_parser.add_token("space", " ", "\t")
+    code_parser.add_token("line", "\n")
+    code_parser.add_token("symbol", ",", ";", ".", "=", "<", ">", "<=", ">=", "<>", "!=", "+", "-", "*", "/")
+    code_parser.add_token("bracket", "(", ")")
+    code_parser.add_combination("string", "'", "'", need_escape=True)
+    code_parser.add_combination("string", '"', '"', need_escape=True)
+    code_parser.add_combination("quote", "`", "`")
+    code_parser.add_combination("note", "--", "\n")
+    code_parser.add_combination("note", "/*", "*/")
+    return code_parser
+
+
+def sql_source(size, seed=0) -> str:
+    """
+    生成指定字符数量的SQL源码
+    :param size: 字符数量
+    :param seed: 随机种子
+    :return: 源码
+    """
+    rand = random.Random(seed)
+    statement = [
+        "select `id`, name, age from user_info where id = {0} and name <> 'it\\'s {0}';\n",
+        "insert into user_info (id, name, age) values ({0}, \"name_{0}\", {1});\n",
+        "-- 注释 {0}\nupdate user_info set age = age + {1} where id >= {0};\n",
+        "/* 多行注释\n * {0}\n */\ndelete from user_info where (id = {0} or age < {1});\n",
+    ]
+    result = []
+    length = 0
+    while length < size:
+        line = rand.choice(statement).format(rand.randint(0, 100000), rand.randint(0, 100))
+        result.append(line)
+        length += len(line)
+    return "".join(result)[0:size]
+
+
+SQL_KEYWORD = ["select", "from", "where", "and", "or", "as", "insert", "into", "values", "update", "set", "delete",
+               "in", "not", "null", "is", "like", "between", "join", "on", "group", "order", "by", "limit"]
+""" 测试使用的SQL关键字 """
+
+
+def build_sql_syntax() -> SyntaxParser:
+    """
+    构建测试使用的SQL语法解析器，括号和语句递归解析
+    :return: 语法解析器
+    """
+    syntax_parser = SyntaxParser()
+    syntax_parser.register_keyword(*SQL_KEYWORD)
+    syntax_parser.add_flow(0, partial(syntax_parser.mark_keyword, ignore_case=True))
+    bracket = SyntaxFactor("bracket_group", need_match=True, need_paired=True)
+    bracket.add_lexical(LexicalFactor(WordRule(start="("), "bracket"), LexicalFactor(WordRule(start=")"), "bracket"))
+    syntax_parser.add_syntax(1, bracket, need_recursion=True)
+    column = SyntaxFactor("column_ref")
+    column.add_lexical(LexicalFactor(None, "any"), LexicalFactor(WordRule(start="."), "symbol"), LexicalFactor(None, "any"))
+    column.add_type({0: "table", 2: "column"})
+    syntax_parser.add_syntax(2, column)
+    for symbol in ["=", "<", ">", "<=", ">=", "<>", "!=", "+", "-", "*", "/"]:
+        compare = SyntaxFactor("expression")
+        compare.add_lexical(LexicalFactor(None, "any", "string", "column_ref"), LexicalFactor(WordRule(start=symbol), "symbol"), LexicalFactor(None, "any", "string", "column_ref"))
+        syntax_parser.add_syntax(2, compare)
+    for keyword in SQL_KEYWORD:
+        clause = SyntaxFactor(f'{keyword}_clause')
+        clause.add_lexical(LexicalFactor(None, f'key:{keyword}'), LexicalFactor(None, "any", "quote", "expression"))
+        syntax_parser.add_syntax(3, clause)
+    statement = SyntaxFactor("statement", need_match=True)
+    statement.add_lexical(LexicalFactor(None, "select_clause", "insert_clause", "update_clause", "delete_clause"), LexicalFactor(WordRule(start=";"), "symbol", allow_end=True))
+    syntax_parser.add_syntax(4, statement, need_recursion=True)
+    return syntax_parser
+
+
+def build_sql_format() -> FormatCode:
+    """
+    构建测试使用的SQL格式化器
+    :return: 格式化器
+    """
+    format_code = FormatCode()
+    format_code.add_rule("statement", line_after_use=1)
+    for keyword in ["from", "where", "set", "values", "order", "group"]:
+        format_code.add_rule(f'{keyword}_clause', line_before_use=1)
+    format_code.add_rule("symbol", left_space=False, content=",")
+    format_code.add_rule("symbol", left_space=False, right_space=False, content=".")
+    format_code.add_rule("bracket", right_space=False, content="(")
+    format_code.add_rule("bracket", left_space=False, content=")")
+    format_code.add_rule("bracket_group", child_space=True)
+    format_code.add_rule("note", line_after_use=1, line_before_use=1)
+    return format_code
+
+
+def literal_source(size, seed=0) -> str:
+    """
+    生成字符串和注释很长的SQL源码
+    :param size: 字符数量
+    :param seed: 随机种子
+    :return: 源码
+    """
+    rand = random.Random(seed)
+    word = ["日志", "message", "detail", "错误", "trace", "status", "返回", "value"]
+    result = []
+    length = 0
+    while length < size:
+        text = " ".join(rand.choice(word) for _ in range(rand.randint(50, 200)))
+        line = rand.choice([
+            f"insert into log_info (id, message) values ({rand.randint(0, 100000)}, 'it\\'s {text}');\n",
+            f"/* {text}\n * {text}\n */\n",
+            f"-- {text}\n",
+        ])
+        result.append(line)
+        length += len(line)
+    return "".join(result)[0:size]
+
+
+def nested_source(depth, count=1) -> str:
+    """
+    生成多层嵌套括号的源码
+    :param depth: 嵌套层数
+    :param count: 重复次数
+    :return: 源码
+    """
+    statement = "select " + "(" * depth + "a + 1" + ")" * depth + " from t;\n"
+    return statement * count
+
+
+def subquery_source(depth, count=1) -> str:
+    """
+    生成多层嵌套子查询的源码，语句之间内容相同
+    :param depth: 嵌套层数
+    :param count: 重复次数
+    :return: 源码
+    """
+    statement = "select id from t0 where a.id = 1"
+    for index in range(1, depth + 1):
+        statement = f'select id, name from t{index} where id in ({statement}) and age > {index}'
+    return (statement + ";\n") * count
+
+
+def build_java_parser() -> CodeParser:
+    """
+    构建测试使用的Java词法解析器
+    :return: 词法解析器
+    """
+    code_parser = CodeParser()
+    code_parser.add_token("space", " ", "\t")
+    code_parser.add_token("line", "\n")
+    code_parser.add_token("symbol", ";", ",", ".", "=", "+", "-", "*", "/", "<", ">", "==", "!=", "<=", ">=", "&&", "||", "!", "++", "--", "+=", "-=", "?", ":")
+    code_parser.add_token("bracket", "(", ")", "{", "}", "[", "]")
+    code_parser.add_combination("string", '"', '"', need_escape=True)
+    code_parser.add_combination("char", "'", "'", need_escape=True)
+    code_parser.add_combination("note", "//", "\n")
+    code_parser.add_combination("note", "/*", "*/")
+    return code_parser
+
+
+def build_java_syntax() -> SyntaxParser:
+    """
+    构建测试使用的Java语法解析器，代码块和括号递归解析，语句以分号结尾
+    :return: 语法解析器
+    """
+    syntax_parser = SyntaxParser()
+    syntax_parser.register_keyword(*KeyWord.JAVA_KEYWORD)
+    syntax_parser.add_flow(0, syntax_parser.mark_keyword)
+    block = SyntaxFactor("block", need_match=True, need_paired=True)
+    block.add_lexical(LexicalFactor(WordRule(start="{"), "bracket"), LexicalFactor(WordRule(start="}"), "bracket"))
+    syntax_parser.add_syntax(1, block, need_recursion=True)
+    bracket = SyntaxFactor("bracket_group", need_match=True, need_paired=True)
+    bracket.add_lexical(LexicalFactor(WordRule(start="("), "bracket"), LexicalFactor(WordRule(start=")"), "bracket"))
+    syntax_parser.add_syntax(2, bracket, need_recursion=True)
+    statement = SyntaxFactor("statement", need_match=True)
+    statement.add_lexical(LexicalFactor(None), LexicalFactor(WordRule(start=";"), "symbol"))
+    syntax_parser.add_syntax(3, statement)
+    return syntax_parser
+
+
+def java_source(size, seed=0) -> str:
+    """
+    生成成员很多的单个Java类
+    :param size: 字符数量
+    :param seed: 随机种子
+    :return: 源码
+    """
+    rand = random.Random(seed)
+    member = [
+        "    private static final String NAME_{0} = \"name \\\"{0}\\\"\";\n    private int count{0} = {1};\n",
+        "    /**\n     * 计算 {0}\n     */\n    public int compute{0}(int a, int b) {{\n        // 累加\n        if (a > b && count{0} != 0) {{\n"
+        "            for (int i = 0; i < a; i++) {{\n                count{0} += i * b;\n            }}\n        }} else {{\n"
+        "            count{0} = a - b;\n        }}\n        return count{0};\n    }}\n",
+        "    public String name{0}(char c) {{\n        return c == 'x' ? NAME_{0}.trim() : this.name{0}(c);\n    }}\n",
+    ]
+    result = ["package demo;\n\npublic class Demo extends Base implements Runnable {\n"]
+    length = len(result[0]) + 2
+    while length < size:
+        line = rand.choice(member).format(rand.randint(0, 100000), rand.randint(0, 100))
+        result.append(line)
+        length += len(line)
+    result.append("}\n")
+    return "".join(result)
+
+
+def random_tree(rand: random.Random, depth=0) -> list:
+    """
+    生成随机的语法树
+    :param rand: 随机数生成器
+    :param depth: 当前深度
+    :return: token列表
+    """
+    token_list = []
+    for _ in range(rand.randint(0, 4)):
+        token = Token.create(rand.choice(["a", "b"]), None, rand.choice(["x", "y"]), None)
+        if depth < 4 and rand.random() < 0.4:
+            for child in random_tree(rand, depth + 1):
+                token.add_tree(child)
+        token_list.append(token)
+    return token_list
+
+
+def random_edit(rand: random.Random, source_code, char_list=None):
+    """
+    随机生成一次编辑
+    :param rand: 随机数生成器
+    :param source_code: 源码
+    :param char_list: 插入内容的片段
+    :return: 编辑位置，删除的字符数，插入的内容
+    """
+    edit_index = rand.randint(0, len(source_code))
+    remove_length = rand.randint(0, min(len(source_code) - edit_index, 6))
+    return edit_index, remove_length, random_source(rand, 4, char_list)
+
+
+SQL_CHAR = ["select ", "a", "b.c", " from ", "t", " where ", "=", "1", ",", ";", ";\n", "(", ")", "'", "x'", "--", "\n", " ", "/*", "*/",
+            "update ", " set ", "delete "]
+""" 随机SQL的组成片段，覆盖未闭合的括号、字符串和注释 """
+SKIP_TYPE = ["space", "line"]
+""" 语法解析前跳过的类型 """
+SPLIT_FACTOR = LexicalFactor(WordRule(start=";"), "symbol")
+""" 语句之间的分隔token """
+
+
+def format_edit(rand: random.Random, source_code):
+    """
+    随机选取一条语句重新排版，子句换行或者关键字大写
+    :param rand: 随机数生成器
+    :param source_code: 源码
+    :return: 编辑位置，删除的字符数，插入的内容
+    """
+    index = rand.randrange(len(source_code))
+    edit_index = source_code.rfind(";", 0, index) + 1
+    end_index = source_code.find(";", index)
+    end_index = len(source_code) if end_index < 0 else end_index + 1
+    statement = source_code[edit_index:end_index]
+    new_statement = statement.replace(" from ", "\nfrom ").replace(" where ", "\nwhere ")
+    if new_statement == statement:
+        new_statement = statement.replace("select ", "SELECT ").replace("update ", "UPDATE ").replace("delete ", "DELETE ")
+    return edit_index, len(statement), new_statement
+
+
+IDENTIFIER_WORD = ["customer", "account", "balance", "total", "history", "record", "address", "station", "quantity", "version",
+                   "payment", "invoice", "detail", "summary", "internal", "external", "region", "currency", "status", "number"]
+""" 组成标识符的单词，包含大量与关键字相同的片段 """
+
+
+def build_keyword_parser(use_scan) -> CodeParser:
+    """
+    构建关键字也作为词法规则的SQL词法解析器，标识符中的字母都可能是因子的开始
+    :param use_scan: 使用扫描索引
+    :return: 词法解析器
+    """
+    code_parser = build_sql_parser()
+    code_parser.use_scan = use_scan
+    for keyword in SQL_KEYWORD:
+        code_parser.add_token("keyword", MatchRule(keyword, ignore_case=True))
+    return code_parser
+
+
+def identifier_source(size, seed=0) -> str:
+    """
+    生成标识符很长、符号之间间隔很远的源码
+    :param size: 字符数量
+    :param seed: 随机种子
+    :return: 源码
+    """
+    rand = random.Random(seed)
+    result = []
+    length = 0
+    while length < size:
+        name = "_".join(rand.choice(IDENTIFIER_WORD) for _ in range(rand.randint(4, 10)))
+        item = name + rand.choice([", ", ".", " = ", ";\n", "("])
+        result.append(item)
+        length += len(item)
+    return "".join(result)[0:size]
+
+
+def build_java_format() -> FormatCode:
+    """
+    构建测试使用的Java格式化器
+    :return: 格式化器
+    """
+    format_code = FormatCode()
+    format_code.add_rule("statement", line_after_use=1)
+    format_code.add_rule("note", line_after_use=1, line_before_use=1)
+    format_code.add_rule("bracket", line_after_use=1, indent_after_use=1, content="{")
+    format_code.add_rule("bracket", line_before_use=1, line_after_use=1, indent_before_use=-1, content="}")
+    format_code.add_rule("bracket", right_space=False, content="(")
+    format_code.add_rule("bracket", left_space=False, content=")")
+    format_code.add_rule("symbol", left_space=False, content=",")
+    format_code.add_rule("symbol", left_space=False, content=";")
+    format_code.add_rule("symbol", left_space=False, right_space=False, content=".")
+    return format_code
+
+
+def edit_source(source_code, percent, seed=0) -> str:
+    """
+    修改部分行的数字，模拟少量修改后的文件
+    :param source_code: 源码
+    :param percent: 修改的行数占比
+    :param seed: 随机种子
+    :return: 修改后的源码
+    """
+    rand = random.Random(seed)
+    line_list = source_code.split("\n")
+    for index in rand.sample(range(len(line_list)), int(len(line_list) * percent / 100)):
+        line_list[index] = line_list[index].replace("1", "7")
+    return "\n".join(line_list)
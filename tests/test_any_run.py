@@ -0,0 +1,41 @@
+import random
+
+from src.code.CodeParser import CodeParser
+from tests.helper import SOURCE_CHAR, build_count_lexer, random_source, token_key
+
+ANY_CHAR = SOURCE_CHAR + ["abc", "x\ny", "中文", "  \n", "#", "?"]
+""" 随机源码的组成片段，增加不能作为起始的字符 """
+
+
+def parse_all(code_parser: CodeParser, source_code, skip_type):
+    """
+    使用各个解析入口解析
+    :param code_parser: 词法解析器
+    :param source_code: 源码
+    :param skip_type: 跳过的类型
+    :return: 一次解析、流式解析和快照的结果
+    """
+    return (token_key(code_parser.to_token(source_code, skip_type=skip_type, line_count=1)),
+            token_key(code_parser.iter_tokens(source_code, skip_type=skip_type, line_count=1, chunk_size=7)),
+            token_key(code_parser.token_snapshot(source_code, skip_type=skip_type, line_count=1).token_list))
+
+
+def test_any_run_same_as_per_char(monkeypatch):
+    """ 跳过整段不能作为起始的字符与逐个字符尝试匹配的结果相同，包括跳过类型和行列 """
+    rand = random.Random(15)
+    code_parser = build_count_lexer(False).compile()
+    case_list = []
+    for _ in range(400):
+        source_code = random_source(rand, 30, ANY_CHAR)
+        skip_type = rand.choice([None, ["any"], ["space", "line"]])
+        case_list.append((source_code, skip_type, parse_all(code_parser, source_code, skip_type)))
+    call_count = [0]
+
+    def next_start(start_pattern, source_code, index):
+        call_count[0] += 1
+        return index
+
+    monkeypatch.setattr(CodeParser, "_next_start", staticmethod(next_start))
+    for source_code, skip_type, result in case_list:
+        assert parse_all(code_parser, source_code, skip_type) == result
+    assert call_count[0] > 0
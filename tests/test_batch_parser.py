@@ -0,0 +1,55 @@
+from src.code.BatchParser import BatchConfig, BatchParser
+from tests.helper import build_sql_format, build_sql_parser, build_sql_syntax, nested_source, sql_source, token_key
+
+
+def broken_syntax():
+    """ 构建失败的语法解析器工厂方法 """
+    raise ValueError("语法配置错误")
+
+
+def write_files(path, source_list):
+    """
+    写入源码文件
+    :param path: 目录
+    :param source_list: 源码
+    """
+    for index, source_code in enumerate(source_list):
+        (path / f'{index:03d}.sql').write_text(source_code, encoding="utf-8")
+    (path / "bad.sql").write_bytes(b"\xff\xfe select")
+
+
+def run(config: BatchConfig, path, max_workers) -> dict:
+    """
+    批量解析并按路径整理结果
+    :param config: 批量解析配置
+    :param path: 目录
+    :param max_workers: 进程数量
+    :return: 路径到结果的映射
+    """
+    result_map = {}
+    for result in BatchParser(config, max_workers, chunk_size=2).run(str(path), ".sql"):
+        assert result.path not in result_map
+        token_list = token_key(result.token_list) if result.token_list is not None else None
+        result_map[result.path] = (result.error, result.data, result.token_count, token_list)
+    return result_map
+
+
+def test_pool_same_as_serial(tmp_path):
+    """ 进程池与单进程的结果相同，保留的token包含深层嵌套的语法树和位置，解码失败的文件单独记录原因 """
+    write_files(tmp_path, [sql_source(3000, index) for index in range(5)] + [nested_source(400)])
+    config = BatchConfig(build_sql_parser, build_sql_syntax, build_sql_format, skip_type=["space", "line"], keep_token=True)
+    serial = run(config, tmp_path, 1)
+    assert len(serial) == 7
+    assert serial[str(tmp_path / "bad.sql")][0].startswith("UnicodeDecodeError")
+    assert all(item[0] is None and item[3] for path, item in serial.items() if not path.endswith("bad.sql"))
+    assert run(config, tmp_path, 2) == serial
+
+
+def test_factory_error(tmp_path):
+    """ 工厂方法失败时每个文件记录一次原因，进程池不会失效 """
+    write_files(tmp_path, [sql_source(1000, index) for index in range(5)])
+    config = BatchConfig(build_sql_parser, broken_syntax)
+    for max_workers in (1, 2):
+        result_map = run(config, tmp_path, max_workers)
+        assert len(result_map) == 6
+        assert {item[0] for item in result_map.values()} == {"ValueError: 语法配置错误"}
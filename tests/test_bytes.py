@@ -0,0 +1,40 @@
+import mmap
+import random
+
+from tests.helper import SOURCE_CHAR, build_lexer, build_sql_parser, random_source, sql_source, token_key
+
+
+ASCII_CHAR = [item for item in SOURCE_CHAR if item.isascii()] + ["\\\\", "\\n", "\\'", '\\"', "ab", "'ab'", '"{$}"']
+""" 只有单字节字符的随机源码片段，此时字节位置与字符位置相同 """
+
+
+def test_bytes_same_as_str():
+    """ 字节源码与字符串源码的结果相同，覆盖转义后的下一层解析和下一层全部重新解析 """
+    rand = random.Random(16)
+    code_parser = build_lexer()
+    for compiled in (False, True):
+        if compiled:
+            code_parser.compile()
+        for _ in range(1000):
+            source_code = random_source(rand, 20)
+            expect = token_key(code_parser.to_token(source_code), False)
+            assert token_key(code_parser.to_token(source_code.encode()), False) == expect
+            source_code = random_source(rand, 20, ASCII_CHAR)
+            expect = token_key(code_parser.to_token(source_code, line_count=1))
+            assert token_key(code_parser.to_token(source_code.encode(), line_count=1)) == expect
+
+
+def test_byte_buffer_source(tmp_path):
+    """ bytearray、memoryview和mmap与bytes的结果相同 """
+    source_code = sql_source(20000) + "select '中\\'文' from t;\n"
+    code_parser = build_sql_parser().compile()
+    data = source_code.encode()
+    expect = token_key(code_parser.to_token(data))
+    assert token_key(code_parser.to_token(source_code), False) == token_key(code_parser.to_token(data), False)
+    assert token_key(code_parser.to_token(bytearray(data))) == expect
+    assert token_key(code_parser.to_token(memoryview(data))) == expect
+    path = tmp_path / "source.sql"
+    path.write_bytes(data)
+    with open(path, "rb") as reader, mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        token_list = code_parser.to_token(buffer)
+        assert token_key(token_list) == expect
@@ -0,0 +1,27 @@
+import random
+
+from tests.helper import build_count_lexer, build_sql_parser, random_source, sql_source, token_key
+
+
+def test_compiled_same_as_uncompiled():
+    """ 编译后的状态表与逐个因子匹配的结果相同，包括位置和行列 """
+    rand = random.Random(1)
+    plain_parser = build_count_lexer()
+    compiled_parser = build_count_lexer().compile()
+    for _ in range(1500):
+        source_code = random_source(rand)
+        assert token_key(compiled_parser.to_token(source_code)) == token_key(plain_parser.to_token(source_code)), source_code
+
+
+def test_compiled_sql_corpus():
+    """ 语料上编译前后结果相同 """
+    source_code = sql_source(20000)
+    assert token_key(build_sql_parser().compile().to_token(source_code)) == token_key(build_sql_parser().to_token(source_code))
+
+
+def test_compile_after_add_token():
+    """ 编译后再注册因子，匹配器重新生成 """
+    code_parser = build_count_lexer().compile()
+    code_parser.to_token("a$b")
+    code_parser.add_token("dollar", "$")
+    assert [token.type for token in code_parser.to_token("a$b")] == ["any", "dollar", "any"]
@@ -0,0 +1,110 @@
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+from src.code.FormatCache import FormatCache
+from tests.helper import (SQL_CHAR, build_java_format, build_java_parser, build_java_syntax, build_sql_format, build_sql_parser, build_sql_syntax, edit_source,
+                          java_source, random_source, sql_source)
+
+CHECK_SCRIPT = """
+import sys
+
+from src.code.CodeParser import TokenType
+from src.code.FormatCache import FormatCache
+from tests.helper import build_sql_format, build_sql_parser, build_sql_syntax, sql_source
+
+for index in range(50):
+    TokenType.get_id(f"other:{index}")
+cache = FormatCache(path=sys.argv[1])
+format_code = build_sql_format().set_cache(cache)
+tree = build_sql_syntax().compile().parser(build_sql_parser().compile().to_token(sql_source(10000), skip_type=["space", "line"]))
+print(cache.hit_count == 0 and cache.miss_count == 0, end="|")
+print(format_code.format(tree), end="|")
+print(cache.miss_count == 0 and cache.hit_count > 0, end="")
+"""
+""" 在登记顺序不同的新进程中加载缓存并格式化 """
+
+
+def parse_sql(source_code):
+    """
+    解析SQL源码
+    :param source_code: 源码
+    :return: 语法树
+    """
+    return build_sql_syntax().compile().parser(build_sql_parser().compile().to_token(source_code, skip_type=["space", "line"]))
+
+
+def test_cache_same_as_format():
+    """ 使用缓存与不使用时结果相同，修改后的源码复用未修改部分，不同层数和规则共用缓存也不会混淆 """
+    java_tree = build_java_syntax().compile().parser(build_java_parser().compile().to_token(java_source(10000), skip_type=["space", "line"]))
+    source_code = sql_source(10000)
+    for max_depth in (1, 3):
+        cache = FormatCache(max_depth=max_depth)
+        for format_code, tree in [(build_sql_format(), parse_sql(source_code)), (build_java_format(), java_tree)]:
+            expect = format_code.format(tree)
+            format_code.set_cache(cache)
+            assert format_code.format(tree) == expect
+            assert format_code.format(tree) == expect
+            assert cache.hit_count > 0
+            format_code.set_cache(None)
+        format_code = build_sql_format()
+        for percent in (1, 10):
+            tree = parse_sql(edit_source(source_code, percent))
+            expect = format_code.format(tree)
+            cache.reset_stats()
+            format_code.set_cache(cache)
+            assert format_code.format(tree) == expect
+            assert cache.hit_count > cache.miss_count
+            format_code.set_cache(None)
+        # 规则不同的格式化器共用缓存
+        other_format = build_sql_format()
+        other_format.add_rule("symbol", left_space=False, right_space=False, content="=")
+        tree = parse_sql(source_code)
+        expect = other_format.format(tree)
+        assert other_format.set_cache(cache).format(tree) == expect
+
+
+def test_cache_random_source():
+    """ 随机源码使用缓存与不使用时结果相同 """
+    rand = random.Random(25)
+    cache = FormatCache(max_size=64, max_depth=2)
+    format_code = build_sql_format()
+    for _ in range(200):
+        tree = parse_sql(random_source(rand, 30, SQL_CHAR))
+        format_code.set_cache(None)
+        expect = format_code.format(tree)
+        format_code.set_cache(cache)
+        assert format_code.format(tree) == expect
+
+
+def test_cache_evict():
+    """ 超出容量时淘汰最久未使用的结果 """
+    cache = FormatCache(max_size=3)
+    for key in "abcd":
+        cache.put(key, (key, ()))
+    assert list(cache.data) == ["b", "c", "d"] and cache.evict_count == 1
+    assert cache.get("b") == ("b", ())
+    cache.put("e", ("e", ()))
+    assert list(cache.data) == ["d", "b", "e"]
+    assert cache.get("c") is None
+    assert cache.stats()["hit"] == 1 and cache.stats()["miss"] == 1 and cache.saved_bytes == 1
+    tree = parse_sql(sql_source(10000))
+    cache = FormatCache(max_size=10)
+    assert build_sql_format().set_cache(cache).format(tree) == build_sql_format().format(tree)
+    assert len(cache.data) == 10 and cache.evict_count == cache.store_count - 10
+
+
+def test_cache_persist(tmp_path):
+    """ 保存的缓存在新进程中加载后直接命中，损坏的文件被忽略 """
+    path = tmp_path / "format.cache"
+    cache = FormatCache(path=str(path))
+    format_code = build_sql_format().set_cache(cache)
+    expect = format_code.format(parse_sql(sql_source(10000)))
+    cache.save()
+    result = subprocess.run([sys.executable, "-c", CHECK_SCRIPT, str(path)], capture_output=True, cwd=Path(__file__).parent.parent)
+    assert result.returncode == 0, result.stderr.decode()
+    assert result.stdout.decode() == f"True|{expect}|True"
+    path.write_bytes(path.read_bytes()[:-10])
+    assert not FormatCache().load(str(path))
+    assert not FormatCache(path=str(path)).data
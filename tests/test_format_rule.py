@@ -0,0 +1,50 @@
+import pickle
+import random
+
+from src.code.CodeParser import TokenType
+from src.code.FormatCode import FormatCode
+from tests.helper import build_java_format, build_java_parser, build_java_syntax, java_source
+
+TYPE_LIST = ["rule:a", "rule:b", "rule:c", "rule:none"]
+""" 规则的类型，最后一个类型不添加规则 """
+START_LIST = [None, "(", ")", ",", ";", "{"]
+""" 规则的开始字符 """
+
+
+def check_table(format_code: FormatCode):
+    """
+    编译后的规则与IndexDict查询的配置相同
+    :param format_code: 格式化器
+    """
+    if format_code.rule_table is None:
+        format_code.compile()
+    for token_type in TYPE_LIST:
+        type_id = TokenType.get_id(token_type)
+        for start in START_LIST:
+            rule = format_code.get_rule(type_id, start)
+            assert (rule.config if rule is not None else None) is format_code.rule.get(type_id, start)
+
+
+def test_rule_table_same_as_index_dict():
+    """ 随机添加规则，每次添加后规则表失效，重新编译的结果与IndexDict相同 """
+    rand = random.Random(22)
+    for _ in range(100):
+        format_code = FormatCode()
+        for _ in range(rand.randint(1, 8)):
+            format_code.add_rule(rand.choice(TYPE_LIST[:-1]), line_after_use=rand.randint(0, 2), indent_after_use=rand.randint(-1, 1),
+                                 left_space=rand.random() < 0.5, content=rand.choice(START_LIST))
+            assert format_code.rule_table is None
+            check_table(format_code)
+        check_table(pickle.loads(pickle.dumps(format_code)))
+
+
+def test_format_after_add_rule():
+    """ 格式化后添加规则，之后的格式化使用新规则，序列化后格式化结果不变 """
+    token_list = build_java_syntax().compile().parser(build_java_parser().compile().to_token(java_source(5000), skip_type=["space", "line"]))
+    format_code = build_java_format()
+    expect = format_code.format(token_list)
+    assert pickle.loads(pickle.dumps(format_code)).format(token_list) == expect
+    format_code.add_rule("symbol", left_space=False, right_space=False, content="=")
+    data = format_code.format(token_list)
+    assert " = " in expect and " = " not in data
+    assert format_code.get_rule_digest() != build_java_format().get_rule_digest()
@@ -0,0 +1,75 @@
+import io
+import random
+
+import pytest
+
+from src.code.FormatCode import FormatData
+from tests.helper import (SQL_CHAR, build_java_format, build_java_parser, build_java_syntax, build_sql_format, build_sql_parser, build_sql_syntax, java_source,
+                          random_source, sql_source)
+
+
+class ChunkWriter:
+    """ 记录每次写入的内容 """
+
+    def __init__(self):
+        self.chunk_list = []
+        """ 写入的内容 """
+
+    def write(self, data):
+        self.chunk_list.append(data)
+
+
+def check_stream(format_code, tree):
+    """
+    不同写出间隔的分段写入与整体格式化的结果相同
+    :param format_code: 格式化器
+    :param tree: 语法树
+    :return: 整体格式化的结果
+    """
+    expect = format_code.format(tree)
+    for flush_count in (1, 2, 3, 7, 4096):
+        writer = ChunkWriter()
+        assert format_code.format_to(tree, writer, flush_count) == len(expect)
+        assert "".join(writer.chunk_list) == expect
+        if flush_count == 1 and len(expect) > 100:
+            assert len(writer.chunk_list) > 1
+    return expect
+
+
+def test_stream_same_as_format():
+    """ 分段写入与整体格式化的结果相同，包括依赖之前内容的空格和换行处理 """
+    for code_parser, syntax_parser, format_code, source_code in [
+        (build_sql_parser(), build_sql_syntax(), build_sql_format(), sql_source(20000)),
+        (build_java_parser(), build_java_syntax(), build_java_format(), java_source(20000)),
+    ]:
+        tree = syntax_parser.compile().parser(code_parser.compile().to_token(source_code, skip_type=["space", "line"]))
+        writer = io.StringIO()
+        format_code.format_to(tree, writer)
+        assert writer.getvalue() == check_stream(format_code, tree)
+
+
+def test_stream_random_source():
+    """ 随机源码分段写入与整体格式化的结果相同 """
+    rand = random.Random(21)
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax().compile()
+    format_code = build_sql_format()
+    for _ in range(200):
+        check_stream(format_code, syntax_parser.parser(code_parser.to_token(random_source(rand, 30, SQL_CHAR), skip_type=["space", "line"])))
+
+
+def test_flush_count_and_empty_flush():
+    """ 写出数量小于1时抛出ValueError，缓存为空时写出不改变已写出的片段数量 """
+    for flush_count in (0, -1):
+        with pytest.raises(ValueError):
+            FormatData(io.StringIO(), flush_count)
+    writer = ChunkWriter()
+    form_data = FormatData(writer, 1)
+    form_data.flush()
+    form_data.flush(True)
+    assert form_data.drop_count == 0 and writer.chunk_list == []
+    form_data.add_data("select")
+    form_data.add_data("a")
+    form_data.flush(True)
+    form_data.flush(True)
+    assert form_data.drop_count == 3 and "".join(writer.chunk_list) == "select a"
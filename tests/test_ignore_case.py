@@ -0,0 +1,47 @@
+import itertools
+import random
+
+from src.code.CodeParser import CodeParser, MatchRule
+from tests.helper import random_source, token_key
+
+KEYWORD = ["select", "sel", "set", "se", "as"]
+""" 前缀互相重叠的关键字 """
+CASE_CHAR = ["s", "S", "e", "E", "l", "L", "ect", "ECT", "eCt", "t", "T", "a", "A", " ", "+", "++", "中"]
+""" 随机源码的组成片段，大小写混合 """
+
+
+def build_parser(ignore_case, use_scan=True) -> CodeParser:
+    """
+    构建关键字解析器
+    :param ignore_case: 使用忽略大小写的规则，否则列出每个关键字的全部大小写组合
+    :param use_scan: 使用扫描索引
+    :return: 词法解析器
+    """
+    code_parser = CodeParser(use_scan)
+    code_parser.add_token("space", " ")
+    code_parser.add_token("symbol", "+", "++", "S+")
+    code_parser.add_token("exact", "SEL")
+    for keyword in KEYWORD:
+        if ignore_case:
+            code_parser.add_token(f"key:{keyword}", MatchRule(keyword, ignore_case=True))
+        else:
+            case_list = ["".join(item) for item in itertools.product(*[(now_char.lower(), now_char.upper()) for now_char in keyword])]
+            code_parser.add_token(f"key:{keyword}", *case_list)
+    return code_parser
+
+
+def test_ignore_case_same_as_every_case():
+    """ 忽略大小写的规则与列出全部大小写组合的结果相同，内容保留原始大小写 """
+    rand = random.Random(13)
+    for use_scan in (True, False):
+        for compiled in (False, True):
+            fold_parser = build_parser(True, use_scan)
+            case_parser = build_parser(False, use_scan)
+            if compiled:
+                fold_parser.compile()
+                case_parser.compile()
+            for _ in range(500):
+                source_code = random_source(rand, 20, CASE_CHAR)
+                assert token_key(fold_parser.to_token(source_code)) == token_key(case_parser.to_token(source_code))
+    token_list = build_parser(True).to_token("SeLeCt")
+    assert [(token.type, token.start) for token in token_list] == [("key:select", "SeLeCt")]
@@ -0,0 +1,44 @@
+import io
+import mmap
+import random
+
+from tests.helper import build_count_lexer, build_sql_parser, random_source, sql_source, token_key
+
+
+def test_small_chunk_same_as_to_token():
+    """ 字符块很小时，跨越字符块的组合token和下一层解析结果仍与一次解析相同 """
+    rand = random.Random(4)
+    code_parser = build_count_lexer()
+    for _ in range(400):
+        source_code = random_source(rand, 30)
+        expect = token_key(code_parser.to_token(source_code, line_count=1))
+        for chunk_size in (1, 2, 3):
+            assert token_key(code_parser.iter_tokens(source_code, line_count=1, chunk_size=chunk_size)) == expect
+            assert token_key(code_parser.iter_tokens(io.StringIO(source_code), line_count=1, chunk_size=chunk_size)) == expect
+
+
+def test_skip_type_same_as_to_token():
+    """ 跳过的类型和未知字符与一次解析相同 """
+    rand = random.Random(5)
+    code_parser = build_count_lexer()
+    for _ in range(200):
+        source_code = random_source(rand, 30, ["a", " ", "\n", "'", "--", "#", "?", "select"])
+        expect = token_key(code_parser.to_token(source_code, skip_type=["space", "line"]))
+        for chunk_size in (1, 2, 3):
+            assert token_key(code_parser.iter_tokens(source_code, skip_type=["space", "line"], chunk_size=chunk_size)) == expect
+
+
+def test_stream_source(tmp_path):
+    """ 文本文件、二进制文件、mmap和字符块迭代器的结果与一次解析相同 """
+    source_code = sql_source(20000) + "select '中文' from t;\n"
+    code_parser = build_sql_parser().compile()
+    expect = token_key(code_parser.to_token(source_code))
+    path = tmp_path / "source.sql"
+    path.write_text(source_code, encoding="utf-8")
+    with open(path, encoding="utf-8") as reader:
+        assert token_key(code_parser.iter_tokens(reader, chunk_size=1000)) == expect
+    with open(path, "rb") as reader:
+        assert token_key(code_parser.iter_tokens(reader, chunk_size=1001)) == expect
+        with mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            assert token_key(code_parser.iter_tokens(data, chunk_size=777)) == expect
+    assert token_key(code_parser.iter_tokens(iter(source_code[index:index + 100] for index in range(0, len(source_code), 100)))) == expect
@@ -0,0 +1,49 @@
+import random
+
+from src.code.CodeParser import LineIndex
+from tests.helper import build_sql_parser, random_source, sql_source
+
+
+def naive_line(source_code, index, line_count=0):
+    """
+    逐个统计换行计算行列
+    :param source_code: 源码
+    :param index: 字符位置
+    :param line_count: 起始行
+    :return: 行，列
+    """
+    return source_code.count("\n", 0, index) + line_count, index - (source_code.rfind("\n", 0, index) + 1)
+
+
+def test_line_index_same_as_counting():
+    """ 二分查找的行列与逐个统计换行相同 """
+    rand = random.Random(2)
+    for _ in range(300):
+        source_code = random_source(rand, 40)
+        line_count = rand.randint(0, 3)
+        line_index = LineIndex(source_code, line_count)
+        for index in range(len(source_code)):
+            assert (line_index.line(index), line_index.column(index)) == naive_line(source_code, index, line_count)
+
+
+def test_token_line_same_as_counting():
+    """ token的起止行和列与按源码位置统计的结果相同 """
+    source_code = sql_source(20000)
+    for token in build_sql_parser().compile().to_token(source_code, line_count=1):
+        text = (token.start or "") + token.data + (token.end or "")
+        start_index = token.end_index - len(text) + 1
+        assert source_code[start_index:token.end_index + 1] == text
+        assert (token.line_start, token.column) == naive_line(source_code, start_index, 1)
+        assert token.line_end == naive_line(source_code, token.end_index, 1)[0]
+
+
+def test_update_same_as_rebuild():
+    """ 编辑后增量更新的索引与重新构建的索引相同 """
+    rand = random.Random(3)
+    for _ in range(500):
+        source_code = random_source(rand, 30)
+        edit_index = rand.randint(0, len(source_code))
+        remove_length = rand.randint(0, len(source_code) - edit_index)
+        insert_data = random_source(rand, 6)
+        line_index = LineIndex(source_code, 2).update(edit_index, remove_length, insert_data)
+        assert line_index.line_offset == LineIndex(source_code[:edit_index] + insert_data + source_code[edit_index + remove_length:], 2).line_offset
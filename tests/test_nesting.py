@@ -0,0 +1,105 @@
+import inspect
+import random
+import sys
+
+import pytest
+
+from src.code.CodeParser import Token
+from src.code.ParserUtil import CodeHandle
+from src.code.TokenParser import token_debug
+from tests.helper import build_sql_parser, build_sql_syntax, nested_source, random_tree, subquery_source, token_key
+
+
+def naive_match(list_token, rule, start_index):
+    """
+    递归判断规则，作为对照
+    :param list_token: token列表
+    :param rule: 规则
+    :param start_index: 起始下标
+    :return: 是否满足
+    """
+    if len(list_token) - start_index < len(rule):
+        return False
+    for index, rule_token in enumerate(rule):
+        match_token = list_token[start_index + index]
+        if not CodeHandle.equal(match_token, rule_token):
+            return False
+        if rule_token.has_tree() and not naive_match(match_token.token_tree, rule_token.token_tree, 0):
+            return False
+    return True
+
+
+def naive_find(list_token, rule, result):
+    """
+    递归先序查找，作为对照
+    :param list_token: token列表
+    :param rule: 规则
+    :param result: 找到的token
+    """
+    for index, token in enumerate(list_token):
+        if naive_match(list_token, rule, index):
+            result.append(token)
+        if token.has_tree():
+            naive_find(token.token_tree, rule, result)
+
+
+def test_find_same_as_recursion():
+    """ 显式栈的查找与递归查找的结果和顺序相同 """
+    rand = random.Random(9)
+    for _ in range(300):
+        tree = random_tree(rand)
+        rule = random_tree(rand, 3)[:2] or [Token.create("a", None, "x", None)]
+        expect = []
+        naive_find(tree, rule, expect)
+        result = []
+        CodeHandle.find(tree, rule, result)
+        assert [id(token) for token in result] == [id(token) for token in expect]
+
+
+def test_deep_nesting_without_recursion():
+    """ 嵌套层数远超递归限制时，语法解析、查找、替换和调试输出仍然可以完成 """
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax().compile()
+    nest = 600
+    expect = token_key(syntax_parser.parser(code_parser.to_token(nested_source(20) + subquery_source(5), skip_type=["space", "line"])))
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(len(inspect.stack()) + 200)
+    try:
+        token_list = code_parser.to_token(nested_source(nest), skip_type=["space", "line"])
+        tree = syntax_parser.parser(token_list)
+        syntax_parser.use_memo = True
+        assert token_key(syntax_parser.parser(code_parser.to_token(nested_source(20) + subquery_source(5), skip_type=["space", "line"]))) == expect
+        rule = [Token.create("bracket", "(")]
+        result = []
+        CodeHandle.find(tree, rule, result)
+        assert len(result) == nest
+        CodeHandle.tree_replace(tree, rule, lambda token: Token.create("bracket", "["))
+        result = []
+        CodeHandle.find(tree, [Token.create("bracket", "[")], result)
+        assert len(result) == nest
+    finally:
+        sys.setrecursionlimit(limit)
+    depth = 0
+    node = tree
+    while node:
+        depth += 1
+        node = next((token.token_tree for token in node if token.has_tree()), None)
+    assert depth > nest
+
+
+def test_token_debug_deep(capsys):
+    """ 调试输出按先序输出每个token，深层的树不受递归限制 """
+    code_parser = build_sql_parser().compile()
+    tree = build_sql_syntax().compile().parser(code_parser.to_token(nested_source(1200), skip_type=["space", "line"]))
+    token_debug(tree)
+    assert len(capsys.readouterr().out.splitlines()) == len(token_key(tree, False))
+
+
+def test_join_short_replace():
+    """ 替换内容与token一一对应时还原源码，数量不足时抛出ValueError """
+    source_code = "select a from t where b = (c + 1);"
+    token_list = build_sql_parser().compile().to_token(source_code)
+    replace_data = CodeHandle.replace(token_list, {"any": {"a": "x"}})
+    assert CodeHandle.join(source_code, token_list, replace_data) == source_code.replace(" a ", " x ")
+    with pytest.raises(ValueError):
+        CodeHandle.join(source_code, token_list, replace_data[:-1])
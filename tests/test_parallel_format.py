@@ -0,0 +1,69 @@
+import io
+
+import src.code.ParallelFormat as parallel_module
+from src.code.ParallelFormat import ParallelFormat
+from src.code.ParserProfile import ParserProfile
+from tests.helper import build_sql_format, build_sql_parser, build_sql_syntax, sql_source
+
+
+def build_tree(size=20000):
+    """
+    构建SQL语法树
+    :param size: 源码字符数量
+    :return: 语法树
+    """
+    return build_sql_syntax().compile().parser(build_sql_parser().compile().to_token(sql_source(size), skip_type=["space", "line"]))
+
+
+def test_parallel_same_as_format():
+    """ 分段格式化与整体格式化的结果相同 """
+    tree = build_tree()
+    format_code = build_sql_format()
+    expect = format_code.format(tree)
+    for chunk_size, max_workers in [(7, 2), (100, 3), (len(tree), 2), (50, 1)]:
+        parallel_format = ParallelFormat(format_code, max_workers, chunk_size)
+        assert parallel_format.format(tree) == expect
+        assert parallel_format.retry_count == 0
+        writer = io.StringIO()
+        assert parallel_format.format_to(tree, writer) == len(expect)
+        assert writer.getvalue() == expect
+
+
+def test_parallel_retry():
+    """ 推测的开始状态不一致时重新格式化，结果仍然相同，重试次数记录在统计中 """
+    tree = build_tree()
+    format_code = build_sql_format()
+    # 缩进在语句之间累积，推测的开始状态总是不一致
+    format_code.add_rule("symbol", indent_after_use=1, content=";")
+    expect = format_code.format(tree)
+    profile = ParserProfile()
+    parallel_format = ParallelFormat(format_code, 2, 20).set_profile(profile, "sql")
+    assert parallel_format.format(tree) == expect
+    assert parallel_format.retry_count > 0
+    stat_map = {stat["rule"]: stat for stat in profile.report("format")}
+    assert stat_map["<分段>"]["matched"] == parallel_format.chunk_count
+    assert stat_map["<分段>"]["length"] == len(tree)
+    assert stat_map["<重新格式化>"]["matched"] == parallel_format.retry_count
+    assert "<重新格式化>" in profile.format_report("format")
+
+
+def test_parallel_window(monkeypatch):
+    """ 同时在进程中的分段不超过进程数量，提前停止时不再展开其余分段 """
+    tree = build_tree()
+    format_code = build_sql_format()
+    encode_count = [0]
+    encode_tree = parallel_module.encode_tree
+
+    def count_encode(token_list, position=False):
+        encode_count[0] += 1
+        return encode_tree(token_list, position)
+
+    monkeypatch.setattr(parallel_module, "encode_tree", count_encode)
+    parallel_format = ParallelFormat(format_code, 2, 10)
+    data_iter = parallel_format.iter_format(tree)
+    first = next(data_iter)
+    assert parallel_format.chunk_count > 20
+    assert encode_count[0] <= 2 * 2
+    data_iter.close()
+    assert encode_count[0] <= 2 * 2
+    assert format_code.format(tree).startswith(first)
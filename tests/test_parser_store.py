@@ -0,0 +1,60 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.code.ParserStore import STORE_HEADER, ParserStore
+from tests.helper import build_count_lexer, build_sql_format, build_sql_parser, build_sql_syntax, sql_source, token_key
+
+CHECK_SCRIPT = """
+import sys
+
+from src.code.ParserStore import ParserStore
+from tests.helper import sql_source
+
+code_parser, syntax_parser, format_code = ParserStore.load(sys.argv[1])
+print(format_code.format(syntax_parser.parser(code_parser.to_token(sql_source(5000), skip_type=["space", "line"]))), end="")
+"""
+""" 在新进程中加载配置并格式化 """
+
+
+def test_load_same_as_build(tmp_path):
+    """ 加载的解析器与重新构建的解析器结果相同，新进程中加载的结果也相同 """
+    source_code = sql_source(5000)
+    config = (build_sql_parser().compile(), build_sql_syntax().compile(), build_sql_format())
+    path = tmp_path / "sql.store"
+    ParserStore.dump(config, path)
+    code_parser, syntax_parser, format_code = ParserStore.load(path)
+    expect_tree = config[1].parser(config[0].to_token(source_code, skip_type=["space", "line"]))
+    tree = syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"]))
+    assert token_key(tree) == token_key(expect_tree)
+    expect = config[2].format(expect_tree)
+    assert format_code.format(tree) == expect
+    result = subprocess.run([sys.executable, "-c", CHECK_SCRIPT, str(path)], capture_output=True, cwd=Path(__file__).parent.parent)
+    assert result.returncode == 0, result.stderr.decode()
+    assert result.stdout.decode() == expect
+    lexer = build_count_lexer().compile()
+    assert token_key(ParserStore.loads(ParserStore.dumps(lexer)).to_token("select '{a}' \"{$}\" {{}}")) == token_key(lexer.to_token("select '{a}' \"{$}\" {{}}"))
+
+
+def test_load_error():
+    """ 文件标识、版本、长度和摘要不一致时拒绝加载，无法导出的配置给出原因 """
+    data = ParserStore.dumps(build_sql_parser())
+    magic, version, length, digest = STORE_HEADER.unpack_from(data)
+    payload = data[STORE_HEADER.size:]
+    corrupt = bytearray(payload)
+    corrupt[len(corrupt) // 2] ^= 1
+    for bad_data, message in [
+        (data[:10], "不完整"),
+        (STORE_HEADER.pack(b"OTHER\0\0\0", version, length, digest) + payload, "不是解析器配置文件"),
+        (STORE_HEADER.pack(magic, version + 1, length, digest) + payload, "版本"),
+        (data[:-1], "损坏"),
+        (data[:STORE_HEADER.size] + bytes(corrupt), "损坏"),
+    ]:
+        with pytest.raises(ValueError, match=message):
+            ParserStore.loads(bad_data)
+    syntax_parser = build_sql_syntax()
+    syntax_parser.add_flow(9, lambda token_list: token_list)
+    with pytest.raises(ValueError, match="lambda"):
+        ParserStore.dumps(syntax_parser)
@@ -0,0 +1,65 @@
+from src.code.ParserProfile import ParserProfile
+from src.code.TokenParser import SyntaxList
+from tests.helper import build_sql_parser, build_sql_syntax, sql_source, token_key
+
+
+def test_profile_same_as_plain(monkeypatch):
+    """ 开启统计后解析结果不变，每个位置只选取一次候选语法，统计与解析结果一致 """
+    source_code = sql_source(20000)
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax().compile()
+    candidate_count = [0]
+    candidate = SyntaxList.candidate
+
+    def count_candidate(self, token, match_pool=None):
+        candidate_count[0] += 1
+        return candidate(self, token, match_pool)
+
+    monkeypatch.setattr(SyntaxList, "candidate", count_candidate)
+    token_list = code_parser.to_token(source_code)
+    expect_token = token_key(token_list)
+    expect_tree = token_key(syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"])))
+    expect_count = candidate_count[0]
+    for use_label in (False, True):
+        profile = ParserProfile(use_label)
+        code_parser.set_profile(profile, "sql")
+        syntax_parser.set_profile(profile, "sql")
+        assert token_key(code_parser.to_token(source_code)) == expect_token
+        token_report = profile.report("token")
+        assert sum(stat["selected"] for stat in token_report) == sum(token.type != "any" for token in token_list)
+        assert sum(stat["length"] for stat in token_report) == sum(len(token.start or "") + len(token.data) + len(token.end or "") for token in token_list if token.type != "any")
+        assert all(stat["selected"] <= stat["matched"] <= stat["tried"] for stat in token_report if stat["index"] >= 0)
+        candidate_count[0] = 0
+        assert token_key(syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"]))) == expect_tree
+        assert candidate_count[0] == expect_count
+        syntax_report = profile.report("syntax")
+        assert sum(stat["selected"] for stat in syntax_report) > 0
+        assert all(stat["selected"] <= stat["matched"] <= stat["tried"] for stat in syntax_report if stat["index"] >= 0)
+        # 尝试后失败的语法同样计数
+        assert sum(stat["tried"] for stat in syntax_report if stat["index"] >= 0) > sum(stat["matched"] for stat in syntax_report if stat["index"] >= 0)
+        assert "满足" in profile.format_report()
+        code_parser.set_profile(None)
+        syntax_parser.set_profile(None)
+
+
+def test_profile_tried_rule():
+    """ 尝试后失败的规则记录尝试次数和自身耗时，共用部分单独记录 """
+    code_parser = build_sql_parser()
+    for compiled in (False, True):
+        if compiled:
+            code_parser.compile()
+        profile = ParserProfile()
+        code_parser.set_profile(profile, "sql")
+        code_parser.to_token("select a from t where b = '" + "x" * 2000)
+        stat_map = {stat["rule"]: stat for stat in profile.report("token")}
+        assert stat_map["'…'"]["tried"] == 1 and stat_map["'…'"]["matched"] == 0 and stat_map["'…'"]["time"] > 0
+        assert stat_map["<共用>"]["tried"] > 0 and stat_map["<共用>"]["time"] > 0
+        code_parser.set_profile(None)
+    syntax_parser = build_sql_syntax()
+    profile = ParserProfile()
+    syntax_parser.set_profile(profile, "sql")
+    syntax_parser.parser(code_parser.to_token("select a from t where b = (c + 1", skip_type=["space", "line"]))
+    stat_map = {(stat["parser"], stat["rule"]): stat for stat in profile.report("syntax")}
+    # 括号没有闭合，尝试后失败
+    bracket = next(stat for (parser, rule), stat in stat_map.items() if rule == "bracket_group")
+    assert bracket["tried"] > 0 and bracket["matched"] == 0 and bracket["time"] > 0
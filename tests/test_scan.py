@@ -0,0 +1,36 @@
+import random
+
+from tests.helper import SOURCE_CHAR, build_count_lexer, build_keyword_parser, identifier_source, random_source, token_key
+
+
+SCAN_CHAR = SOURCE_CHAR + ["selection", "sel_ect", "SELECTS", "xyz"]
+""" 随机源码的组成片段，增加与关键字部分重叠的标识符 """
+
+
+def test_scan_same_as_probe():
+    """ 使用扫描索引与逐个位置匹配的结果相同 """
+    rand = random.Random(14)
+    for compiled in (False, True):
+        scan_parser = build_count_lexer(True)
+        probe_parser = build_count_lexer(False)
+        if compiled:
+            scan_parser.compile()
+            probe_parser.compile()
+        for _ in range(500):
+            source_code = random_source(rand, 30, SCAN_CHAR)
+            expect = token_key(probe_parser.to_token(source_code, line_count=1))
+            assert token_key(scan_parser.to_token(source_code, line_count=1)) == expect
+            assert token_key(scan_parser.to_token(source_code, skip_type=["space", "any"], line_count=1)) == token_key(
+                probe_parser.to_token(source_code, skip_type=["space", "any"], line_count=1))
+
+
+def test_scan_identifier_source():
+    """ 标识符很长的源码中，使用扫描索引与逐个位置匹配的结果相同 """
+    source_code = identifier_source(30000)
+    for compiled in (False, True):
+        scan_parser = build_keyword_parser(True)
+        probe_parser = build_keyword_parser(False)
+        if compiled:
+            scan_parser.compile()
+            probe_parser.compile()
+        assert token_key(scan_parser.to_token(source_code)) == token_key(probe_parser.to_token(source_code))
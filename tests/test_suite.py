@@ -0,0 +1,53 @@
+import json
+import math
+import random
+
+import pytest
+
+from benchmark.suite import SUITE_VERSION, compare, main, percentile
+
+
+def build_result(stat_map, version=SUITE_VERSION):
+    """
+    构建基准测试结果
+    :param stat_map: 项目名称到p50耗时和内存峰值
+    :param version: 结果格式版本
+    :return: 结果
+    """
+    return {"version": version, "python": "3", "platform": "test", "size": 1, "repeat": 1,
+            "result": {name: {"p50": p50, "peak": peak} for name, (p50, peak) in stat_map.items()}}
+
+
+def test_percentile_nearest_rank():
+    """ 百分位数与最近秩定义相同 """
+    rand = random.Random(20)
+    for _ in range(200):
+        data = sorted(rand.random() for _ in range(rand.randint(1, 30)))
+        for percent in (1, 50, 90, 99, 100):
+            rank = max(1, math.ceil(percent / 100 * len(data)))
+            assert percentile(data, percent) == data[rank - 1]
+
+
+def test_compare_regression(capsys):
+    """ 耗时或者内存峰值超过阈值时视为退化，基线中没有的项目跳过 """
+    baseline = build_result({"a": (1.0, 100), "b": (1.0, 100), "c": (1.0, 100), "d": (1.0, 0)})
+    result = build_result({"a": (1.1, 100), "b": (1.5, 100), "c": (1.0, 150), "d": (1.0, 10), "new": (9.0, 900)})
+    assert compare(result, baseline, 0.2) == ["b", "c"]
+    assert compare(result, baseline, 0.6) == []
+    result["platform"] = "other"
+    compare(result, baseline, 0.2)
+    assert "platform与基线不同" in capsys.readouterr().out
+    with pytest.raises(ValueError, match="版本"):
+        compare(result, build_result({}, SUITE_VERSION + 1), 0.2)
+
+
+def test_main_save_compare(tmp_path):
+    """ 保存的基线可以直接比较，退化时返回非零 """
+    path = tmp_path / "baseline.json"
+    assert main(["--size", "1", "--repeat", "2", "--case", "sql_flat", "--save", str(path)]) == 0
+    assert main(["--size", "1", "--repeat", "2", "--case", "sql_flat", "--compare", str(path), "--threshold", "1000"]) == 0
+    baseline = json.loads(path.read_text(encoding="utf-8"))
+    for stat in baseline["result"].values():
+        stat["p50"] /= 10000
+    path.write_text(json.dumps(baseline), encoding="utf-8")
+    assert main(["--size", "1", "--repeat", "2", "--case", "sql_flat", "--compare", str(path), "--threshold", "1000"]) == 1
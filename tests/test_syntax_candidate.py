@@ -0,0 +1,120 @@
+import random
+import sys
+import threading
+
+from src.code.CodeParser import Token
+from src.code.TokenParser import LexicalFactor, SyntaxFactor, SyntaxList, SyntaxParser, WordRule
+from tests.helper import build_sql_parser, build_sql_syntax, literal_source, sql_source, token_key
+
+
+def build_syntax_list() -> SyntaxList:
+    """
+    构建首个词法各不相同的语法列表：不限内容、限定内容、限定开始字符、不限类型
+    :return: 语法列表
+    """
+    syntax_list = SyntaxList()
+    for index, lexical in enumerate([
+        LexicalFactor(None, "name"),
+        LexicalFactor(WordRule(data="a"), "name"),
+        LexicalFactor(WordRule(data="b"), "name", "string"),
+        LexicalFactor(WordRule(start="("), "bracket"),
+        LexicalFactor(WordRule(start="(", data="a"), "bracket"),
+        LexicalFactor(None, "string", "note"),
+    ]):
+        syntax = SyntaxFactor(f"syntax:{index}")
+        syntax.add_lexical(lexical, LexicalFactor(None, "name"))
+        syntax_list.add_syntax(syntax)
+    return syntax_list
+
+
+def brute_candidate(syntax_list: SyntaxList, token: Token):
+    """
+    逐个语法判断首个词法是否满足
+    :param syntax_list: 语法列表
+    :param token: 首个token
+    :return: 可能匹配的语法
+    """
+    out_list = []
+    for syntax in syntax_list.data:
+        first = syntax.syntax[0]
+        if (first.any_type or token.type_id in first.type_id) and (first.word_rule is None or first.word_rule.is_same(token)):
+            out_list.append(syntax)
+    return out_list
+
+
+def test_candidate_same_as_brute():
+    """ 分派索引选取的语法与逐个判断的结果相同，增加语法后重新生成 """
+    rand = random.Random(8)
+    syntax_list = build_syntax_list()
+    for step in range(2):
+        for _ in range(500):
+            token = Token.create(rand.choice(["name", "string", "note", "bracket", "other"]), rand.choice([None, "("]), rand.choice(["a", "b", "c"]), None)
+            assert [syntax_match.syntax_factor for syntax_match in syntax_list.candidate(token)] == brute_candidate(syntax_list, token)
+        syntax = SyntaxFactor("syntax:any")
+        syntax.add_lexical(LexicalFactor(WordRule(data="c")), LexicalFactor(None, "name"))
+        syntax_list.add_syntax(syntax)
+
+
+def test_candidate_keep_lazy():
+    """ 没有限定内容的语法接受的类型，选取语法时不读取内容 """
+    syntax_list = build_syntax_list()
+    source_code = "abc"
+    for token_type, is_lazy in [("note", True), ("bracket", False), ("other", True), ("name", False), ("string", False)]:
+        token = Token.slice_token(token_type, source_code, 0, 3, 2)
+        syntax_list.candidate(token)
+        assert (token._source is not None) == is_lazy
+    syntax = SyntaxFactor("syntax:any")
+    syntax.add_lexical(LexicalFactor(WordRule(data="c")), LexicalFactor(None, "name"))
+    syntax_list.add_syntax(syntax)
+    token = Token.slice_token("note", source_code, 0, 3, 2)
+    syntax_list.candidate(token)
+    assert token._source is None
+
+
+def test_parse_keep_lazy():
+    """ 语法解析后字符串和注释的内容仍然延迟生成 """
+    source_code = sql_source(20000) + literal_source(20000).replace("\\", "")
+    token_list = build_sql_parser().compile().to_token(source_code, skip_type=["space", "line"])
+    lazy_list = [token for token in token_list if token.type in ("string", "note") and token._source is not None]
+    assert lazy_list
+    build_sql_syntax().compile().parser(token_list)
+    assert all(token._source is not None for token in lazy_list)
+
+
+def test_candidate_not_shared():
+    """ 不传复用对象时每次返回新的匹配对象，之前返回的匹配状态不受之后选取的影响 """
+    syntax_list = build_syntax_list()
+    token = Token.create("name", None, "a", None)
+    first = syntax_list.candidate(token)
+    first[0].prefix(token)
+    second = syntax_list.candidate(token)
+    assert first[0].now_index == 1
+    assert all(syntax_match not in first for syntax_match in second)
+    result, _ = SyntaxParser.match_factor(syntax_list, 0, [token, token])
+    SyntaxParser.match_factor(syntax_list, 0, [token])
+    assert result and all(syntax_match.now_index == 2 for syntax_match in result)
+
+
+def test_parse_in_threads():
+    """ 多个线程同时使用同一个语法解析器，结果与单线程解析相同 """
+    source_code = sql_source(20000)
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax().compile()
+    expect = token_key(syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"])))
+    token_group = [code_parser.to_token(source_code, skip_type=["space", "line"]) for _ in range(4)]
+    result = [None] * len(token_group)
+
+    def parse(index):
+        result[index] = token_key(syntax_parser.parser(token_group[index]))
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        thread_list = [threading.Thread(target=parse, args=(index,)) for index in range(len(token_group))]
+        for thread in thread_list:
+            thread.start()
+        for thread in thread_list:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert result == [expect] * len(token_group)
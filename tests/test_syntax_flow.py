@@ -0,0 +1,47 @@
+from src.code.Flow import Flow
+from src.code.TokenParser import LexicalFactor, SyntaxFactor, WordRule
+from tests.helper import (build_java_parser, build_java_syntax, build_sql_parser, build_sql_syntax, java_source, nested_source, sql_source, subquery_source,
+                          token_key)
+
+
+def test_flow_plan():
+    """ 执行计划按下标排序，同一下标按添加顺序，添加流后失效 """
+    flow = Flow()
+    for index, data in [(3, "c"), (1, "a"), (3, "d"), (2, "b")]:
+        flow.add_flow(index, "flow", data, None)
+    plan = flow.get_plan()
+    assert [info.flow_data for info in flow] == ["a", "b", "c", "d"]
+    assert flow.get_plan() is plan
+    flow.add_flow(0, "flow", "z", None)
+    flow.add_flow(1.5, "flow", "y", None)
+    assert [info.flow_data for info in flow] == ["z", "a", "y", "b", "c", "d"]
+
+
+def test_compile_same_as_flow():
+    """ 编译后的阶段列表与遍历流的解析结果相同 """
+    for code_parser, syntax_parser, source_code in [
+        (build_sql_parser(), build_sql_syntax, sql_source(20000) + nested_source(30, 3) + subquery_source(8, 2)),
+        (build_java_parser(), build_java_syntax, java_source(20000)),
+    ]:
+        code_parser.compile()
+        expect = token_key(syntax_parser().parser(code_parser.to_token(source_code, skip_type=["space", "line"])))
+        assert token_key(syntax_parser().compile().parser(code_parser.to_token(source_code, skip_type=["space", "line"]))) == expect
+
+
+def test_compile_after_add_syntax():
+    """ 编译后添加语法或流，阶段列表重新生成 """
+    code_parser = build_sql_parser().compile()
+    source_code = sql_source(5000)
+
+    def add_syntax(syntax_parser):
+        comma = SyntaxFactor("comma_list")
+        comma.add_lexical(LexicalFactor(None, "any"), LexicalFactor(WordRule(start=","), "symbol"), LexicalFactor(None, "any"))
+        syntax_parser.add_syntax(2.5, comma)
+        syntax_parser.add_flow(5, lambda while_list: [*while_list, *while_list[:1]])
+        return syntax_parser
+
+    compiled = build_sql_syntax().compile()
+    compiled.parser(code_parser.to_token(source_code, skip_type=["space", "line"]))
+    expect = token_key(add_syntax(build_sql_syntax()).parser(code_parser.to_token(source_code, skip_type=["space", "line"])))
+    assert token_key(add_syntax(compiled).parser(code_parser.to_token(source_code, skip_type=["space", "line"]))) == expect
+    assert any(item[0] == "comma_list" for item in expect)
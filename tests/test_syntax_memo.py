@@ -0,0 +1,80 @@
+from src.code.TokenParser import LexicalFactor, SyntaxFactor, SyntaxMemo, SyntaxParser, WordRule
+from tests.helper import (build_java_parser, build_java_syntax, build_sql_parser, build_sql_syntax, java_source, nested_source, sql_source, subquery_source,
+                          token_key)
+
+
+def all_token(token_list):
+    """
+    先序展开语法树的全部token
+    :param token_list: 语法树
+    :return: token列表
+    """
+    result = []
+    stack = [*reversed(token_list)]
+    while stack:
+        token = stack.pop()
+        result.append(token)
+        if token.has_tree():
+            stack.extend(reversed(token.token_tree))
+    return result
+
+
+def test_memo_same_as_parse(monkeypatch):
+    """ 使用记忆表与不使用时语法树相同，重放的片段不共用token，解析后记忆表释放 """
+    apply_count = [0]
+    apply = SyntaxMemo.apply
+
+    def count_apply(self, *args):
+        apply_count[0] += 1
+        return apply(self, *args)
+
+    monkeypatch.setattr(SyntaxMemo, "apply", count_apply)
+    for code_parser, build_syntax, source_code in [
+        (build_sql_parser(), build_sql_syntax, sql_source(20000) + nested_source(30, 3) + subquery_source(8, 4)),
+        (build_java_parser(), build_java_syntax, java_source(20000)),
+    ]:
+        code_parser.compile()
+        expect = token_key(build_syntax().parser(code_parser.to_token(source_code, skip_type=["space", "line"])))
+        for compiled in (False, True):
+            syntax_parser: SyntaxParser = build_syntax()
+            syntax_parser.use_memo = True
+            if compiled:
+                syntax_parser.compile()
+            tree = syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"]))
+            assert token_key(tree) == expect
+            token_list = all_token(tree)
+            assert len({id(token) for token in token_list}) == len(token_list)
+            assert syntax_parser.memo is None
+    assert apply_count[0] > 0
+
+
+def test_memo_keep_lazy():
+    """ 记忆表的键不读取内容，键相同时比较内容也不生成token的内容，内容不同的片段分别解析 """
+    code_parser = build_sql_parser().compile()
+    source_code = "".join(f"select a from t where b = ('{index % 7}{index % 3}' + 'xy');\n" for index in range(60))
+    expect = token_key(build_sql_syntax().parser(code_parser.to_token(source_code, skip_type=["space", "line"])))
+    token_list = code_parser.to_token(source_code, skip_type=["space", "line"])
+    lazy_list = [token for token in token_list if token.type == "string" and token._source is not None]
+    assert lazy_list
+    syntax_parser = build_sql_syntax()
+    syntax_parser.use_memo = True
+    tree = syntax_parser.parser(token_list)
+    assert all(token._source is not None for token in lazy_list)
+    assert token_key(tree) == expect
+
+
+def test_memo_same_key_other_data():
+    """ 类型和长度相同而内容不同的片段不重放彼此的结果 """
+    for use_memo in (False, True):
+        syntax_parser = SyntaxParser(use_memo)
+        bracket = SyntaxFactor("bracket_group", need_match=True, need_paired=True)
+        bracket.add_lexical(LexicalFactor(WordRule(start="("), "bracket"), LexicalFactor(WordRule(start=")"), "bracket"))
+        syntax_parser.add_syntax(0, bracket, need_recursion=True)
+        pair = SyntaxFactor("pair")
+        pair.add_lexical(LexicalFactor(WordRule(data="ab"), "any"), LexicalFactor(None, "any"))
+        syntax_parser.add_syntax(1, pair)
+        tree = syntax_parser.parser(build_sql_parser().compile().to_token("(ab cd) (cd ab) (ab cd)", skip_type=["space", "line"]))
+        if not use_memo:
+            expect = token_key(tree)
+    assert token_key(tree) == expect
+    assert [[token.type for token in branch.token_tree] for branch in tree] == [["bracket", "pair", "bracket"], ["bracket", "any", "any", "bracket"], ["bracket", "pair", "bracket"]]
@@ -0,0 +1,71 @@
+import random
+
+from src.code.CodeParser import CodeParser, MatchToken
+from tests.helper import build_sql_parser, literal_source, random_source, sql_source
+
+ESCAPE_SOURCE = ["a", "b", " ", "\n", "\\", "\\\\", "\\n", "\\t", "\\'", '"', "中"]
+""" 带转义的随机源码片段 """
+
+
+def naive_string(source_code, index):
+    """
+    逐个字符处理转义，读取字符串内容
+    :param source_code: 源码
+    :param index: 开始引号后的位置
+    :return: 内容，结束引号的位置，未闭合时为None
+    """
+    result = ""
+    while index < len(source_code):
+        now_char = source_code[index]
+        if now_char == "\\" and index + 1 < len(source_code):
+            next_char = source_code[index + 1]
+            result += MatchToken.ESCAPE_CHAR.get(next_char, f"\\{next_char}")
+            index += 2
+            continue
+        if now_char == '"':
+            return result, index
+        result += now_char
+        index += 1
+    return None
+
+
+def test_slice_rebuild_source():
+    """ 没有转义时，token的开始字符、内容和结束字符依次拼接后与源码相同 """
+    source_code = literal_source(50000).replace("\\", "")
+    token_list = build_sql_parser().compile().to_token(source_code)
+    assert "".join((token.start or "") + token.data + (token.end or "") for token in token_list) == source_code
+
+
+def test_data_is_lazy():
+    """ 内容在访问前只引用源码，访问后生成并释放源码的引用 """
+    source_code = literal_source(50000) + sql_source(20000)
+    token_list = build_sql_parser().compile().to_token(source_code)
+    lazy_list = [token for token in token_list if token.type == "note" or token.type == "string" and token._source is not None]
+    assert sum(token.type == "string" for token in lazy_list) > 0
+    assert all(token._source is not None for token in lazy_list)
+    for token in lazy_list:
+        assert token._source is source_code
+        data = source_code[token._data_start:token._data_end]
+        assert token.data == data
+        assert token._source is None
+
+
+def test_escape_same_as_char_loop():
+    """ 转义后的内容与逐个字符处理的结果相同，没有转义的内容保持延迟生成 """
+    rand = random.Random(7)
+    for use_scan in (True, False):
+        code_parser = CodeParser(use_scan)
+        code_parser.add_combination("string", '"', '"', need_escape=True)
+        code_parser.compile()
+        for _ in range(500):
+            source_code = random_source(rand, 20, ESCAPE_SOURCE)
+            expect = []
+            index = source_code.find('"')
+            while index >= 0:
+                result = naive_string(source_code, index + 1)
+                if result is None:
+                    break
+                expect.append(result[0])
+                index = source_code.find('"', result[1] + 1)
+            token_list = [token for token in code_parser.to_token(source_code) if token.type == "string"]
+            assert [token.data for token in token_list] == expect
@@ -0,0 +1,46 @@
+import random
+
+from src.code.CodeParser import TokenTable
+from tests.helper import build_count_lexer, build_sql_format, build_sql_parser, build_sql_syntax, random_source, sql_source, token_key
+
+
+def test_table_same_as_tokens():
+    """ 列式存储的视图与token的属性和子节点相同，视图转回的token也相同 """
+    rand = random.Random(6)
+    code_parser = build_count_lexer()
+    for _ in range(300):
+        source_code = random_source(rand, 30)
+        token_list = code_parser.to_token(source_code, line_count=1)
+        expect = token_key(token_list)
+        for table in (TokenTable.from_tokens(token_list, source_code), TokenTable.from_tokens(token_list)):
+            assert len(table) == len(token_list)
+            assert token_key(table) == expect
+            assert token_key([view.to_token() for view in table]) == expect
+
+
+def test_to_table_same_as_to_token():
+    """ 直接解析为表与解析为token的结果相同 """
+    source_code = sql_source(20000)
+    code_parser = build_sql_parser().compile()
+    assert token_key(code_parser.to_table(source_code, skip_type=["space"], line_count=1)) == token_key(code_parser.to_token(source_code, skip_type=["space"], line_count=1))
+
+
+def test_syntax_and_format_from_table():
+    """ 语法解析和格式化可以直接使用表的视图，结果与使用token相同 """
+    source_code = sql_source(20000)
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax()
+    format_code = build_sql_format()
+    tree = syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"]))
+    table_tree = syntax_parser.parser(list(code_parser.to_table(source_code, skip_type=["space", "line"])))
+    assert token_key(table_tree) == token_key(tree)
+    assert format_code.format(table_tree) == format_code.format(tree)
+
+
+def test_to_table_bytes():
+    """ 字节源码解析为表与to_token的结果相同，字节解析器也可以直接解析为表 """
+    source_code = (sql_source(5000) + "select '中\\'文' from t;\n").encode()
+    code_parser = build_sql_parser().compile()
+    for parser, data in [(code_parser, source_code), (code_parser, memoryview(source_code)), (code_parser.byte_parser(), source_code)]:
+        expect = token_key(parser.to_token(source_code, skip_type=["space"], line_count=1))
+        assert token_key(parser.to_table(data, skip_type=["space"], line_count=1)) == expect
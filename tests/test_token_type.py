@@ -0,0 +1,74 @@
+import pickle
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from src.code.CodeParser import Token, TokenTable, TokenType
+from tests.helper import build_sql_parser, build_sql_syntax, sql_source, token_key
+
+CHECK_SCRIPT = """
+import pickle
+import sys
+
+from src.code.CodeParser import TokenType
+from tests.helper import token_key
+
+for index in range(50):
+    TokenType.get_id(f"other:{index}")
+source_code, expect, data = pickle.loads(sys.stdin.buffer.read())
+code_parser, syntax_parser, token_list, table, view_list = pickle.loads(data)
+assert token_key(token_list) == expect
+assert token_key(table) == expect
+assert token_key(view_list) == expect
+assert token_key(syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"]))) == expect
+print("ok")
+"""
+""" 在子进程中先登记其他类型，再加载token、token表和解析器 """
+
+
+def test_type_id_round_trip():
+    """ 类型名称和编号一一对应，编号0固定为None """
+    assert TokenType.get_id(None) == 0
+    type_id = TokenType.get_id("test:type")
+    assert TokenType.get_id("test:type") == type_id
+    assert TokenType.get_name(type_id) == "test:type"
+    assert TokenType.get_ids(["test:type", None]) == frozenset((type_id, 0))
+    assert TokenType.get_ids("test:type") == frozenset((type_id,))
+    token = Token.create("test:type", None, "a", None)
+    token.type = "test:other"
+    assert token.type == "test:other" and token.type_id == TokenType.get_id("test:other")
+
+
+def test_pickle_in_other_process():
+    """ 序列化保存类型名称，类型登记顺序不同的进程中解析结果相同 """
+    source_code = sql_source(5000)
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax()
+    token_list = syntax_parser.parser(code_parser.to_token(source_code, skip_type=["space", "line"]))
+    expect = token_key(token_list)
+    table = TokenTable.from_tokens(token_list)
+    data = pickle.dumps((code_parser, syntax_parser, token_list, table, list(table)))
+    assert token_key(pickle.loads(data)[2]) == expect
+    result = subprocess.run([sys.executable, "-c", CHECK_SCRIPT], input=pickle.dumps((source_code, expect, data)), capture_output=True, cwd=Path(__file__).parent.parent)
+    assert result.returncode == 0, result.stderr.decode()
+    assert result.stdout.strip() == b"ok"
+
+
+def test_register_in_threads():
+    """ 多个线程同时登记相同的类型，每个名称只有一个编号 """
+    name_list = [f"thread:{index}" for index in range(3000)]
+    result = []
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        thread_list = [threading.Thread(target=lambda: result.append([TokenType.get_id(name) for name in name_list])) for _ in range(8)]
+        for thread in thread_list:
+            thread.start()
+        for thread in thread_list:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch)
+    assert all(id_list == result[0] for id_list in result)
+    assert [TokenType.get_name(type_id) for type_id in result[0]] == name_list
+    assert len(TokenType.name_list) == len(TokenType.name_index)
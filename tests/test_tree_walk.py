@@ -0,0 +1,87 @@
+import random
+
+from src.code.CodeParser import Token
+from src.code.FormatCode import IterationStack, TreeWalk
+from src.code.TreeParser import AssignmentSyntaxTree, SyntaxTreeParser
+from tests.helper import build_sql_parser, build_sql_syntax, nested_source, random_tree, sql_source
+
+
+def walk_iteration(tree):
+    """
+    使用IterationStack先序和后序遍历
+    :param tree: 语法树
+    :return: 先序访问的token，后序访问的token
+    """
+    visit, leave = [], []
+
+    def judge_method(iteration: IterationStack, token):
+        if token.has_tree():
+            iteration.push(token.token_tree)
+
+    iteration_stack = IterationStack()
+    iteration_stack.push(tree)
+    iteration_stack.add_judge(judge_method)
+    iteration_stack.add_before(lambda iteration, token: visit.append(id(token)))
+    iteration_stack.add_after(lambda iteration, token: leave.append(id(token)))
+    iteration_stack.iteration()
+    return visit, leave
+
+
+def walk_tree(tree):
+    """
+    使用TreeWalk先序和后序遍历，叶子节点的后序处理在进入时完成
+    :param tree: 语法树
+    :return: 先序访问的token，后序访问的token
+    """
+    visit, leave = [], []
+
+    def enter(token):
+        visit.append(id(token))
+        if token.has_tree():
+            return token.token_tree
+        leave.append(id(token))
+        return None
+
+    TreeWalk.walk(tree, enter, lambda token: leave.append(id(token)))
+    return visit, leave
+
+
+def test_walk_same_as_iteration():
+    """ 先序和后序的访问顺序与IterationStack相同 """
+    rand = random.Random(23)
+    for _ in range(300):
+        tree = random_tree(rand)
+        assert walk_tree(tree) == walk_iteration(tree)
+    code_parser = build_sql_parser().compile()
+    tree = build_sql_syntax().compile().parser(code_parser.to_token(sql_source(20000) + nested_source(40, 3), skip_type=["space", "line"]))
+    assert walk_tree(tree) == walk_iteration(tree)
+
+
+def test_walk_empty_children():
+    """ 返回空列表的节点不展开，也没有后序事件 """
+    leaf = Token.create("a", None, "x", None)
+    leave = []
+    TreeWalk.walk([leaf, leaf], lambda token: [], leave.append)
+    assert leave == []
+
+
+def test_tree_parser_recursion():
+    """ 构建过程中加入的待判断项全部处理，结束后清空上下文 """
+    tree_parser = SyntaxTreeParser()
+    visit = []
+
+    class JudgeList(list):
+        """ 遍历时记录访问的待判断项，并在首次访问时加入新的待判断项 """
+
+        def __iter__(self):
+            for item in list.__iter__(self):
+                visit.append(item)
+                if len(visit) < 5:
+                    tree_parser.need_judge = JudgeList([AssignmentSyntaxTree(None, None)])
+                yield item
+
+    tree_parser.need_judge = JudgeList([AssignmentSyntaxTree(None, None), AssignmentSyntaxTree(None, None)])
+    tree_parser.context["a"] = 1
+    tree_parser.recursion()
+    assert len(visit) == 6
+    assert tree_parser.need_judge == [] and tree_parser.context == {}
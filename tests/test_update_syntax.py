@@ -0,0 +1,73 @@
+import random
+
+from tests.helper import SKIP_TYPE, SPLIT_FACTOR, SQL_CHAR, build_sql_parser, build_sql_syntax, format_edit, random_edit, random_source, sql_source, token_key
+
+
+def test_update_same_as_parser():
+    """ 连续随机编辑后，增量语法解析与整体解析的语法树相同 """
+    rand = random.Random(11)
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax().compile()
+    for _ in range(200):
+        source_code = random_source(rand, 30, SQL_CHAR)
+        token_snapshot = code_parser.token_snapshot(source_code, skip_type=SKIP_TYPE)
+        syntax_snapshot = syntax_parser.syntax_snapshot(token_snapshot.token_list, SPLIT_FACTOR)
+        assert token_key(syntax_snapshot.tree) == token_key(syntax_parser.parser(code_parser.to_token(source_code, skip_type=SKIP_TYPE)))
+        for _ in range(5):
+            edit_index, remove_length, insert_data = random_edit(rand, source_code, SQL_CHAR)
+            source_code = source_code[:edit_index] + insert_data + source_code[edit_index + remove_length:]
+            token_snapshot = code_parser.update_token(token_snapshot, edit_index, remove_length, insert_data)
+            start_index, old_end, new_end = token_snapshot.change_range
+            syntax_snapshot = syntax_parser.update_syntax(syntax_snapshot, start_index, old_end, token_snapshot.token_list[start_index:new_end])
+            assert token_key(syntax_snapshot.tree) == token_key(syntax_parser.parser(code_parser.to_token(source_code, skip_type=SKIP_TYPE)))
+
+
+def test_update_reuse_statement():
+    """ 重新排版一条语句时，其余语句的语法树原样复用 """
+    rand = random.Random(12)
+    code_parser = build_sql_parser().compile()
+    syntax_parser = build_sql_syntax()
+    source_code = sql_source(30000)
+    token_snapshot = code_parser.token_snapshot(source_code, skip_type=SKIP_TYPE)
+    syntax_snapshot = syntax_parser.syntax_snapshot(token_snapshot.token_list, SPLIT_FACTOR)
+    for _ in range(10):
+        edit_index, remove_length, insert_data = format_edit(rand, source_code)
+        source_code = source_code[:edit_index] + insert_data + source_code[edit_index + remove_length:]
+        old_tree = {id(token) for token in syntax_snapshot.tree}
+        token_snapshot = code_parser.update_token(token_snapshot, edit_index, remove_length, insert_data)
+        start_index, old_end, new_end = token_snapshot.change_range
+        syntax_snapshot = syntax_parser.update_syntax(syntax_snapshot, start_index, old_end, token_snapshot.token_list[start_index:new_end])
+        assert token_key(syntax_snapshot.tree) == token_key(syntax_parser.parser(code_parser.to_token(source_code, skip_type=SKIP_TYPE)))
+        assert sum(id(token) in old_tree for token in syntax_snapshot.tree) >= len(syntax_snapshot.tree) - 20
+
+
+def first_name(token_list):
+    """
+    与列表首个token内容相同的名称标记为表名，依赖片段外的token
+    :param token_list: token列表
+    :return: token列表
+    """
+    first = token_list[0].data if token_list else None
+    for token in token_list:
+        if token.type == "any" and token.data == first:
+            token.type = "table"
+    return token_list
+
+
+def test_update_non_local_flow():
+    """ 处理方法依赖片段外的token时，快照和增量解析都整体重新解析，结果与整体解析相同 """
+    code_parser = build_sql_parser().compile()
+    source_code = "a;\nselect a from t;\nselect b from a;\n"
+    for is_local in (True, False):
+        syntax_parser = build_sql_syntax()
+        syntax_parser.add_flow(0, first_name, is_local)
+        token_snapshot = code_parser.token_snapshot(source_code, skip_type=SKIP_TYPE)
+        syntax_snapshot = syntax_parser.syntax_snapshot(token_snapshot.token_list, SPLIT_FACTOR)
+        expect = token_key(syntax_parser.parser(code_parser.to_token(source_code, skip_type=SKIP_TYPE)))
+        assert (token_key(syntax_snapshot.tree) == expect) is not is_local
+    new_code = "b" + source_code[1:]
+    token_snapshot = code_parser.update_token(token_snapshot, 0, 1, "b")
+    start_index, old_end, new_end = token_snapshot.change_range
+    syntax_snapshot = syntax_parser.update_syntax(syntax_snapshot, start_index, old_end, token_snapshot.token_list[start_index:new_end])
+    assert token_key(syntax_snapshot.tree) == token_key(syntax_parser.parser(code_parser.to_token(new_code, skip_type=SKIP_TYPE)))
+    assert "table" in str(token_key(syntax_snapshot.tree))
@@ -0,0 +1,39 @@
+import random
+
+from tests.helper import build_count_lexer, build_sql_parser, random_edit, random_source, sql_source, token_key
+
+
+def test_update_same_as_to_token():
+    """ 连续随机编辑后，增量解析与重新解析的结果相同，替换范围之外的token原样复用 """
+    rand = random.Random(10)
+    code_parser = build_count_lexer()
+    for skip_type in (None, ["space", "line"]):
+        for _ in range(300):
+            source_code = random_source(rand, 30)
+            snapshot = code_parser.token_snapshot(source_code, skip_type=skip_type, line_count=1)
+            for _ in range(5):
+                edit_index, remove_length, insert_data = random_edit(rand, source_code)
+                old_list = [*snapshot.token_list]
+                snapshot = code_parser.update_token(snapshot, edit_index, remove_length, insert_data)
+                source_code = source_code[:edit_index] + insert_data + source_code[edit_index + remove_length:]
+                assert snapshot.source_code == source_code
+                assert token_key(snapshot.token_list) == token_key(code_parser.to_token(source_code, skip_type=skip_type, line_count=1))
+                start, old_end, new_end = snapshot.change_range
+                assert all(a is b for a, b in zip(snapshot.token_list[:start], old_list[:start]))
+                assert len(snapshot.token_list) - new_end == len(old_list) - old_end
+                assert all(a is b for a, b in zip(snapshot.token_list[new_end:], old_list[old_end:]))
+
+
+def test_update_reuse_large_source():
+    """ 大文件中编辑一处只重新解析附近的token，打开和关闭多行注释时重新解析到注释结束，结果仍与重新解析相同 """
+    code_parser = build_sql_parser().compile()
+    source_code = sql_source(50000)
+    snapshot = code_parser.token_snapshot(source_code)
+    edit_index = source_code.index("\n", 25000) + 1
+    for step, (remove_length, insert_data) in enumerate([(0, "select 1;"), (9, ""), (0, "/* "), (0, " */"), (6, "")]):
+        snapshot = code_parser.update_token(snapshot, edit_index, remove_length, insert_data)
+        source_code = source_code[:edit_index] + insert_data + source_code[edit_index + remove_length:]
+        assert token_key(snapshot.token_list) == token_key(code_parser.to_token(source_code))
+        if step < 2:
+            start, old_end, new_end = snapshot.change_range
+            assert new_end - start < 100